@@ -0,0 +1,296 @@
+"""
+Envoltorios memoizados de Streamlit sobre las funciones puras de dashboard_core.
+
+Los DataFrames se pasan con prefijo '_' (Streamlit no los hashea) junto con la versión del
+dataset, que es lo que identifica su contenido. Así, en cada rerun solo se recalculan los
+pasos cuyas entradas (versión o filtros) cambiaron.
+"""
+import collections
+import concurrent.futures
+import threading
+
+import streamlit as st
+
+from dashboard_core import (
+    FACTURACION,
+    LEGALIZACIONES,
+    RIPS,
+    combine_legalizaciones,
+    build_facturador_index,
+    compute_section_from_inputs,
+    daily_counts,
+    filter_dataset,
+    filter_mask,
+    is_todos,
+    productivity_kpis,
+    validate_and_normalize,
+)
+from dashboard_core.ingestion import file_version, load_persisted_dataset, read_rollup
+from dashboard_core.plotting import warm_up
+from dashboard_core.preview import (
+    PREVIEW_ENABLED,
+    PREVIEW_MIN_ROWS,
+    PREVIEW_WAIT_SECONDS,
+    approximate_section_from_inputs,
+    combine_rollups,
+)
+from dashboard_core.reconciliation import (
+    CICLO,
+    cycle_time_distribution,
+    cycle_time_summary,
+    reconcile,
+    unbilled_legalizations,
+)
+from dashboard_core.rips_history import backlog_by_estado, dwell_summary, dwell_times, load_events
+
+SPECS = {spec["nombre"]: spec for spec in (LEGALIZACIONES, RIPS, FACTURACION)}
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def persisted_dataset(filepath, tipo, version):
+    """
+    Carga, prepara y normaliza un dataset persistente (desde su caché caliente Arrow si está
+    vigente). Se comparte entre sesiones (sin copiar) mientras el archivo no cambie, por lo que
+    el resultado debe tratarse como de solo lectura.
+    """
+    return load_persisted_dataset(filepath, tipo)
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def normalized_dataset(nombre, version, _df, _df_extra=None):
+    """
+    Dataset validado y normalizado (fechas convertidas, filas inválidas descartadas y orden
+    por fecha). Para Legalizaciones, _df y _df_extra son PPL y Convenios y se combinan aquí.
+    """
+    spec = SPECS[nombre]
+    if nombre == LEGALIZACIONES["nombre"]:
+        return validate_and_normalize(combine_legalizaciones(_df, _df_extra), spec)
+    return validate_and_normalize(_df, spec)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def column_values(nombre, version, columna, _df):
+    """Valores distintos (como texto, sin nulos) de una columna, para las opciones de los filtros."""
+    return _df[columna].dropna().astype(str).unique().tolist()
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def facturador_index(nombre, version, _df):
+    """Índice invertido de facturadores de un dataset, construido una vez por versión."""
+    return build_facturador_index(_df, SPECS[nombre])
+
+
+def _index_for(nombre, version, entradas, _df):
+    """Índice de facturadores, solo si la selección es de facturadores específicos."""
+    if is_todos(dict(entradas)["facturador"]):
+        return None
+    return facturador_index(nombre, version, _df)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def section_results(nombre, version, entradas, engine, _df, _calculado=None):
+    """
+    Resumen y evolución de una sección. Se memoizan por versión del dataset y por las entradas
+    de section_inputs (solo los filtros que la sección declara), así que cambiar un filtro de
+    otra sección no la recalcula. _calculado: resultado ya calculado en segundo plano (ver
+    section_results_or_preview), que se guarda en la caché sin volver a calcularlo.
+    """
+    if _calculado is not None:
+        return _calculado
+    return compute_section_from_inputs(
+        _df, SPECS[nombre], entradas, engine=engine, indice=_index_for(nombre, version, entradas, _df)
+    )
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def persisted_rollup(filepaths, version):
+    """
+    Resumen mensual (ver dashboard_core/preview.py) de los archivos persistentes de una sección,
+    combinados. version identifica los archivos y sus resúmenes. None si alguno no tiene resumen.
+    """
+    rollups = [read_rollup(filepath) for filepath in filepaths]
+    return None if any(rollup is None for rollup in rollups) else combine_rollups(*rollups)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def preview_results(nombre, version, entradas, _rollup):
+    """Estimación de section_results a partir del resumen mensual (marcada con attrs["aproximado"])."""
+    return approximate_section_from_inputs(_rollup, SPECS[nombre], entradas)
+
+
+def _exact_results(nombre, entradas, engine, df):
+    # Corre en los hilos del pool, sin contexto de Streamlit: solo código de dashboard_core. No
+    # usa el índice de facturadores, cuya construcción toma más que una pasada sobre las filas.
+    return compute_section_from_inputs(df, SPECS[nombre], entradas, engine=engine)
+
+
+def _job_result(trabajos, clave, futuro, timeout=None):
+    """
+    Resultado de un cálculo en segundo plano (TimeoutError si no terminó en timeout segundos).
+    Si el cálculo falló se saca del registro, para que el próximo pedido lo reintente, y se
+    relanza su error.
+    """
+    concurrent.futures.wait([futuro], timeout=timeout)
+    if not futuro.done():
+        raise concurrent.futures.TimeoutError()
+    error = futuro.exception()
+    if error is not None:
+        with trabajos["lock"]:
+            if trabajos["futuros"].get(clave) is futuro:
+                del trabajos["futuros"][clave]
+        raise error
+    return futuro.result()
+
+
+@st.cache_resource(show_spinner=False)
+def _exact_jobs():
+    """Cálculos exactos en segundo plano, compartidos por todas las sesiones del proceso."""
+    return {
+        "pool": concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="resultados-exactos"),
+        "futuros": collections.OrderedDict(),
+        "lock": threading.Lock(),
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def plotting_warm_up():
+    """
+    Precarga la pila de gráficos (ver dashboard_core.plotting.warm_up) en un hilo aparte, una
+    sola vez por proceso: la primera sesión del servidor no espera las importaciones y el
+    primer gráfico ya encuentra todo listo.
+    """
+    hilo = threading.Thread(target=warm_up, name="calentamiento-graficos", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def section_results_or_preview(nombre, version, entradas, engine, _df, _rollup, estimar=True):
+    """
+    section_results para el primer render de datasets grandes. Si el dataset tiene al menos
+    PREVIEW_MIN_ROWS filas y resumen mensual, los resultados exactos se calculan en segundo plano
+    (una sola vez aunque varias sesiones los pidan); si no están listos en PREVIEW_WAIT_SECONDS
+    se retorna la estimación del resumen mensual. Con estimar=False siempre se espera a los exactos.
+    El resultado del segundo plano se guarda en la caché de section_results desde el hilo del
+    script. Si el cálculo falló, se lanza su error y el próximo pedido lo vuelve a intentar.
+
+    Retorna (resumen, evolución, pendiente): pendiente es el Future de los resultados exactos
+    cuando se retornó la estimación, o None si los resultados ya son exactos.
+    """
+    trabajos = _exact_jobs()
+    clave = (nombre, version, entradas, engine)
+    with trabajos["lock"]:
+        futuro = trabajos["futuros"].get(clave)
+
+    if not (estimar and PREVIEW_ENABLED) or _rollup is None or len(_df) < PREVIEW_MIN_ROWS:
+        # Si ya hay un cálculo en segundo plano (p. ej. el de la vista previa) se espera ese
+        calculado = _job_result(trabajos, clave, futuro) if futuro is not None else None
+        return (*section_results(nombre, version, entradas, engine, _df, _calculado=calculado), None)
+
+    if futuro is None:
+        with trabajos["lock"]:
+            futuro = trabajos["futuros"].get(clave)
+            if futuro is None:
+                futuro = trabajos["pool"].submit(_exact_results, nombre, entradas, engine, _df)
+                trabajos["futuros"][clave] = futuro
+                # Los terminados ya se pueden pasar a section_results: solo se guardan los recientes
+                while len(trabajos["futuros"]) > 64 and next(iter(trabajos["futuros"].values())).done():
+                    trabajos["futuros"].popitem(last=False)
+    try:
+        calculado = _job_result(trabajos, clave, futuro, timeout=PREVIEW_WAIT_SECONDS)
+    except concurrent.futures.TimeoutError:
+        return (*preview_results(nombre, version, entradas, _rollup), futuro)
+    return (*section_results(nombre, version, entradas, engine, _df, _calculado=calculado), None)
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def section_mask(nombre, version, entradas, _df):
+    """Máscara de las filas filtradas de una sección (para la tabla paginada), con la misma clave."""
+    spec = SPECS[nombre]
+    entradas = dict(entradas)
+    start_date, end_date = entradas["fechas"]
+    return filter_mask(_df, spec, start_date, end_date, list(entradas["facturador"]),
+                       list(entradas[spec["filtro_categoria"]]),
+                       indice=_index_for(nombre, version, tuple(entradas.items()), _df))
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def daily_table(nombre, version, _df):
+    """Conteo diario por facturador y categoría (base de los indicadores), una vez por versión."""
+    return daily_counts(_df, SPECS[nombre])
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def section_kpis(nombre, version, entradas, periodo_code, _df):
+    """
+    Indicadores de productividad de una sección (ver productivity_kpis). Se calculan sobre el
+    conteo diario, no sobre las filas. periodo_code es el del crecimiento entre periodos.
+    """
+    spec = SPECS[nombre]
+    entradas = dict(entradas)
+    start_date, end_date = entradas["fechas"]
+    return productivity_kpis(
+        daily_table(nombre, version, _df), spec, start_date, end_date,
+        list(entradas["facturador"]), list(entradas[spec["filtro_categoria"]]), periodo_code,
+    )
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def reconciliation(version, max_dias, _df_legalizaciones, _df_facturacion):
+    """
+    Conciliación Legalización → Facturación (ver reconcile), una vez por par de versiones
+    (version combina la de Legalizaciones y la de Facturación) y límite de días.
+    """
+    return reconcile(_df_legalizaciones, _df_facturacion, max_dias=max_dias)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def unbilled_table(version, max_dias, _df_legalizaciones, _df_facturacion):
+    """Legalizaciones sin factura de la conciliación completa (se filtran con unbilled_mask)."""
+    return unbilled_legalizations(reconciliation(version, max_dias, _df_legalizaciones, _df_facturacion))
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def reconciliation_results(version, max_dias, entradas, _df_legalizaciones, _df_facturacion):
+    """Resumen y distribución del tiempo de ciclo para las entradas de section_inputs(CICLO, ...)."""
+    entradas = dict(entradas)
+    start_date, end_date = entradas["fechas"]
+    conciliado = filter_dataset(
+        reconciliation(version, max_dias, _df_legalizaciones, _df_facturacion), CICLO, start_date, end_date,
+        list(entradas["facturador"]), list(entradas[CICLO["filtro_categoria"]]),
+    )
+    return cycle_time_summary(conciliado), cycle_time_distribution(conciliado)
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def unbilled_mask(version, max_dias, entradas, _df_legalizaciones, _df_facturacion):
+    """Máscara de las legalizaciones sin factura que cumplen los filtros (para la tabla paginada)."""
+    entradas = dict(entradas)
+    start_date, end_date = entradas["fechas"]
+    return filter_mask(
+        unbilled_table(version, max_dias, _df_legalizaciones, _df_facturacion), CICLO, start_date, end_date,
+        list(entradas["facturador"]), list(entradas[CICLO["filtro_categoria"]]),
+    )
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def rips_events(version, directorio):
+    """Registro de eventos de estado de RIPS (ver rips_history), leído una vez por versión."""
+    return load_events(directorio)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def rips_dwell_times(version, directorio, hasta):
+    """Estancias de cada RIPS en cada estado; las que siguen abiertas se miden hasta `hasta`."""
+    return dwell_times(rips_events(version, directorio), hasta)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def rips_history_results(version, directorio, hasta, entradas, periodo_code):
+    """Tiempo en cada estado y backlog por estado y periodo para las entradas de la sección RIPS."""
+    entradas = dict(entradas)
+    start_date, end_date = entradas["fechas"]
+    facturadores = list(entradas["facturador"])
+    estados = list(entradas[RIPS["filtro_categoria"]])
+    resumen = dwell_summary(rips_dwell_times(version, directorio, hasta), start_date, end_date, facturadores, estados)
+    backlog = backlog_by_estado(rips_events(version, directorio), periodo_code, start_date, end_date, facturadores, estados)
+    return resumen, backlog
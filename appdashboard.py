@@ -1,10 +1,70 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import datetime
+import functools
 import os
 
+from app_cache import (
+    column_values,
+    file_version,
+    normalized_dataset,
+    persisted_dataset,
+    persisted_rollup,
+    plotting_warm_up,
+    reconciliation_results,
+    rips_history_results,
+    section_kpis,
+    section_mask,
+    section_results_or_preview,
+    unbilled_mask,
+    unbilled_table,
+)
+from dashboard_core import (
+    CICLO,
+    DEFAULT_ENGINE,
+    FACTURACION,
+    LEGALIZACIONES,
+    PERIODO_TIEMPO_OPTIONS,
+    REQUIRED_COLUMNS,
+    RIPS,
+    TIPOS_CONCILIABLES,
+    add_percentage,
+    can_reconcile,
+    filter_mask,
+    is_todos,
+    ingest_dataset,
+    read_uploaded_file,
+    section_inputs,
+)
+from dashboard_core.ingestion import rollup_path
+from dashboard_core.plotting import palette, plotting
+from dashboard_core.profiling import stage, start_profiler, start_run, stop_profiler
+from dashboard_core.rips_history import RIPS_KEY, events_dir, events_version, record_rips_snapshot
+from dashboard_core.store import (
+    ROL_ADMINISTRADOR,
+    check_admin_password,
+    current_file,
+    current_snapshot,
+    default_role,
+    multi_user_mode,
+    pinned_snapshot,
+    prune_versions,
+    remove_all_versions,
+    resolve_data_dir,
+    save_version,
+    snapshot_id,
+    write_transaction,
+)
+from ui_components import (
+    data_health_panel,
+    export_buttons,
+    kpi_panel,
+    paginated_table,
+    performance_panel,
+    preview_notice,
+    render_figure,
+    rips_history_panel,
+)
+
 # --- Configuración de la página ---
 st.set_page_config(
     page_title="Dashboard de Productividad y Legalizaciones",
@@ -12,16 +72,44 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- 1. Configuración de Persistencia de Datos ---
-PERSISTED_DATA_DIR = "../persisted_data"
-# Asegúrate de que la carpeta para datos persistentes exista
-os.makedirs(PERSISTED_DATA_DIR, exist_ok=True)
+# matplotlib y seaborn se importan en segundo plano (una vez por proceso) mientras se cargan los datos
+plotting_warm_up()
 
-# Nombres de archivo para los DataFrames persistentes
-PPL_FILE = os.path.join(PERSISTED_DATA_DIR, "df_ppl.parquet")
-CONVENIOS_FILE = os.path.join(PERSISTED_DATA_DIR, "df_convenios.parquet")
-RIPS_FILE = os.path.join(PERSISTED_DATA_DIR, "df_rips.parquet")
-FACTURACION_FILE = os.path.join(PERSISTED_DATA_DIR, "df_facturacion.parquet")
+# --- Instrumentación de rendimiento ---
+# Cada rerun registra el tiempo, la memoria y las filas de sus etapas (ver panel "Rendimiento").
+registros_rendimiento = start_run()
+perfilador_activo = None
+if st.session_state.get('perfilar_siguiente'):
+    # Captura de perfil completo solicitada desde el panel, solo para esta ejecución
+    perfilador_activo = start_profiler(st.session_state.pop('perfilar_siguiente'))
+
+# --- 1. Configuración de Persistencia de Datos ---
+# Carpeta compartida por todas las sesiones: ruta absoluta, configurable con DASHBOARD_DATA_DIR
+# (por defecto ../persisted_data). Qué archivo está vigente para cada tipo lo indica el
+# catálogo del almacén (ver dashboard_core/store.py).
+PERSISTED_DATA_DIR = resolve_data_dir()
+
+# Cada sesión trabaja con una foto consistente del almacén: la de su primera ejecución, hasta
+# que cargue los datos más recientes o guarde los suyos. Así, lo que guarde otra persona no
+# cambia los datos a mitad de un análisis.
+if 'store_snapshot' not in st.session_state:
+    st.session_state.store_snapshot = current_snapshot(PERSISTED_DATA_DIR)
+# Si una versión de la foto ya se eliminó del disco (la sesión quedó varios guardados atrás), ese
+# tipo pasa a su versión vigente
+st.session_state.store_snapshot, tipos_reemplazados = pinned_snapshot(PERSISTED_DATA_DIR, st.session_state.store_snapshot)
+# Archivo persistente de cada tipo en la foto de la sesión (None si no hay)
+PERSISTED_FILES = st.session_state.store_snapshot[1]
+# Registro de cambios de estado de RIPS (historial que se alimenta al guardar los datos)
+RIPS_EVENTS_DIR = events_dir(PERSISTED_DATA_DIR)
+# Nombre de cada tipo de archivo en los mensajes
+ETIQUETAS_ARCHIVO = {
+    'ppl': "PPL",
+    'convenios': "Convenios",
+    'rips': "RIPS",
+    'facturacion': "Facturación",
+}
+for tipo in tipos_reemplazados:
+    st.sidebar.info(f"La versión de {ETIQUETAS_ARCHIVO[tipo]} de esta sesión ya no está guardada: se usa la más reciente.")
 
 # --- 2. Inicializar st.session_state ---
 # Estas claves ahora también indican si los datos se cargaron desde archivos o se subieron.
@@ -44,28 +132,84 @@ if 'df_rips' not in st.session_state:
 if 'df_facturacion' not in st.session_state:
     st.session_state.df_facturacion = None
 
+# Versión de cada DataFrame cargado (archivo persistente o subida). Identifica su contenido
+# en las cachés de normalización y cálculo (ver app_cache.py).
+if 'dataset_versions' not in st.session_state:
+    st.session_state.dataset_versions = {tipo: None for tipo in PERSISTED_FILES}
+
+# Tipos subidos en esta sesión y aún no guardados (no se reemplazan al cargar datos más recientes)
+if 'tipos_subidos' not in st.session_state:
+    st.session_state.tipos_subidos = set()
+
+# Rol de la sesión: las acciones destructivas sobre los datos compartidos son de administrador
+if 'rol' not in st.session_state:
+    st.session_state.rol = default_role()
+
+# Vista previa aproximada (datasets grandes): resultados exactos que se calculan en segundo
+# plano mientras se muestra la estimación. Solo las ejecuciones completas del dashboard muestran
+# estimaciones; al volver a ejecutar un solo fragmento se calculan los resultados exactos.
+st.session_state.resultados_pendientes = []
+st.session_state.ejecucion_completa = True
+
 
 # --- 3. Funciones para guardar y cargar DataFrames con Parquet ---
-def save_dataframe(df, filepath):
-    """Guarda un DataFrame en un archivo Parquet."""
-    filename = os.path.basename(filepath)
-    if df is not None and not df.empty:
-        try:
-            df.to_parquet(filepath, index=False)
-            st.info(f"💾 Guardado exitoso: {filename}")
-            return True
-        except Exception as e:
-            st.error(f"❌ Error al guardar el archivo {filename}: {e}")
-            return False
-    else:
-        st.info(f"ℹ️ No hay datos para guardar en {filename}. (DataFrame vacío o None)")
-        return True # Retorna True porque no es un error, simplemente no hay nada que guardar.
+def record_rips_history(df, vigente):
+    """Registra los cambios de estado de RIPS frente al archivo vigente, antes de reemplazarlo."""
+    eventos_rips = record_rips_snapshot(df, vigente, RIPS_EVENTS_DIR)
+    if eventos_rips is None:
+        st.info(f"ℹ️ El archivo de RIPS no tiene la columna '{RIPS_KEY}': no se registra el historial de estados.")
+    elif eventos_rips:
+        st.info(f"🕓 Historial de RIPS: {eventos_rips:,} cambios de estado registrados.")
+
 
-def load_dataframe(filepath):
-    """Carga un DataFrame desde un archivo Parquet."""
+def save_dataframes():
+    """
+    Guarda los datos de la sesión en el almacén compartido, cada uno como una versión nueva y
+    todos en una sola transacción de escritura (si otra sesión está guardando, se espera a que
+    termine). Los datasets que no cambiaron respecto a la versión vigente no se reescriben.
+    Al terminar, la sesión queda trabajando con la foto nueva del almacén.
+    """
+    try:
+        with write_transaction(PERSISTED_DATA_DIR) as catalogo:
+            for tipo in PERSISTED_FILES:
+                df = st.session_state[f"df_{tipo}"]
+                etiqueta = ETIQUETAS_ARCHIVO[tipo]
+                if df is None or df.empty:
+                    st.info(f"ℹ️ No hay datos de {etiqueta} para guardar. (DataFrame vacío o None)")
+                    continue
+                vigente = current_file(catalogo, PERSISTED_DATA_DIR, tipo)
+                if vigente is not None and st.session_state.dataset_versions[tipo] == file_version(vigente):
+                    st.info(f"ℹ️ {etiqueta}: sin cambios respecto a los datos guardados.")
+                    continue
+                if tipo == 'rips':
+                    try:
+                        record_rips_history(df, vigente)
+                    except Exception as e:
+                        st.warning(f"No se pudo registrar el historial de estados de RIPS: {e}")
+                nuevo = save_version(catalogo, PERSISTED_DATA_DIR, tipo, df)
+                st.session_state.dataset_versions[tipo] = file_version(nuevo)
+                st.session_state.tipos_subidos.discard(tipo)
+                st.info(f"💾 Guardado exitoso: {etiqueta} ({os.path.basename(nuevo)})")
+            prune_versions(catalogo, PERSISTED_DATA_DIR)
+    except Exception as e:
+        st.error(f"❌ Error al guardar los datos: {e}")
+        return False
+    st.session_state.store_snapshot = current_snapshot(PERSISTED_DATA_DIR)
+    return True
+
+def load_dataframe(filepath, tipo):
+    """
+    Carga y prepara un DataFrame desde un archivo Parquet. La lectura se memoiza mientras
+    el archivo no cambie y queda registrada la versión del dataset en session_state.
+    """
     if os.path.exists(filepath):
         try:
-            return pd.read_parquet(filepath)
+            version = file_version(filepath)
+            with stage(os.path.basename(filepath), "carga") as registro:
+                df_loaded = persisted_dataset(filepath, tipo, version)
+                registro["filas"] = len(df_loaded)
+            st.session_state.dataset_versions[tipo] = version
+            return df_loaded
         except Exception as e:
             st.warning(f"No se pudo cargar el archivo {os.path.basename(filepath)} previamente guardado. "
                        f"Por favor, súbelo de nuevo o verifica el archivo. Error: {e}")
@@ -83,101 +227,24 @@ def load_uploaded_data(uploaded_file):
     """
     if uploaded_file is not None:
         try:
-            uploaded_file.seek(0) # Siempre resetear el puntero antes de intentar leer
-
-            # Intentar leer como CSV primero
-            try:
-                df_loaded = pd.read_csv(uploaded_file, encoding='utf-8', errors='ignore', on_bad_lines='skip')
-                return df_loaded
-            except Exception as csv_error:
-                # Si falla CSV, intentar como Excel
-                uploaded_file.seek(0) # Resetear el puntero del archivo para Excel
-                # Intentar leer con openpyxl, que es más robusto para .xlsx
-                try:
-                    df_loaded = pd.read_excel(uploaded_file, engine='openpyxl')
-                    return df_loaded
-                except Exception as excel_error:
-                    st.error(f"Error al cargar el archivo como Excel. Detalles: {excel_error}")
-                    return None
+            return read_uploaded_file(uploaded_file)
         except Exception as e:
-            st.error(f"Error general al cargar el archivo. Asegúrate de que sea un archivo CSV o Excel válido. Detalles: {e}")
+            st.error(f"Error al cargar el archivo. Asegúrate de que sea un archivo CSV o Excel válido. Detalles: {e}")
             return None
     return None
 
 # --- 5. Cargar datos persistentes al inicio si existen ---
 # Se verifica si el DataFrame no se ha cargado aún por subida de archivo
-# y si existe un archivo persistente.
-if not st.session_state.ppl_uploaded and os.path.exists(PPL_FILE):
-    st.session_state.df_ppl = load_dataframe(PPL_FILE)
-    if st.session_state.df_ppl is not None:
-        # Asegurar tipo de dato para la columna NUMERO_IDENTIFICACION si se carga de disco
-        if 'NUMERO_IDENTIFICACION' in st.session_state.df_ppl.columns:
-            st.session_state.df_ppl['NUMERO_IDENTIFICACION'] = st.session_state.df_ppl['NUMERO_IDENTIFICACION'].astype(str)
-        # Asegurar tipo de dato para la columna PROCEDIMIENTO si se carga de disco
-        if 'PROCEDIMIENTO' in st.session_state.df_ppl.columns:
-            st.session_state.df_ppl['PROCEDIMIENTO'] = st.session_state.df_ppl['PROCEDIMIENTO'].astype(str)
-        # Asegurar tipo de dato para la columna CodigoEspecialidad si se carga de disco
-        if 'CodigoEspecialidad' in st.session_state.df_ppl.columns:
-            st.session_state.df_ppl['CodigoEspecialidad'] = st.session_state.df_ppl['CodigoEspecialidad'].astype(str)
-        # Asegurar tipo de dato para la columna Usuario si se carga de disco
-        if 'Usuario' in st.session_state.df_ppl.columns:
-            st.session_state.df_ppl['Usuario'] = st.session_state.df_ppl['Usuario'].astype(str)
-
-        st.session_state.ppl_uploaded = True
-        st.session_state.df_ppl['Tipo_Legalizacion'] = 'PPL' # Asegurar la columna si se carga de disco
-
-if not st.session_state.convenios_uploaded and os.path.exists(CONVENIOS_FILE):
-    st.session_state.df_convenios = load_dataframe(CONVENIOS_FILE)
-    if st.session_state.df_convenios is not None:
-        # Asegurar tipo de dato para la columna NUMERO_IDENTIFICACION si se carga de disco
-        if 'NUMERO_IDENTIFICACION' in st.session_state.df_convenios.columns:
-            st.session_state.df_convenios['NUMERO_IDENTIFICACION'] = st.session_state.df_convenios['NUMERO_IDENTIFICACION'].astype(str)
-        # Asegurar tipo de dato para la columna PROCEDIMIENTO si se carga de disco
-        if 'PROCEDIMIENTO' in st.session_state.df_convenios.columns:
-            st.session_state.df_convenios['PROCEDIMIENTO'] = st.session_state.df_convenios['PROCEDIMIENTO'].astype(str)
-        # Asegurar tipo de dato para la columna CodigoEspecialidad si se carga de disco
-        if 'CodigoEspecialidad' in st.session_state.df_convenios.columns:
-            st.session_state.df_convenios['CodigoEspecialidad'] = st.session_state.df_convenios['CodigoEspecialidad'].astype(str)
-        # Asegurar tipo de dato para la columna Usuario si se carga de disco
-        if 'Usuario' in st.session_state.df_convenios.columns:
-            st.session_state.df_convenios['Usuario'] = st.session_state.df_convenios['Usuario'].astype(str)
-
-        st.session_state.convenios_uploaded = True
-        st.session_state.df_convenios['Tipo_Legalizacion'] = 'Convenios' # Asegurar la columna
-
-if not st.session_state.rips_uploaded and os.path.exists(RIPS_FILE):
-    st.session_state.df_rips = load_dataframe(RIPS_FILE)
-    if st.session_state.df_rips is not None:
-        # Asegurar tipo de dato para la columna NOMBRE si se carga de disco
-        if 'NOMBRE' in st.session_state.df_rips.columns:
-            st.session_state.df_rips['NOMBRE'] = st.session_state.df_rips['NOMBRE'].astype(str)
-        # Asegurar tipo de dato para la columna ESTADO si se carga de disco
-        if 'ESTADO' in st.session_state.df_rips.columns:
-            st.session_state.df_rips['ESTADO'] = st.session_state.df_rips['ESTADO'].astype(str)
-
-        st.session_state.rips_uploaded = True
-
-if not st.session_state.facturacion_uploaded and os.path.exists(FACTURACION_FILE):
-    st.session_state.df_facturacion = load_dataframe(FACTURACION_FILE)
-    if st.session_state.df_facturacion is not None:
-        st.session_state.facturacion_uploaded = True
-        # El preprocesamiento de mayúsculas y Tipo_Facturacion ya debe haberse hecho al guardar,
-        # pero es buena práctica asegurarse si el proceso de guardado no garantiza esto.
-        if 'PREFIJO' in st.session_state.df_facturacion.columns:
-            st.session_state.df_facturacion['PREFIJO'] = st.session_state.df_facturacion['PREFIJO'].astype(str) # Asegurar tipo string para .upper()
-            st.session_state.df_facturacion['Tipo_Facturacion'] = st.session_state.df_facturacion['PREFIJO'].apply(
-                lambda x: 'PPL' if x.strip().upper() == 'SM' else
-                          ('Convenios' if x.strip().upper() == 'E' else 'Otro')
-            )
-        else:
-            st.warning("Columna 'PREFIJO' no encontrada en el archivo de Facturación persistente. No se podrá filtrar por tipo (PPL/Convenios).")
-            st.session_state.df_facturacion['Tipo_Facturacion'] = 'Desconocido' # Valor por defecto
-        # Asegurar tipo de dato para la columna IDENTIFICACION si se carga de disco
-        if 'IDENTIFICACION' in st.session_state.df_facturacion.columns:
-            st.session_state.df_facturacion['IDENTIFICACION'] = st.session_state.df_facturacion['IDENTIFICACION'].astype(str)
-        # Asegurar tipo de dato para la columna USUARIO si se carga de disco
-        if 'USUARIO' in st.session_state.df_facturacion.columns:
-            st.session_state.df_facturacion['USUARIO'] = st.session_state.df_facturacion['USUARIO'].astype(str)
+# y si existe un archivo persistente. Los tipos de datos y las columnas Tipo_Legalizacion /
+# Tipo_Facturacion se aseguran en ingest_dataset, que además deja cada dataset normalizado.
+for tipo, filepath in PERSISTED_FILES.items():
+    if not st.session_state[f"{tipo}_uploaded"] and filepath is not None and os.path.exists(filepath):
+        df_loaded = load_dataframe(filepath, tipo)
+        if df_loaded is not None:
+            st.session_state[f"df_{tipo}"] = df_loaded
+            st.session_state[f"{tipo}_uploaded"] = True
+            if tipo == 'facturacion' and 'PREFIJO' not in df_loaded.columns:
+                st.warning("Columna 'PREFIJO' no encontrada en el archivo de Facturación persistente. No se podrá filtrar por tipo (PPL/Convenios).")
 
 
 # --- 6. Título y encabezados del Dashboard ---
@@ -190,12 +257,6 @@ st.sidebar.header("Cargar Archivos")
 # Lista para almacenar mensajes de estado de carga
 upload_status_messages = []
 
-# Referencias a los DataFrames en session_state para facilitar el acceso
-df_ppl = st.session_state.df_ppl
-df_convenios = st.session_state.df_convenios
-df_rips = st.session_state.df_rips
-df_facturacion = st.session_state.df_facturacion
-
 # Lógica de uploaders condicionales
 # Legalizaciones PPL
 if not st.session_state.ppl_uploaded:
@@ -203,14 +264,10 @@ if not st.session_state.ppl_uploaded:
     if uploaded_file_ppl_widget is not None:
         df_ppl_new = load_uploaded_data(uploaded_file_ppl_widget)
         if df_ppl_new is not None:
-            # --- CONVERSIÓN DE TIPO DE DATO: columnas críticas a str para PPL ---
-            for col in ['NUMERO_IDENTIFICACION', 'PROCEDIMIENTO', 'CodigoEspecialidad', 'Usuario']:
-                if col in df_ppl_new.columns:
-                    df_ppl_new[col] = df_ppl_new[col].astype(str)
-
-            df_ppl_new['Tipo_Legalizacion'] = 'PPL'
             st.session_state.ppl_uploaded = True
-            st.session_state.df_ppl = df_ppl_new
+            st.session_state.df_ppl = ingest_dataset(df_ppl_new, 'ppl')
+            st.session_state.dataset_versions['ppl'] = uploaded_file_ppl_widget.file_id
+            st.session_state.tipos_subidos.add('ppl')
             upload_status_messages.append(("success", "Archivo PPL cargado correctamente."))
             # Forzar rerun para que se actualice el estado y se oculte el uploader
             st.rerun()
@@ -225,14 +282,10 @@ if not st.session_state.convenios_uploaded:
     if uploaded_file_convenios_widget is not None:
         df_convenios_new = load_uploaded_data(uploaded_file_convenios_widget)
         if df_convenios_new is not None:
-            # --- CONVERSIÓN DE TIPO DE DATO: columnas críticas a str para Convenios ---
-            for col in ['NUMERO_IDENTIFICACION', 'PROCEDIMIENTO', 'CodigoEspecialidad', 'Usuario']:
-                if col in df_convenios_new.columns:
-                    df_convenios_new[col] = df_convenios_new[col].astype(str)
-
-            df_convenios_new['Tipo_Legalizacion'] = 'Convenios'
             st.session_state.convenios_uploaded = True
-            st.session_state.df_convenios = df_convenios_new
+            st.session_state.df_convenios = ingest_dataset(df_convenios_new, 'convenios')
+            st.session_state.dataset_versions['convenios'] = uploaded_file_convenios_widget.file_id
+            st.session_state.tipos_subidos.add('convenios')
             upload_status_messages.append(("success", "Archivo Convenios cargado correctamente."))
             st.rerun()
         else:
@@ -246,13 +299,10 @@ if not st.session_state.rips_uploaded:
     if uploaded_file_rips_widget is not None:
         df_rips_new = load_uploaded_data(uploaded_file_rips_widget)
         if df_rips_new is not None:
-            # --- CONVERSIÓN DE TIPO DE DATO: columnas críticas a str para RIPS ---
-            for col in ['NOMBRE', 'ESTADO']:
-                if col in df_rips_new.columns:
-                    df_rips_new[col] = df_rips_new[col].astype(str)
-
             st.session_state.rips_uploaded = True
-            st.session_state.df_rips = df_rips_new
+            st.session_state.df_rips = ingest_dataset(df_rips_new, 'rips')
+            st.session_state.dataset_versions['rips'] = uploaded_file_rips_widget.file_id
+            st.session_state.tipos_subidos.add('rips')
             upload_status_messages.append(("success", "Archivo RIPS cargado correctamente."))
             st.rerun()
         else:
@@ -267,25 +317,12 @@ if not st.session_state.facturacion_uploaded:
         df_facturacion_new = load_uploaded_data(uploaded_file_facturacion_widget)
         if df_facturacion_new is not None:
             st.session_state.facturacion_uploaded = True
-            st.session_state.df_facturacion = df_facturacion_new
-
-            # Convertir todas las columnas del DataFrame a mayúsculas para la comparación
-            st.session_state.df_facturacion.columns = st.session_state.df_facturacion.columns.str.upper()
-
-            # --- CONVERSIÓN DE TIPO DE DATO: columnas críticas a str para Facturación ---
-            for col in ['IDENTIFICACION', 'PREFIJO', 'USUARIO']:
-                if col in st.session_state.df_facturacion.columns:
-                    st.session_state.df_facturacion[col] = st.session_state.df_facturacion[col].astype(str)
-
-            # --- Preprocesamiento para Tipo_Facturacion ---
-            if 'PREFIJO' in st.session_state.df_facturacion.columns:
-                st.session_state.df_facturacion['Tipo_Facturacion'] = st.session_state.df_facturacion['PREFIJO'].apply(
-                    lambda x: 'PPL' if x.strip().upper() == 'SM' else
-                              ('Convenios' if x.strip().upper() == 'E' else 'Otro')
-                )
-            else:
+            # Columnas en mayúsculas, tipos de datos y Tipo_Facturacion a partir de PREFIJO
+            st.session_state.df_facturacion = ingest_dataset(df_facturacion_new, 'facturacion')
+            st.session_state.dataset_versions['facturacion'] = uploaded_file_facturacion_widget.file_id
+            st.session_state.tipos_subidos.add('facturacion')
+            if 'PREFIJO' not in st.session_state.df_facturacion.columns:
                 st.warning("Columna 'PREFIJO' no encontrada en el archivo de Facturación. No se podrá filtrar por tipo (PPL/Convenios).")
-                st.session_state.df_facturacion['Tipo_Facturacion'] = 'Desconocido' # Valor por defecto
 
             upload_status_messages.append(("success", "Archivo de Facturación cargado correctamente."))
             st.rerun()
@@ -301,107 +338,143 @@ st.sidebar.subheader("Acciones de Datos")
 
 # Botón para guardar datos procesados a disco
 if st.sidebar.button("Guardar datos para futura carga", key="save_data_button"):
-    save_success_ppl = save_dataframe(st.session_state.df_ppl, PPL_FILE)
-    save_success_convenios = save_dataframe(st.session_state.df_convenios, CONVENIOS_FILE)
-    save_success_rips = save_dataframe(st.session_state.df_rips, RIPS_FILE)
-    save_success_facturacion = save_dataframe(st.session_state.df_facturacion, FACTURACION_FILE)
-
-    if save_success_ppl and save_success_convenios and save_success_rips and save_success_facturacion:
+    if save_dataframes():
         st.sidebar.success("Todos los datos procesados se han guardado correctamente.")
     else:
         st.sidebar.error("Hubo un error al guardar algunos datos. Revisa los mensajes en la aplicación para más detalles.")
 
 
+def reset_session_data(tipos):
+    """Quita de la sesión los datos de los tipos indicados (la próxima ejecución los vuelve a cargar de la foto)."""
+    for tipo in tipos:
+        st.session_state[f"{tipo}_uploaded"] = False
+        st.session_state[f"df_{tipo}"] = None
+        st.session_state.dataset_versions[tipo] = None
+        st.session_state.tipos_subidos.discard(tipo)
+
+
+# Datos más recientes guardados por otra sesión: la sesión sigue con su foto hasta que el usuario decida
+def load_latest_snapshot():
+    st.session_state.store_snapshot = current_snapshot(PERSISTED_DATA_DIR)
+    reset_session_data([tipo for tipo in PERSISTED_FILES if tipo not in st.session_state.tipos_subidos])
+
+if snapshot_id(PERSISTED_DATA_DIR) != st.session_state.store_snapshot[0]:
+    st.sidebar.info("Hay datos guardados más recientes que los de esta sesión.")
+    st.sidebar.button("Cargar datos más recientes", on_click=load_latest_snapshot, key="load_latest_button")
+
+
 # Botón para limpiar archivos cargados
 def clear_uploaded_files():
     # Resetear el estado de carga y DataFrames en session_state
-    st.session_state.ppl_uploaded = False
-    st.session_state.convenios_uploaded = False
-    st.session_state.rips_uploaded = False
-    st.session_state.facturacion_uploaded = False
-
-    st.session_state.df_ppl = None
-    st.session_state.df_convenios = None
-    st.session_state.df_rips = None
-    st.session_state.df_facturacion = None
+    reset_session_data(PERSISTED_FILES)
 
-    # Eliminar los archivos persistentes también
-    for filepath in [PPL_FILE, CONVENIOS_FILE, RIPS_FILE, FACTURACION_FILE]:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            st.sidebar.info(f"Archivo persistente {os.path.basename(filepath)} eliminado.")
+    # Eliminar los archivos persistentes (compartidos) también: solo administradores
+    try:
+        for tipo in remove_all_versions(PERSISTED_DATA_DIR, st.session_state.rol):
+            st.sidebar.info(f"Datos persistentes de {ETIQUETAS_ARCHIVO[tipo]} eliminados.")
+    except PermissionError as e:
+        st.sidebar.error(str(e))
+    st.session_state.store_snapshot = current_snapshot(PERSISTED_DATA_DIR)
 
-    st.cache_data.clear() # Limpiar la caché de la función load_uploaded_data
+    load_uploaded_data.clear() # Limpiar la caché de la función load_uploaded_data
     st.rerun() # Forzar un rerun para que los uploaders reaparezcan
 
-st.sidebar.button("Limpiar archivos cargados y persistentes", on_click=clear_uploaded_files, key="clear_files_button")
 
-# --- 9. Combinar los DataFrames de Legalizaciones ---
-df_legalizaciones = None
-if st.session_state.df_ppl is not None and st.session_state.df_convenios is not None:
-    df_legalizaciones = pd.concat([st.session_state.df_ppl, st.session_state.df_convenios], ignore_index=True)
-elif st.session_state.df_ppl is not None:
-    df_legalizaciones = st.session_state.df_ppl
-elif st.session_state.df_convenios is not None:
-    df_legalizaciones = st.session_state.df_convenios
+# Un analista solo limpia su sesión; los datos compartidos se vuelven a cargar de la foto vigente
+def clear_session_files():
+    st.session_state.store_snapshot = current_snapshot(PERSISTED_DATA_DIR)
+    reset_session_data(PERSISTED_FILES)
+
+if st.session_state.rol == ROL_ADMINISTRADOR:
+    st.sidebar.button("Limpiar archivos cargados y persistentes", on_click=clear_uploaded_files, key="clear_files_button")
 else:
+    st.sidebar.button("Limpiar archivos cargados en esta sesión", on_click=clear_session_files, key="clear_session_button")
+
+# Acceso de administrador (solo en modo multiusuario, con DASHBOARD_ADMIN_PASSWORD configurada)
+if multi_user_mode():
+    with st.sidebar.expander("Acceso de administrador"):
+        if st.session_state.rol == ROL_ADMINISTRADOR:
+            st.caption("Sesión con rol de administrador.")
+            if st.button("Salir del modo administrador", key="admin_logout_button"):
+                st.session_state.rol = default_role()
+                st.rerun()
+        else:
+            clave_admin = st.text_input("Clave de administrador", type="password", key="admin_password")
+            if st.button("Ingresar", key="admin_login_button"):
+                if check_admin_password(clave_admin):
+                    st.session_state.rol = ROL_ADMINISTRADOR
+                    st.rerun()
+                else:
+                    st.error("Clave incorrecta.")
+
+# --- 9. Combinar los DataFrames de Legalizaciones ---
+# La unión de PPL y Convenios se hace (memoizada) junto con la normalización del paso 10.
+dataset_versions = st.session_state.dataset_versions
+legalizaciones_cargadas = st.session_state.df_ppl is not None or st.session_state.df_convenios is not None
+if not legalizaciones_cargadas:
     upload_status_messages.append(("info", "Esperando que cargues al menos un archivo de legalizaciones."))
 
 # --- 10. Validaciones Iniciales de Datos ---
 
 # Manejo de ausencia de datos general
-if df_legalizaciones is None and st.session_state.df_rips is None and st.session_state.df_facturacion is None:
+if not legalizaciones_cargadas and st.session_state.df_rips is None and st.session_state.df_facturacion is None:
     st.info("Para comenzar el análisis, por favor **sube al menos un archivo** (Legalizaciones, RIPS o Facturación) usando los botones en la **barra lateral izquierda**, o **carga los datos guardados** si ya existen.")
     st.stop()
 
+# Los datasets llegan normalizados desde la ingesta (marca df.attrs["normalizado"], ver
+# ingest_dataset), así que aquí no se vuelven a convertir fechas ni a ordenar: solo se unen PPL y
+# Convenios (una vez por versión de los datos) y se reportan las columnas faltantes.
 
 # Validación de columnas clave para Legalizaciones
-if df_legalizaciones is not None:
-    required_cols_legalizaciones = ['Usuario', 'FECHA_REAL']
-    if not all(col in df_legalizaciones.columns for col in required_cols_legalizaciones):
+df_legalizaciones = None
+legalizaciones_version = f"{dataset_versions['ppl']}+{dataset_versions['convenios']}"
+if legalizaciones_cargadas:
+    with stage("Legalizaciones", "validación") as registro:
+        df_legalizaciones = normalized_dataset(
+            LEGALIZACIONES["nombre"], legalizaciones_version,
+            st.session_state.df_ppl, st.session_state.df_convenios,
+        )
+        registro["filas"] = len(df_legalizaciones) if df_legalizaciones is not None else 0
+    if df_legalizaciones is None:
+        required_cols_legalizaciones = REQUIRED_COLUMNS[LEGALIZACIONES["nombre"]]
         st.error(f"¡Atención! Para el análisis de productividad de legalizaciones, tus archivos deben contener las columnas: **{', '.join(required_cols_legalizaciones)}**.")
         st.error("Por favor, corrige los nombres de las columnas en tus archivos de legalizaciones y vuelve a cargarlos.")
-        df_legalizaciones = None # Invalida el DF si faltan columnas
-    else:
-        # Asegurarse de que 'Usuario' sea string antes de cualquier operación
-        df_legalizaciones['Usuario'] = df_legalizaciones['Usuario'].astype(str)
-        df_legalizaciones['FECHA_REAL'] = pd.to_datetime(df_legalizaciones['FECHA_REAL'], errors='coerce')
-        df_legalizaciones.dropna(subset=['FECHA_REAL'], inplace=True)
-        df_legalizaciones.sort_values(by='FECHA_REAL', inplace=True)
 
 # Validación de columnas clave para RIPS
+df_rips = None
 if st.session_state.df_rips is not None:
-    required_cols_rips = ['NOMBRE', 'ESTADO', 'ULTIMA_MODIFICACION']
-    if not all(col in st.session_state.df_rips.columns for col in required_cols_rips):
+    with stage("RIPS", "validación") as registro:
+        df_rips = normalized_dataset(RIPS["nombre"], dataset_versions['rips'], st.session_state.df_rips)
+        registro["filas"] = len(df_rips) if df_rips is not None else 0
+    if df_rips is None:
+        required_cols_rips = REQUIRED_COLUMNS[RIPS["nombre"]]
         st.error(f"¡Atención! Para el análisis de RIPS, tu archivo debe contener las columnas: **{', '.join(required_cols_rips)}**.")
         st.error("Por favor, corrige los nombres de las columnas en tu archivo RIPS y vuelve a cargarlo.")
-        st.session_state.df_rips = None # Invalida el DataFrame de RIPS si faltan columnas
-    else:
-        # Asegurarse de que 'NOMBRE' y 'ESTADO' sean string antes de cualquier operación
-        st.session_state.df_rips['NOMBRE'] = st.session_state.df_rips['NOMBRE'].astype(str)
-        st.session_state.df_rips['ESTADO'] = st.session_state.df_rips['ESTADO'].astype(str)
-        st.session_state.df_rips['ULTIMA_MODIFICACION'] = pd.to_datetime(st.session_state.df_rips['ULTIMA_MODIFICACION'], errors='coerce')
-        st.session_state.df_rips.dropna(subset=['ULTIMA_MODIFICACION'], inplace=True)
-        st.session_state.df_rips.sort_values(by='ULTIMA_MODIFICACION', inplace=True)
 
 # Validación de columnas clave para Facturación
+df_facturacion = None
 if st.session_state.df_facturacion is not None:
-    required_cols_facturacion = ['USUARIO', 'FECHA FACTURA', 'PREFIJO']
-    # Aseguramos que las columnas estén en mayúsculas (ya se hace al cargar pero es una buena práctica aquí también)
-    st.session_state.df_facturacion.columns = st.session_state.df_facturacion.columns.str.upper()
-
-    if not all(col in st.session_state.df_facturacion.columns for col in required_cols_facturacion):
+    with stage("Facturación", "validación") as registro:
+        df_facturacion = normalized_dataset(FACTURACION["nombre"], dataset_versions['facturacion'], st.session_state.df_facturacion)
+        registro["filas"] = len(df_facturacion) if df_facturacion is not None else 0
+    if df_facturacion is None:
+        required_cols_facturacion = REQUIRED_COLUMNS[FACTURACION["nombre"]]
         st.error(f"¡Atención! Para el análisis de Facturación, tu archivo debe contener las columnas: **{', '.join(required_cols_facturacion)}**.")
         st.error("Por favor, corrige los nombres de las columnas en tu archivo de Facturación y vuelve a cargarlo.")
-        st.session_state.df_facturacion = None # Invalida el DataFrame si faltan columnas
-    else:
-        # Asegurarse de que 'USUARIO' y 'PREFIJO' sean string antes de cualquier operación
-        st.session_state.df_facturacion['USUARIO'] = st.session_state.df_facturacion['USUARIO'].astype(str)
-        st.session_state.df_facturacion['PREFIJO'] = st.session_state.df_facturacion['PREFIJO'].astype(str)
-        st.session_state.df_facturacion['FECHA FACTURA'] = pd.to_datetime(st.session_state.df_facturacion['FECHA FACTURA'], errors='coerce')
-        st.session_state.df_facturacion.dropna(subset=['FECHA FACTURA'], inplace=True)
-        st.session_state.df_facturacion.sort_values(by='FECHA FACTURA', inplace=True)
 
+# Filas descartadas al normalizar cada archivo por fecha vacía o no reconocida, y líneas del CSV
+# que no se pudieron leer (el detalle está en el panel "Salud de los datos")
+for tipo in PERSISTED_FILES:
+    df_tipo = st.session_state[f"df_{tipo}"]
+    reporte_fechas = df_tipo.attrs.get("fechas") if df_tipo is not None else None
+    if reporte_fechas and (reporte_fechas["invalidas"] or reporte_fechas["vacias"]):
+        upload_status_messages.append(("warning",
+            f"{ETIQUETAS_ARCHIVO[tipo]}: se descartaron {reporte_fechas['invalidas']:,} filas con fecha no reconocida "
+            f"y {reporte_fechas['vacias']:,} sin fecha en '{reporte_fechas['columna']}'."))
+    lineas_omitidas = df_tipo.attrs.get("calidad", {}).get("lineas_omitidas") if df_tipo is not None else None
+    if lineas_omitidas:
+        upload_status_messages.append(("warning",
+            f"{ETIQUETAS_ARCHIVO[tipo]}: se omitieron {lineas_omitidas:,} líneas del archivo que no se pudieron leer."))
 
 # --- 11. Filtro de Análisis (GLOBAL) ---
 st.sidebar.subheader("Filtros de Análisis")
@@ -410,15 +483,16 @@ st.sidebar.subheader("Filtros de Análisis")
 all_min_dates = []
 all_max_dates = []
 
+# Los datasets normalizados están ordenados por fecha: el mínimo y el máximo son los extremos
 if df_legalizaciones is not None and not df_legalizaciones.empty:
-    all_min_dates.append(df_legalizaciones['FECHA_REAL'].min().date())
-    all_max_dates.append(df_legalizaciones['FECHA_REAL'].max().date())
-if st.session_state.df_rips is not None and not st.session_state.df_rips.empty:
-    all_min_dates.append(st.session_state.df_rips['ULTIMA_MODIFICACION'].min().date())
-    all_max_dates.append(st.session_state.df_rips['ULTIMA_MODIFICACION'].max().date())
-if st.session_state.df_facturacion is not None and not st.session_state.df_facturacion.empty:
-    all_min_dates.append(st.session_state.df_facturacion['FECHA FACTURA'].min().date())
-    all_max_dates.append(st.session_state.df_facturacion['FECHA FACTURA'].max().date())
+    all_min_dates.append(df_legalizaciones['FECHA_REAL'].iloc[0].date())
+    all_max_dates.append(df_legalizaciones['FECHA_REAL'].iloc[-1].date())
+if df_rips is not None and not df_rips.empty:
+    all_min_dates.append(df_rips['ULTIMA_MODIFICACION'].iloc[0].date())
+    all_max_dates.append(df_rips['ULTIMA_MODIFICACION'].iloc[-1].date())
+if df_facturacion is not None and not df_facturacion.empty:
+    all_min_dates.append(df_facturacion['FECHA FACTURA'].iloc[0].date())
+    all_max_dates.append(df_facturacion['FECHA FACTURA'].iloc[-1].date())
 
 
 # Asignar valores por defecto si no hay archivos cargados para evitar errores
@@ -455,11 +529,11 @@ if start_date > end_date:
 # --- Filtro de Facturador (Usuario/Nombre) ---
 facturador_options_union = []
 if df_legalizaciones is not None and not df_legalizaciones.empty:
-    facturador_options_union.extend(df_legalizaciones['Usuario'].dropna().astype(str).unique())
-if st.session_state.df_rips is not None and not st.session_state.df_rips.empty:
-    facturador_options_union.extend(st.session_state.df_rips['NOMBRE'].dropna().astype(str).unique())
-if st.session_state.df_facturacion is not None and not st.session_state.df_facturacion.empty:
-    facturador_options_union.extend(st.session_state.df_facturacion['USUARIO'].dropna().astype(str).unique())
+    facturador_options_union.extend(column_values(LEGALIZACIONES["nombre"], legalizaciones_version, 'Usuario', df_legalizaciones))
+if df_rips is not None and not df_rips.empty:
+    facturador_options_union.extend(column_values(RIPS["nombre"], dataset_versions['rips'], 'NOMBRE', df_rips))
+if df_facturacion is not None and not df_facturacion.empty:
+    facturador_options_union.extend(column_values(FACTURACION["nombre"], dataset_versions['facturacion'], 'USUARIO', df_facturacion))
 
 if facturador_options_union:
     facturador_options_union = sorted(list(set(facturador_options_union)))
@@ -485,101 +559,59 @@ else:
     facturador_seleccionado = ['Todos']
 
 
-# --- FILTROS ADICIONALES DE LEGALIZACIONES (DENTRO DE UN EXPANDER) ---
-st.sidebar.header("Filtros Adicionales de Legalizaciones")
-with st.sidebar.expander("Expandir Filtros Adicionales de Legalizaciones"):
-    if df_legalizaciones is not None and not df_legalizaciones.empty:
-        # Filtro por Tipo de Legalización (PPL / Convenios)
-        if 'Tipo_Legalizacion' in df_legalizaciones.columns:
-            tipo_legalizacion_options = ['Todos'] + list(df_legalizaciones['Tipo_Legalizacion'].unique())
-            tipo_legalizacion_seleccionado = st.multiselect(
-                'Filtrar por Tipo de Legalización',
-                options=tipo_legalizacion_options,
-                default=['Todos'] if 'Todos' in tipo_legalizacion_options else [],
-                key="filter_tipo_legalizacion"
-            )
-            # Lógica para manejar 'Todos' en multiselect
-            if 'Todos' in tipo_legalizacion_seleccionado and len(tipo_legalizacion_seleccionado) > 1:
-                tipo_legalizacion_seleccionado = ['Todos']
-                st.info("Cuando 'Todos' está seleccionado, se ignoran las otras selecciones de tipo de legalización.")
-            elif not tipo_legalizacion_seleccionado:
-                tipo_legalizacion_seleccionado = ['Todos']
-                st.info("No se ha seleccionado ningún tipo de legalización. Mostrando todos los tipos.")
-        else:
-            tipo_legalizacion_seleccionado = ['Todos']
-            st.info("Columna 'Tipo_Legalizacion' no encontrada, no se puede filtrar por tipo.")
+# --- Selector de Periodo de Tiempo (aplica a la evolución de todas las secciones) ---
+periodo_seleccionado_label = st.sidebar.selectbox(
+    'Agrupar productividad por:',
+    options=list(PERIODO_TIEMPO_OPTIONS.keys()),
+    key="filter_periodo"
+)
+periodo_seleccionado_code = PERIODO_TIEMPO_OPTIONS[periodo_seleccionado_label]
 
-        # Selector de Periodo de Tiempo (Aplicable a todas las secciones if está visible)
-        periodo_tiempo_options = {
-            "Día": "D",
-            "5 Días": "5D",
-            "Semana": "W",
-            "Mes": "M",
-            "Trimestre": "Q",
-            "Año": "Y"
-        }
-        periodo_seleccionado_label = st.selectbox(
-            'Agrupar productividad por:',
-            options=list(periodo_tiempo_options.keys()),
-            key="filter_periodo"
-        )
-        periodo_seleccionado_code = periodo_tiempo_options[periodo_seleccionado_label]
-    else:
-        st.info("Carga un archivo de legalizaciones para acceder a estos filtros.")
-        tipo_legalizacion_seleccionado = ['Todos']
-        periodo_seleccionado_label = "Día" # Default value even if no data
-        periodo_seleccionado_code = "D" # Default value even if no data
 
+# --- Estado de los filtros globales ---
+# Cada sección depende solo de los filtros declarados en su especificación (spec["filtros"]):
+# sus resultados se memoizan con esas entradas y la versión de su dataset, así que un cambio
+# en un filtro de otra sección no la recalcula. Los filtros propios de cada sección (tipo de
+# legalización, estado de RIPS, tipo de facturación) se agregan dentro de su fragmento.
+filtros = {
+    "fechas": (start_date, end_date),
+    "facturador": facturador_seleccionado,
+    "periodo": periodo_seleccionado_code,
+}
 
-# --- FILTROS ESPECÍFICOS DE RIPS (DENTRO DE UN EXPANDER) ---
-st.sidebar.header("Filtros de RIPS")
-with st.sidebar.expander("Expandir Filtros de RIPS"):
-    if st.session_state.df_rips is not None and not st.session_state.df_rips.empty:
-        unique_rips_statuses = st.session_state.df_rips['ESTADO'].dropna().astype(str).unique().tolist()
-        rips_estado_options = ['Todos'] + sorted(unique_rips_statuses)
-        rips_estado_seleccionado = st.multiselect(
-            'Filtrar RIPS por Estado:',
-            options=rips_estado_options,
-            default=['Todos'] if 'Todos' in rips_estado_options else [],
-            key="filter_rips_estado"
-        )
-        # Lógica para manejar 'Todos' en multiselect
-        if 'Todos' in rips_estado_seleccionado and len(rips_estado_seleccionado) > 1:
-            rips_estado_seleccionado = ['Todos']
-            st.info("Cuando 'Todos' está seleccionado, se ignoran las otras selecciones de estado de RIPS.")
-        elif not rips_estado_seleccionado:
-            rips_estado_seleccionado = ['Todos']
-            st.info("No se ha seleccionado ningún estado de RIPS. Mostrando todos los estados.")
-    else:
-        st.info("Carga el archivo de RIPS para acceder a este filtro.")
-        rips_estado_seleccionado = ['Todos']
 
 
-# --- FILTROS ESPECÍFICOS DE FACTURACIÓN (NUEVO EXPANDER) ---
-st.sidebar.header("Filtros Adicionales de Facturación")
-with st.sidebar.expander("Expandir Filtros Adicionales de Facturación"):
-    if st.session_state.df_facturacion is not None and not st.session_state.df_facturacion.empty:
-        if 'Tipo_Facturacion' in st.session_state.df_facturacion.columns and len(st.session_state.df_facturacion['Tipo_Facturacion'].unique()) > 1:
-            tipo_facturacion_options = ['Todos'] + list(st.session_state.df_facturacion['Tipo_Facturacion'].unique())
-            tipo_facturacion_seleccionado = st.multiselect(
-                'Filtrar por Tipo de Facturación',
-                options=tipo_facturacion_options,
-                default=['Todos'] if 'Todos' in tipo_facturacion_options else [],
-                key="filter_tipo_facturacion"
-            )
-            # Lógica para manejar 'Todos' en multiselect
-            if 'Todos' in tipo_facturacion_seleccionado and len(tipo_facturacion_seleccionado) > 1:
-                tipo_facturacion_seleccionado = ['Todos']
-                st.info("Cuando 'Todos' está seleccionado, se ignoran las otras selecciones de tipo de facturación.")
-            elif not tipo_facturacion_seleccionado:
-                tipo_facturacion_seleccionado = ['Todos']
-                st.info("No se ha seleccionado ningún tipo de facturación. Mostrando todos los tipos.")
-        else:
-            tipo_facturacion_seleccionado = ['Todos']
-            st.info("Columna 'Tipo_Facturacion' no disponible o solo un tipo. Asegúrate que 'PREFIJO' exista y sea válido.")
-    else:
-        st.info("Carga un archivo de facturación para acceder a estos filtros.")
-        tipo_facturacion_seleccionado = ['Todos']
+def dataset_rollup(tipos):
+    """
+    Resumen mensual de los archivos persistentes de los que vienen los datos de la sección (para
+    la vista previa aproximada). None si alguno se subió en esta sesión o aún no tiene resumen.
+    """
+    archivos, versiones = [], []
+    for tipo in tipos:
+        if st.session_state[f"df_{tipo}"] is None:
+            continue
+        filepath = PERSISTED_FILES[tipo]
+        if filepath is None or not os.path.exists(rollup_path(filepath)) or dataset_versions[tipo] != file_version(filepath):
+            return None
+        archivos.append(filepath)
+        versiones.append(f"{dataset_versions[tipo]}|{file_version(rollup_path(filepath))}")
+    return persisted_rollup(tuple(archivos), "+".join(versiones)) if archivos else None
+
+
+def progressive_section_results(spec, version, entradas, df, tipos):
+    """
+    Resumen y evolución de una sección (como section_results) y si son una estimación. Mientras
+    los resultados exactos se calculan, se muestra el aviso y se registran como pendientes.
+    """
+    summary, evolution, pendiente = section_results_or_preview(
+        spec["nombre"], version, entradas, DEFAULT_ENGINE, df, dataset_rollup(tipos),
+        estimar=st.session_state.ejecucion_completa,
+    )
+    if pendiente is not None:
+        st.session_state.resultados_pendientes.append(pendiente)
+        preview_notice(spec["nombre"])
+    return summary, evolution, pendiente is not None
+
 
 # --- Mostrar mensajes de estado de carga debajo de los filtros ---
 st.sidebar.markdown("---")
@@ -591,61 +623,101 @@ for msg_type, msg_text in upload_status_messages:
         st.sidebar.error(msg_text)
     elif msg_type == "info":
         st.sidebar.info(msg_text)
+    elif msg_type == "warning":
+        st.sidebar.warning(msg_text)
+
+# --- Salud de los datos (reporte de calidad de cada archivo, tomado en la ingesta) ---
+if st.sidebar.toggle("Mostrar salud de los datos", key="mostrar_salud_datos"):
+    data_health_panel({
+        ETIQUETAS_ARCHIVO[tipo]: st.session_state[f"df_{tipo}"].attrs
+        for tipo in PERSISTED_FILES if st.session_state[f"df_{tipo}"] is not None
+    })
 
 
 # --- LÓGICA DE FILTRADO Y ANÁLISIS DE LEGALIZACIONES ---
-if df_legalizaciones is not None and not df_legalizaciones.empty:
+@st.fragment
+def seccion_legalizaciones():
     st.markdown("---")
     st.header("Análisis de Legalizaciones")
 
-    df_base_filtered = df_legalizaciones.copy()
-
-    df_base_filtered = df_base_filtered[
-        (df_base_filtered['FECHA_REAL'].dt.date >= start_date) &
-        (df_base_filtered['FECHA_REAL'].dt.date <= end_date)
-    ]
-
-    if 'Todos' not in tipo_legalizacion_seleccionado and 'Tipo_Legalizacion' in df_base_filtered.columns:
-        df_base_filtered = df_base_filtered[df_base_filtered['Tipo_Legalizacion'].isin(tipo_legalizacion_seleccionado)]
-
-    # Filtra por el facturador seleccionado para los gráficos y tablas
-    df_filtered_by_facturador_for_display = df_base_filtered.copy()
-    if 'Todos' not in facturador_seleccionado:
-        df_filtered_by_facturador_for_display = df_filtered_by_facturador_for_display[
-            df_filtered_by_facturador_for_display['Usuario'].isin(facturador_seleccionado)
-        ]
+    # Filtros propios de la sección: al cambiarlos solo se vuelve a ejecutar este fragmento
+    with st.expander("Filtros Adicionales de Legalizaciones"):
+        # Filtro por Tipo de Legalización (PPL / Convenios)
+        if 'Tipo_Legalizacion' in df_legalizaciones.columns:
+            tipo_legalizacion_options = ['Todos'] + column_values(LEGALIZACIONES["nombre"], legalizaciones_version, 'Tipo_Legalizacion', df_legalizaciones)
+            tipo_legalizacion_seleccionado = st.multiselect(
+                'Filtrar por Tipo de Legalización',
+                options=tipo_legalizacion_options,
+                default=['Todos'] if 'Todos' in tipo_legalizacion_options else [],
+                key="filter_tipo_legalizacion"
+            )
+            # Lógica para manejar 'Todos' en multiselect
+            if 'Todos' in tipo_legalizacion_seleccionado and len(tipo_legalizacion_seleccionado) > 1:
+                tipo_legalizacion_seleccionado = ['Todos']
+                st.info("Cuando 'Todos' está seleccionado, se ignoran las otras selecciones de tipo de legalización.")
+            elif not tipo_legalizacion_seleccionado:
+                tipo_legalizacion_seleccionado = ['Todos']
+                st.info("No se ha seleccionado ningún tipo de legalización. Mostrando todos los tipos.")
+        else:
+            tipo_legalizacion_seleccionado = ['Todos']
+            st.info("Columna 'Tipo_Legalizacion' no encontrada, no se puede filtrar por tipo.")
+    filtros_seccion = {**filtros, "tipo_legalizacion": tipo_legalizacion_seleccionado}
 
-    if df_base_filtered.empty:
-        st.warning("No hay datos de legalizaciones para la selección actual de tipo y rango de fechas. Por favor, ajusta tus filtros.")
+    # Filtro (fecha, tipo, facturador) y agrupación en un solo pipeline.
+    # La evolución por periodo solo se calcula cuando se eligen facturadores específicos.
+    entradas_legalizaciones = section_inputs(LEGALIZACIONES, filtros_seccion)
+    summary_legalizaciones_facturador, productivity_df, aproximado = progressive_section_results(
+        LEGALIZACIONES, legalizaciones_version, entradas_legalizaciones, df_legalizaciones, ('ppl', 'convenios')
+    )
 
-    if df_filtered_by_facturador_for_display.empty and 'Todos' not in facturador_seleccionado:
-        st.info("No hay datos de legalizaciones para la selección actual de filtros (Tipo, Rango de Fechas, Facturador).")
+    if summary_legalizaciones_facturador.empty:
+        if 'Todos' in facturador_seleccionado:
+            st.warning("No hay datos de legalizaciones para la selección actual de tipo y rango de fechas. Por favor, ajusta tus filtros.")
+        else:
+            st.info("No hay datos de legalizaciones para la selección actual de filtros (Tipo, Rango de Fechas, Facturador).")
 
 
     # --- NUEVA TABLA: Resumen Acumulado de Legalizaciones por Facturador ---
     st.subheader(f"Resumen Acumulado Total de Legalizaciones por Facturador ({start_date} a {end_date})")
 
-    summary_legalizaciones_facturador = df_filtered_by_facturador_for_display.groupby('Usuario').size().reset_index(name='Total_Legalizaciones_Acumuladas')
-    summary_legalizaciones_facturador = summary_legalizaciones_facturador.sort_values(
-        'Total_Legalizaciones_Acumuladas', ascending=False
-    ).reset_index(drop=True)
-
-    total_general_legalizaciones = summary_legalizaciones_facturador['Total_Legalizaciones_Acumuladas'].sum()
-    if total_general_legalizaciones > 0:
-        summary_legalizaciones_facturador['Porcentaje_del_Total'] = \
-            (summary_legalizaciones_facturador['Total_Legalizaciones_Acumuladas'] / total_general_legalizaciones * 100).round(2)
-        summary_legalizaciones_facturador['Porcentaje_del_Total'] = summary_legalizaciones_facturador['Porcentaje_del_Total'].astype(str) + '%'
-    else:
-        summary_legalizaciones_facturador['Porcentaje_del_Total'] = '0%'
-
-    st.dataframe(summary_legalizaciones_facturador)
+    st.dataframe(add_percentage(summary_legalizaciones_facturador, LEGALIZACIONES))
 
     if summary_legalizaciones_facturador.empty:
         st.info("No hay datos de resumen de legalizaciones para el rango de fechas y tipo seleccionados.")
+    elif not aproximado:
+        export_buttons(
+            "Legalizaciones", "legalizaciones",
+            {
+                "summary_legalizaciones_facturador": add_percentage(summary_legalizaciones_facturador, LEGALIZACIONES),
+                "evolucion_legalizaciones": productivity_df,
+            },
+            filas_filtradas=df_legalizaciones,
+            mascara=functools.partial(
+                filter_mask, df_legalizaciones, LEGALIZACIONES, start_date, end_date,
+                facturador_seleccionado, tipo_legalizacion_seleccionado
+            ),
+        )
+
+    # --- Filas filtradas (tabla paginada en el servidor) ---
+    if st.toggle("Mostrar filas filtradas de Legalizaciones", key="mostrar_filas_legalizaciones"):
+        paginated_table(
+            df_legalizaciones, "tabla_legalizaciones",
+            mask=section_mask(LEGALIZACIONES["nombre"], legalizaciones_version, entradas_legalizaciones, df_legalizaciones),
+            default_sort=LEGALIZACIONES["fecha"],
+        )
+
+    # --- Indicadores de productividad (promedios móviles, acumulado, crecimiento y ranking) ---
+    if st.toggle("Mostrar indicadores de productividad de Legalizaciones", key="mostrar_kpis_legalizaciones"):
+        indicadores_legalizaciones, serie_kpis_legalizaciones = section_kpis(
+            LEGALIZACIONES["nombre"], legalizaciones_version, entradas_legalizaciones, periodo_seleccionado_code, df_legalizaciones
+        )
+        kpi_panel("Legalizaciones", LEGALIZACIONES, indicadores_legalizaciones, serie_kpis_legalizaciones, periodo_seleccionado_label,
+                  mostrar_grafico=not is_todos(facturador_seleccionado))
 
 
     # --- Gráfico de Productividad de LEGALIZACIONES ---
     st.subheader("Visualización de Productividad de Legalizaciones")
+    plt, sns = plotting()
 
     metric_to_display_for_evolution = 'Total_Legalizaciones'
 
@@ -659,11 +731,7 @@ if df_legalizaciones is not None and not df_legalizaciones.empty:
     if 'Todos' in facturador_seleccionado or len(facturador_seleccionado) > 1:
         st.subheader(f"Total Acumulado de Legalizaciones por Facturador (Periodo: {start_date} a {end_date})")
 
-        plot_df_accumulated = df_filtered_by_facturador_for_display.copy()
-        total_legalizaciones_por_usuario_plot = plot_df_accumulated.groupby('Usuario').size().reset_index(name='Total_Legalizaciones_Acumuladas')
-        summary_for_accumulated_plot = total_legalizaciones_por_usuario_plot.sort_values(
-            'Total_Legalizaciones_Acumuladas', ascending=False
-        ).reset_index(drop=True)
+        summary_for_accumulated_plot = summary_legalizaciones_facturador
 
         if not summary_for_accumulated_plot.empty:
             fig_all_fact, ax_all_fact = plt.subplots(figsize=(10, max(6, len(summary_for_accumulated_plot) * 0.5)))
@@ -676,35 +744,14 @@ if df_legalizaciones is not None and not df_legalizaciones.empty:
                 ax_all_fact.bar_label(container, fmt='%.0f', label_type='edge', padding=5)
 
             plt.tight_layout()
-            st.pyplot(fig_all_fact)
+            render_figure(fig_all_fact, "Legalizaciones")
         else:
             st.info("No hay datos para generar el gráfico de total acumulado de legalizaciones con los filtros actuales.")
 
         # --- Gráfico de Comparación de Evolución de Productividad de Legalizaciones (Múltiples Facturadores) ---
         # Solo se muestra este gráfico si 'Todos' NO está en la selección PERO hay más de un facturador.
         if 'Todos' not in facturador_seleccionado and len(facturador_seleccionado) > 1:
-            productivity_comparison_df = df_base_filtered[df_base_filtered['Usuario'].isin(users_to_plot_legalizaciones)].groupby([
-                pd.Grouper(key='FECHA_REAL', freq=periodo_seleccionado_code),
-                'Usuario'
-            ]).size().reset_index(name='Total_Legalizaciones')
-
-            if periodo_seleccionado_code == "D":
-                productivity_comparison_df['Periodo'] = productivity_comparison_df['FECHA_REAL'].dt.strftime('%Y-%m-%d')
-            elif periodo_seleccionado_code == "5D":
-                productivity_comparison_df['Periodo'] = productivity_comparison_df['FECHA_REAL'].dt.strftime('%Y-%m-%d')
-            elif periodo_seleccionado_code == "W":
-                productivity_comparison_df['Periodo'] = productivity_comparison_df['FECHA_REAL'].dt.strftime('Semana %U - %Y')
-            elif periodo_seleccionado_code == "M":
-                productivity_comparison_df['Periodo'] = productivity_comparison_df['FECHA_REAL'].dt.strftime('%Y-%m')
-            elif periodo_seleccionado_code == "Q":
-                productivity_comparison_df['Periodo'] = productivity_comparison_df['FECHA_REAL'].dt.to_period('Q').astype(str)
-            elif periodo_seleccionado_code == "Y":
-                productivity_comparison_df['Periodo'] = productivity_comparison_df['FECHA_REAL'].dt.year.astype(str)
-            else:
-                productivity_comparison_df['Periodo'] = productivity_comparison_df['FECHA_REAL'].dt.strftime('%Y-%m-%d')
-
-            productivity_comparison_df.drop(columns=['FECHA_REAL'], inplace=True)
-            productivity_comparison_df.sort_values(by=['Periodo', 'Usuario'], inplace=True)
+            productivity_comparison_df = productivity_df
 
             if not productivity_comparison_df.empty:
                 st.subheader(f"Comparación de Evolución de Legalizaciones por Facturador ({periodo_seleccionado_label})")
@@ -720,14 +767,14 @@ if df_legalizaciones is not None and not df_legalizaciones.empty:
                 for idx, row in productivity_comparison_df.iterrows():
                     user_list_for_indexing = list(users_to_plot_legalizaciones) # Asegúrate de que esta lista contenga los usuarios reales a graficar
                     if row['Usuario'] in user_list_for_indexing:
-                        color_index = user_list_for_indexing.index(row['Usuario']) % len(sns.color_palette('tab10'))
+                        color_index = user_list_for_indexing.index(row['Usuario']) % len(palette('tab10'))
                         ax_comp.text(row['Periodo'], row['Total_Legalizaciones'] + 0.5,
                                      f'{int(row["Total_Legalizaciones"])}',
-                                     color=sns.color_palette('tab10')[color_index],
+                                     color=palette('tab10')[color_index],
                                      ha='center', va='bottom', fontsize=8)
 
                 plt.tight_layout()
-                st.pyplot(fig_comp)
+                render_figure(fig_comp, "Legalizaciones")
             else:
                 st.info("No hay datos para comparar la evolución de legalizaciones con los filtros actuales.")
 
@@ -735,32 +782,8 @@ if df_legalizaciones is not None and not df_legalizaciones.empty:
     elif len(facturador_seleccionado) == 1 and 'Todos' not in facturador_seleccionado:
         st.subheader(f"Evolución de Productividad de Legalizaciones para {facturador_seleccionado[0]}")
 
-        # Cálculo de Productividad para la Tabla por Periodo (LEGALIZACIONES) - solo para el gráfico de evolución individual
-        productivity_df = df_filtered_by_facturador_for_display.groupby([
-            pd.Grouper(key='FECHA_REAL', freq=periodo_seleccionado_code),
-            'Usuario'
-        ]).size().reset_index(name='Total_Legalizaciones')
-
-        if periodo_seleccionado_code == "D":
-            productivity_df['Periodo'] = productivity_df['FECHA_REAL'].dt.strftime('%Y-%m-%d')
-        elif periodo_seleccionado_code == "5D":
-            productivity_df['Periodo'] = productivity_df['FECHA_REAL'].dt.strftime('%Y-%m-%d')
-        elif periodo_seleccionado_code == "W":
-            productivity_df['Periodo'] = productivity_df['FECHA_REAL'].dt.strftime('Semana %U - %Y')
-        elif periodo_seleccionado_code == "M":
-            productivity_df['Periodo'] = productivity_df['FECHA_REAL'].dt.strftime('%Y-%m')
-        elif periodo_seleccionado_code == "Q":
-            productivity_df['Periodo'] = productivity_df['FECHA_REAL'].dt.to_period('Q').astype(str)
-        elif periodo_seleccionado_code == "Y":
-            productivity_df['Periodo'] = productivity_df['FECHA_REAL'].dt.year.astype(str)
-        else:
-            productivity_df['Periodo'] = productivity_df['FECHA_REAL'].dt.strftime('%Y-%m-%d')
-
-        productivity_df.drop(columns=['FECHA_REAL'], inplace=True)
-        productivity_df.set_index('Periodo', inplace=True)
-        productivity_df.sort_index(inplace=True)
-
-        facturador_evolution_df = productivity_df[productivity_df['Usuario'] == facturador_seleccionado[0]].reset_index().sort_values('Periodo')
+        # La evolución por periodo ya viene filtrada por el facturador seleccionado
+        facturador_evolution_df = productivity_df
 
         if not facturador_evolution_df.empty:
             fig_fact_evol, ax_fact_evol = plt.subplots(figsize=(12, 6))
@@ -776,70 +799,100 @@ if df_legalizaciones is not None and not df_legalizaciones.empty:
                 ax_fact_evol.text(x, y + 0.5, f'{int(y)}', color='darkblue', ha='center', va='bottom', fontsize=9)
 
             plt.tight_layout()
-            st.pyplot(fig_fact_evol)
+            render_figure(fig_fact_evol, "Legalizaciones")
         else:
             st.info("No hay datos para mostrar la evolución del facturador de legalizaciones seleccionado con los filtros actuales.")
     else:
         st.info("No hay datos de legalizaciones válidos cargados para realizar análisis o tu selección de facturadores no es válida.")
 
+
+if df_legalizaciones is not None and not df_legalizaciones.empty:
+    seccion_legalizaciones()
 else:
     st.info("No hay datos de legalizaciones válidos cargados para realizar análisis.")
 
 # --- LÓGICA DE FILTRADO Y ANÁLISIS DE RIPS ---
-if st.session_state.df_rips is not None and not st.session_state.df_rips.empty:
+@st.fragment
+def seccion_rips():
     st.markdown("---")
     st.header("Análisis de RIPS")
 
-    df_rips_base_filtered = st.session_state.df_rips.copy()
-
-    df_rips_base_filtered = df_rips_base_filtered[
-        (df_rips_base_filtered['ULTIMA_MODIFICACION'].dt.date >= start_date) &
-        (df_rips_base_filtered['ULTIMA_MODIFICACION'].dt.date <= end_date)
-    ].copy()
-
-    if 'Todos' not in rips_estado_seleccionado:
-        df_rips_filtered_by_estado = df_rips_base_filtered[
-            df_rips_base_filtered['ESTADO'].isin(rips_estado_seleccionado)
-        ]
-    else:
-        df_rips_filtered_by_estado = df_rips_base_filtered.copy()
+    # Filtros propios de la sección: al cambiarlos solo se vuelve a ejecutar este fragmento
+    with st.expander("Filtros de RIPS"):
+        unique_rips_statuses = column_values(RIPS["nombre"], dataset_versions['rips'], 'ESTADO', df_rips)
+        rips_estado_options = ['Todos'] + sorted(unique_rips_statuses)
+        rips_estado_seleccionado = st.multiselect(
+            'Filtrar RIPS por Estado:',
+            options=rips_estado_options,
+            default=['Todos'] if 'Todos' in rips_estado_options else [],
+            key="filter_rips_estado"
+        )
+        # Lógica para manejar 'Todos' en multiselect
+        if 'Todos' in rips_estado_seleccionado and len(rips_estado_seleccionado) > 1:
+            rips_estado_seleccionado = ['Todos']
+            st.info("Cuando 'Todos' está seleccionado, se ignoran las otras selecciones de estado de RIPS.")
+        elif not rips_estado_seleccionado:
+            rips_estado_seleccionado = ['Todos']
+            st.info("No se ha seleccionado ningún estado de RIPS. Mostrando todos los estados.")
+    filtros_seccion = {**filtros, "rips_estado": rips_estado_seleccionado}
 
-    df_rips_final_filtered = df_rips_filtered_by_estado.copy()
-    if 'Todos' not in facturador_seleccionado:
-        df_rips_final_filtered = df_rips_final_filtered[
-            df_rips_final_filtered['NOMBRE'].isin(facturador_seleccionado)
-        ]
+    # Filtro (fecha, estado, facturador) y agrupación en un solo pipeline
+    entradas_rips = section_inputs(RIPS, filtros_seccion)
+    summary_rips_facturador, rips_evolution_df, aproximado = progressive_section_results(
+        RIPS, dataset_versions['rips'], entradas_rips, df_rips, ('rips',)
+    )
 
-    if df_rips_final_filtered.empty:
+    if summary_rips_facturador.empty:
         st.info(f"No hay RIPS con estado '{', '.join(rips_estado_seleccionado)}' para los filtros de fecha y facturador seleccionados.")
     else:
         st.subheader(f"Resumen Acumulado Total de RIPS ({', '.join(rips_estado_seleccionado)}) por Facturador ({start_date} a {end_date})")
 
-        summary_rips_facturador_table_df = df_rips_filtered_by_estado.copy()
-        if 'Todos' not in facturador_seleccionado:
-            summary_rips_facturador_table_df = summary_rips_facturador_table_df[
-                summary_rips_facturador_table_df['NOMBRE'].isin(facturador_seleccionado)
-            ]
-
-        summary_rips_facturador = summary_rips_facturador_table_df.groupby('NOMBRE').size().reset_index(name=f'Total_RIPS_Acumulados')
-        summary_rips_facturador = summary_rips_facturador.sort_values(
-            f'Total_RIPS_Acumulados', ascending=False
-        ).reset_index(drop=True)
-
-        total_general_rips = summary_rips_facturador[f'Total_RIPS_Acumulados'].sum()
-        if total_general_rips > 0:
-            summary_rips_facturador['Porcentaje_del_Total'] = \
-                (summary_rips_facturador[f'Total_RIPS_Acumulados'] / total_general_rips * 100).round(2)
-            summary_rips_facturador['Porcentaje_del_Total'] = summary_rips_facturador['Porcentaje_del_Total'].astype(str) + '%'
-        else:
-            summary_rips_facturador['Porcentaje_del_Total'] = '0%'
+        st.dataframe(add_percentage(summary_rips_facturador, RIPS))
+        # Las estimaciones no se exportan: se espera a los resultados exactos
+        if not aproximado:
+            export_buttons(
+                "RIPS", "rips",
+                {
+                    "summary_rips_facturador": add_percentage(summary_rips_facturador, RIPS),
+                    "evolucion_rips": rips_evolution_df,
+                },
+                filas_filtradas=df_rips,
+                mascara=functools.partial(
+                    filter_mask, df_rips, RIPS, start_date, end_date,
+                    facturador_seleccionado, rips_estado_seleccionado
+                ),
+            )
 
-        st.dataframe(summary_rips_facturador)
-        if summary_rips_facturador.empty:
-            st.info("No hay datos de resumen de RIPS para el rango de fechas, estado y facturador seleccionados.")
+        # --- Filas filtradas (tabla paginada en el servidor) ---
+        if st.toggle("Mostrar filas filtradas de RIPS", key="mostrar_filas_rips"):
+            paginated_table(
+                df_rips, "tabla_rips",
+                mask=section_mask(RIPS["nombre"], dataset_versions['rips'], entradas_rips, df_rips),
+                default_sort=RIPS["fecha"],
+            )
 
+        # --- Indicadores de productividad (promedios móviles, acumulado, crecimiento y ranking) ---
+        if st.toggle("Mostrar indicadores de productividad de RIPS", key="mostrar_kpis_rips"):
+            indicadores_rips, serie_kpis_rips = section_kpis(
+                RIPS["nombre"], dataset_versions['rips'], entradas_rips, periodo_seleccionado_code, df_rips
+            )
+            kpi_panel("RIPS", RIPS, indicadores_rips, serie_kpis_rips, periodo_seleccionado_label,
+                      mostrar_grafico=not is_todos(facturador_seleccionado))
+
+        # --- Historial de estados (tiempo en cada estado y backlog, a partir del registro de cambios) ---
+        if st.toggle("Mostrar historial de estados de RIPS", key="mostrar_historial_rips"):
+            version_eventos = events_version(RIPS_EVENTS_DIR)
+            if version_eventos == "0":
+                st.info(f"Aún no hay historial de estados de RIPS. Se registra cada vez que se guardan los datos "
+                        f"(los registros se identifican por la columna '{RIPS_KEY}').")
+            else:
+                resumen_estados, backlog_estados = rips_history_results(
+                    version_eventos, RIPS_EVENTS_DIR, datetime.date.today(), entradas_rips, periodo_seleccionado_code
+                )
+                rips_history_panel(resumen_estados, backlog_estados, periodo_seleccionado_label)
 
         st.subheader("Visualización de Productividad de RIPS")
+        plt, sns = plotting()
 
         # Lógica condicional para RIPS
         users_to_plot_rips = facturador_seleccionado
@@ -848,11 +901,8 @@ if st.session_state.df_rips is not None and not st.session_state.df_rips.empty:
         if 'Todos' in facturador_seleccionado or len(facturador_seleccionado) > 1:
             st.subheader(f"Total Acumulado de RIPS ({', '.join(rips_estado_seleccionado)}) por Facturador (Periodo: {start_date} a {end_date})")
 
-            plot_df_accumulated_rips = df_rips_filtered_by_estado.copy()
-            if 'Todos' not in facturador_seleccionado:
-                plot_df_accumulated_rips = plot_df_accumulated_rips[plot_df_accumulated_rips['NOMBRE'].isin(facturador_seleccionado)]
-
-            rips_accumulated_by_user = plot_df_accumulated_rips.groupby('NOMBRE').size().reset_index(name='Total_RIPS_Acumulados')
+            # Las barras de RIPS se muestran en orden alfabético de facturador
+            rips_accumulated_by_user = summary_rips_facturador.sort_values('NOMBRE').reset_index(drop=True)
 
             if not rips_accumulated_by_user.empty:
                 fig_all_rips_fact, ax_all_rips_fact = plt.subplots(figsize=(10, max(6, len(rips_accumulated_by_user) * 0.5)))
@@ -865,34 +915,13 @@ if st.session_state.df_rips is not None and not st.session_state.df_rips.empty:
                     ax_all_rips_fact.bar_label(container, fmt='%.0f', label_type='edge', padding=5)
 
                 plt.tight_layout()
-                st.pyplot(fig_all_rips_fact)
+                render_figure(fig_all_rips_fact, "RIPS")
             else:
                 st.info(f"No hay datos para generar el gráfico de total acumulado de RIPS ({', '.join(rips_estado_seleccionado)}) con los filtros actuales.")
 
             # --- Gráfico de Comparación de Evolución de Productividad de RIPS (Múltiples Facturadores) ---
             if 'Todos' not in facturador_seleccionado and len(facturador_seleccionado) > 1:
-                rips_comparison_df = df_rips_filtered_by_estado[df_rips_filtered_by_estado['NOMBRE'].isin(users_to_plot_rips)].groupby([
-                    pd.Grouper(key='ULTIMA_MODIFICACION', freq=periodo_seleccionado_code),
-                    'NOMBRE'
-                ]).size().reset_index(name='Total_RIPS')
-
-                if periodo_seleccionado_code == "D":
-                    rips_comparison_df['Periodo'] = rips_comparison_df['ULTIMA_MODIFICACION'].dt.strftime('%Y-%m-%d')
-                elif periodo_seleccionado_code == "5D":
-                    rips_comparison_df['Periodo'] = rips_comparison_df['ULTIMA_MODIFICACION'].dt.strftime('%Y-%m-%d')
-                elif periodo_seleccionado_code == "W":
-                    rips_comparison_df['Periodo'] = rips_comparison_df['ULTIMA_MODIFICACION'].dt.strftime('Semana %U - %Y')
-                elif periodo_seleccionado_code == "M":
-                    rips_comparison_df['Periodo'] = rips_comparison_df['ULTIMA_MODIFICACION'].dt.strftime('%Y-%m')
-                elif periodo_seleccionado_code == "Q":
-                    rips_comparison_df['Periodo'] = rips_comparison_df['ULTIMA_MODIFICACION'].dt.to_period('Q').astype(str)
-                elif periodo_seleccionado_code == "Y":
-                    rips_comparison_df['Periodo'] = rips_comparison_df['ULTIMA_MODIFICACION'].dt.year.astype(str)
-                else:
-                    rips_comparison_df['Periodo'] = rips_comparison_df['ULTIMA_MODIFICACION'].dt.strftime('%Y-%m-%d')
-
-                rips_comparison_df.drop(columns=['ULTIMA_MODIFICACION'], inplace=True)
-                rips_comparison_df.sort_values(by=['Periodo', 'NOMBRE'], inplace=True)
+                rips_comparison_df = rips_evolution_df
 
                 if not rips_comparison_df.empty:
                     st.subheader(f"Comparación de Evolución de RIPS ({', '.join(rips_estado_seleccionado)}) por Facturador ({periodo_seleccionado_label})")
@@ -908,14 +937,14 @@ if st.session_state.df_rips is not None and not st.session_state.df_rips.empty:
                     for idx, row in rips_comparison_df.iterrows():
                         user_list_for_indexing_rips = list(users_to_plot_rips)
                         if row['NOMBRE'] in user_list_for_indexing_rips:
-                            color_index_rips = user_list_for_indexing_rips.index(row['NOMBRE']) % len(sns.color_palette('viridis'))
+                            color_index_rips = user_list_for_indexing_rips.index(row['NOMBRE']) % len(palette('viridis'))
                             ax_rips_comp.text(row['Periodo'], row['Total_RIPS'] + 0.5,
                                               f'{int(row["Total_RIPS"])}',
-                                              color=sns.color_palette('viridis')[color_index_rips],
+                                              color=palette('viridis')[color_index_rips],
                                               ha='center', va='bottom', fontsize=8)
 
                     plt.tight_layout()
-                    st.pyplot(fig_rips_comp)
+                    render_figure(fig_rips_comp, "RIPS")
                 else:
                     st.info("No hay datos para comparar la evolución de RIPS con los filtros actuales.")
 
@@ -924,31 +953,7 @@ if st.session_state.df_rips is not None and not st.session_state.df_rips.empty:
         elif len(facturador_seleccionado) == 1 and 'Todos' not in facturador_seleccionado:
             st.subheader(f"Evolución de Productividad de RIPS para {facturador_seleccionado[0]}")
 
-            rips_evolution_df = df_rips_final_filtered.groupby([
-                pd.Grouper(key='ULTIMA_MODIFICACION', freq=periodo_seleccionado_code),
-                'NOMBRE'
-            ]).size().reset_index(name='Total_RIPS')
-
-            if periodo_seleccionado_code == "D":
-                rips_evolution_df['Periodo'] = rips_evolution_df['ULTIMA_MODIFICACION'].dt.strftime('%Y-%m-%d')
-            elif periodo_seleccionado_code == "5D":
-                rips_evolution_df['Periodo'] = rips_evolution_df['ULTIMA_MODIFICACION'].dt.strftime('%Y-%m-%d')
-            elif periodo_seleccionado_code == "W":
-                rips_evolution_df['Periodo'] = rips_evolution_df['ULTIMA_MODIFICACION'].dt.strftime('Semana %U - %Y')
-            elif periodo_seleccionado_code == "M":
-                rips_evolution_df['Periodo'] = rips_evolution_df['ULTIMA_MODIFICACION'].dt.strftime('%Y-%m')
-            elif periodo_seleccionado_code == "Q":
-                rips_evolution_df['Periodo'] = rips_evolution_df['ULTIMA_MODIFICACION'].dt.to_period('Q').astype(str)
-            elif periodo_seleccionado_code == "Y":
-                rips_evolution_df['Periodo'] = rips_evolution_df['ULTIMA_MODIFICACION'].dt.year.astype(str)
-            else:
-                rips_evolution_df['Periodo'] = rips_evolution_df['ULTIMA_MODIFICACION'].dt.strftime('%Y-%m-%d')
-
-            rips_evolution_df.drop(columns=['ULTIMA_MODIFICACION'], inplace=True)
-            rips_evolution_df.set_index('Periodo', inplace=True)
-            rips_evolution_df.sort_index(inplace=True)
-
-            facturador_rips_evolution_df = rips_evolution_df[rips_evolution_df['NOMBRE'] == facturador_seleccionado[0]].reset_index().sort_values('Periodo')
+            facturador_rips_evolution_df = rips_evolution_df
 
             if not facturador_rips_evolution_df.empty:
                 fig_rips_evol, ax_rips_evol = plt.subplots(figsize=(12, 6))
@@ -964,68 +969,93 @@ if st.session_state.df_rips is not None and not st.session_state.df_rips.empty:
                     ax_rips_evol.text(x, y + 0.5, f'{int(y)}', color='darkgreen', ha='center', va='bottom', fontsize=9)
 
                 plt.tight_layout()
-                st.pyplot(fig_rips_evol)
+                render_figure(fig_rips_evol, "RIPS")
             else:
                 st.info(f"No hay datos de RIPS ({', '.join(rips_estado_seleccionado)}) para mostrar la evolución del facturador seleccionado con los filtros actuales.")
         else:
             st.info("No hay datos de RIPS válidos cargados para realizar análisis o tu selección de facturadores no es válida.")
 
+
+if df_rips is not None and not df_rips.empty:
+    seccion_rips()
 else:
     st.info("Por favor, sube el archivo de RIPS para ver el análisis de RIPS por facturador.")
 
 
 # --- LÓGICA DE FILTRADO Y ANÁLISIS DE FACTURACIÓN ---
-if st.session_state.df_facturacion is not None and not st.session_state.df_facturacion.empty:
+@st.fragment
+def seccion_facturacion():
     st.markdown("---")
     st.header("Análisis de Facturación")
 
-    df_facturacion_base_filtered = st.session_state.df_facturacion[
-        (st.session_state.df_facturacion['FECHA FACTURA'].dt.date >= start_date) &
-        (st.session_state.df_facturacion['FECHA FACTURA'].dt.date <= end_date)
-    ].copy()
-
-    if 'Todos' not in tipo_facturacion_seleccionado and 'Tipo_Facturacion' in df_facturacion_base_filtered.columns:
-        df_facturacion_filtered_by_type = df_facturacion_base_filtered[df_facturacion_base_filtered['Tipo_Facturacion'].isin(tipo_facturacion_seleccionado)]
-    else:
-        df_facturacion_filtered_by_type = df_facturacion_base_filtered.copy()
-
-    df_facturacion_final_display = df_facturacion_filtered_by_type.copy()
-    if 'Todos' not in facturador_seleccionado:
-        df_facturacion_final_display = df_facturacion_final_display[
-            df_facturacion_final_display['USUARIO'].isin(facturador_seleccionado)
-        ]
+    # Filtros propios de la sección: al cambiarlos solo se vuelve a ejecutar este fragmento
+    with st.expander("Filtros Adicionales de Facturación"):
+        tipos_facturacion = column_values(FACTURACION["nombre"], dataset_versions['facturacion'], 'Tipo_Facturacion', df_facturacion) if 'Tipo_Facturacion' in df_facturacion.columns else []
+        if len(tipos_facturacion) > 1:
+            tipo_facturacion_options = ['Todos'] + tipos_facturacion
+            tipo_facturacion_seleccionado = st.multiselect(
+                'Filtrar por Tipo de Facturación',
+                options=tipo_facturacion_options,
+                default=['Todos'] if 'Todos' in tipo_facturacion_options else [],
+                key="filter_tipo_facturacion"
+            )
+            # Lógica para manejar 'Todos' en multiselect
+            if 'Todos' in tipo_facturacion_seleccionado and len(tipo_facturacion_seleccionado) > 1:
+                tipo_facturacion_seleccionado = ['Todos']
+                st.info("Cuando 'Todos' está seleccionado, se ignoran las otras selecciones de tipo de facturación.")
+            elif not tipo_facturacion_seleccionado:
+                tipo_facturacion_seleccionado = ['Todos']
+                st.info("No se ha seleccionado ningún tipo de facturación. Mostrando todos los tipos.")
+        else:
+            tipo_facturacion_seleccionado = ['Todos']
+            st.info("Columna 'Tipo_Facturacion' no disponible o solo un tipo. Asegúrate que 'PREFIJO' exista y sea válido.")
+    filtros_seccion = {**filtros, "tipo_facturacion": tipo_facturacion_seleccionado}
 
+    # Filtro (fecha, tipo, facturador) y agrupación en un solo pipeline
+    entradas_facturacion = section_inputs(FACTURACION, filtros_seccion)
+    summary_facturacion_facturador, facturacion_evolution_df, aproximado = progressive_section_results(
+        FACTURACION, dataset_versions['facturacion'], entradas_facturacion, df_facturacion, ('facturacion',)
+    )
 
-    if df_facturacion_final_display.empty:
+    if summary_facturacion_facturador.empty:
         st.info(f"No hay datos de Facturación para el tipo '{', '.join(tipo_facturacion_seleccionado)}', facturador '{', '.join(facturador_seleccionado)}' y el rango de fechas seleccionados.")
     else:
         st.subheader(f"Resumen Acumulado Total de Facturación por Facturador ({start_date} a {end_date})")
 
-        summary_facturacion_facturador_table_df = df_facturacion_filtered_by_type.copy()
-        if 'Todos' not in facturador_seleccionado:
-            summary_facturacion_facturador_table_df = summary_facturacion_facturador_table_df[
-                summary_facturacion_facturador_table_df['USUARIO'].isin(facturador_seleccionado)
-            ]
-
-        summary_facturacion_facturador = summary_facturacion_facturador_table_df.groupby('USUARIO').size().reset_index(name='Total_Facturacion_Acumulada')
-        summary_facturacion_facturador = summary_facturacion_facturador.sort_values(
-            'Total_Facturacion_Acumulada', ascending=False
-        ).reset_index(drop=True)
-
-        total_general_facturacion = summary_facturacion_facturador['Total_Facturacion_Acumulada'].sum()
-        if total_general_facturacion > 0:
-            summary_facturacion_facturador['Porcentaje_del_Total'] = \
-                (summary_facturacion_facturador['Total_Facturacion_Acumulada'] / total_general_facturacion * 100).round(2)
-            summary_facturacion_facturador['Porcentaje_del_Total'] = summary_facturacion_facturador['Porcentaje_del_Total'].astype(str) + '%'
-        else:
-            summary_facturacion_facturador['Porcentaje_del_Total'] = '0%'
+        st.dataframe(add_percentage(summary_facturacion_facturador, FACTURACION))
+        # Las estimaciones no se exportan: se espera a los resultados exactos
+        if not aproximado:
+            export_buttons(
+                "Facturación", "facturacion",
+                {
+                    "summary_facturacion_facturador": add_percentage(summary_facturacion_facturador, FACTURACION),
+                    "evolucion_facturacion": facturacion_evolution_df,
+                },
+                filas_filtradas=df_facturacion,
+                mascara=functools.partial(
+                    filter_mask, df_facturacion, FACTURACION, start_date, end_date,
+                    facturador_seleccionado, tipo_facturacion_seleccionado
+                ),
+            )
 
-        st.dataframe(summary_facturacion_facturador)
-        if summary_facturacion_facturador.empty:
-            st.info("No hay datos de resumen de Facturación para el rango de fechas, tipo y facturador seleccionados.")
+        # --- Filas filtradas (tabla paginada en el servidor) ---
+        if st.toggle("Mostrar filas filtradas de Facturación", key="mostrar_filas_facturacion"):
+            paginated_table(
+                df_facturacion, "tabla_facturacion",
+                mask=section_mask(FACTURACION["nombre"], dataset_versions['facturacion'], entradas_facturacion, df_facturacion),
+                default_sort=FACTURACION["fecha"],
+            )
 
+        # --- Indicadores de productividad (promedios móviles, acumulado, crecimiento y ranking) ---
+        if st.toggle("Mostrar indicadores de productividad de Facturación", key="mostrar_kpis_facturacion"):
+            indicadores_facturacion, serie_kpis_facturacion = section_kpis(
+                FACTURACION["nombre"], dataset_versions['facturacion'], entradas_facturacion, periodo_seleccionado_code, df_facturacion
+            )
+            kpi_panel("Facturación", FACTURACION, indicadores_facturacion, serie_kpis_facturacion, periodo_seleccionado_label,
+                      mostrar_grafico=not is_todos(facturador_seleccionado))
 
         st.subheader("Visualización de Productividad de Facturación")
+        plt, sns = plotting()
 
         # Lógica condicional para Facturación
         users_to_plot_facturacion = facturador_seleccionado
@@ -1034,11 +1064,8 @@ if st.session_state.df_facturacion is not None and not st.session_state.df_factu
         if 'Todos' in facturador_seleccionado or len(facturador_seleccionado) > 1:
             st.subheader(f"Total Acumulado de Facturación por Facturador (Periodo: {start_date} a {end_date})")
 
-            plot_df_accumulated_fact = df_facturacion_filtered_by_type.copy()
-            if 'Todos' not in facturador_seleccionado:
-                plot_df_accumulated_fact = plot_df_accumulated_fact[plot_df_accumulated_fact['USUARIO'].isin(facturador_seleccionado)]
-
-            facturacion_accumulated_by_user = plot_df_accumulated_fact.groupby('USUARIO').size().reset_index(name='Total_Facturacion_Acumulada')
+            # Las barras de Facturación se muestran en orden alfabético de facturador
+            facturacion_accumulated_by_user = summary_facturacion_facturador.sort_values('USUARIO').reset_index(drop=True)
 
             if not facturacion_accumulated_by_user.empty:
                 fig_all_facturacion_fact, ax_all_facturacion_fact = plt.subplots(figsize=(10, max(6, len(facturacion_accumulated_by_user) * 0.5)))
@@ -1051,34 +1078,13 @@ if st.session_state.df_facturacion is not None and not st.session_state.df_factu
                     ax_all_facturacion_fact.bar_label(container, fmt='%.0f', label_type='edge', padding=5)
 
                 plt.tight_layout()
-                st.pyplot(fig_all_facturacion_fact)
+                render_figure(fig_all_facturacion_fact, "Facturación")
             else:
                 st.info("No hay datos para generar el gráfico de total acumulado de facturación con los filtros actuales.")
 
             # --- Nuevo Gráfico de Comparación de Productividad de Facturación (Múltiples Facturadores) ---
             if 'Todos' not in facturador_seleccionado and len(facturador_seleccionado) > 1:
-                facturacion_comparison_df = df_facturacion_filtered_by_type[df_facturacion_filtered_by_type['USUARIO'].isin(users_to_plot_facturacion)].groupby([
-                    pd.Grouper(key='FECHA FACTURA', freq=periodo_seleccionado_code),
-                    'USUARIO'
-                ]).size().reset_index(name='Total_Facturacion')
-
-                if periodo_seleccionado_code == "D":
-                    facturacion_comparison_df['Periodo'] = facturacion_comparison_df['FECHA FACTURA'].dt.strftime('%Y-%m-%d')
-                elif periodo_seleccionado_code == "5D":
-                    facturacion_comparison_df['Periodo'] = facturacion_comparison_df['FECHA FACTURA'].dt.strftime('%Y-%m-%d')
-                elif periodo_seleccionado_code == "W":
-                    facturacion_comparison_df['Periodo'] = facturacion_comparison_df['FECHA FACTURA'].dt.strftime('Semana %U - %Y')
-                elif periodo_seleccionado_code == "M":
-                    facturacion_comparison_df['Periodo'] = facturacion_comparison_df['FECHA FACTURA'].dt.strftime('%Y-%m')
-                elif periodo_seleccionado_code == "Q":
-                    facturacion_comparison_df['Periodo'] = facturacion_comparison_df['FECHA FACTURA'].dt.to_period('Q').astype(str)
-                elif periodo_seleccionado_code == "Y":
-                    facturacion_comparison_df['Periodo'] = facturacion_comparison_df['FECHA FACTURA'].dt.year.astype(str)
-                else:
-                    facturacion_comparison_df['Periodo'] = facturacion_comparison_df['FECHA FACTURA'].dt.strftime('%Y-%m-%d')
-
-                facturacion_comparison_df.drop(columns=['FECHA FACTURA'], inplace=True)
-                facturacion_comparison_df.sort_values(by=['Periodo', 'USUARIO'], inplace=True)
+                facturacion_comparison_df = facturacion_evolution_df
 
                 if not facturacion_comparison_df.empty:
                     st.subheader(f"Comparación de Evolución de Facturación por Facturador ({periodo_seleccionado_label})")
@@ -1094,14 +1100,14 @@ if st.session_state.df_facturacion is not None and not st.session_state.df_factu
                     for idx, row in facturacion_comparison_df.iterrows():
                         user_list_for_indexing_facturacion = list(users_to_plot_facturacion)
                         if row['USUARIO'] in user_list_for_indexing_facturacion:
-                            color_index_facturacion = user_list_for_indexing_facturacion.index(row['USUARIO']) % len(sns.color_palette('cividis'))
+                            color_index_facturacion = user_list_for_indexing_facturacion.index(row['USUARIO']) % len(palette('cividis'))
                             ax_fact_comp.text(row['Periodo'], row['Total_Facturacion'] + 0.5,
                                               f'{int(row["Total_Facturacion"])}',
-                                              color=sns.color_palette('cividis')[color_index_facturacion],
+                                              color=palette('cividis')[color_index_facturacion],
                                               ha='center', va='bottom', fontsize=8)
 
                     plt.tight_layout()
-                    st.pyplot(fig_fact_comp)
+                    render_figure(fig_fact_comp, "Facturación")
                 else:
                     st.info("No hay datos para comparar la evolución de facturación con los filtros actuales.")
 
@@ -1110,31 +1116,7 @@ if st.session_state.df_facturacion is not None and not st.session_state.df_factu
         elif len(facturador_seleccionado) == 1 and 'Todos' not in facturador_seleccionado:
             st.subheader(f"Evolución de Productividad de Facturación para {facturador_seleccionado[0]}")
 
-            facturacion_evolution_df = df_facturacion_final_display.groupby([
-                pd.Grouper(key='FECHA FACTURA', freq=periodo_seleccionado_code),
-                'USUARIO'
-            ]).size().reset_index(name='Total_Facturacion')
-
-            if periodo_seleccionado_code == "D":
-                facturacion_evolution_df['Periodo'] = facturacion_evolution_df['FECHA FACTURA'].dt.strftime('%Y-%m-%d')
-            elif periodo_seleccionado_code == "5D":
-                facturacion_evolution_df['Periodo'] = facturacion_evolution_df['FECHA FACTURA'].dt.strftime('%Y-%m-%d')
-            elif periodo_seleccionado_code == "W":
-                facturacion_evolution_df['Periodo'] = facturacion_evolution_df['FECHA FACTURA'].dt.strftime('Semana %U - %Y')
-            elif periodo_seleccionado_code == "M":
-                facturacion_evolution_df['Periodo'] = facturacion_evolution_df['FECHA FACTURA'].dt.strftime('%Y-%m')
-            elif periodo_seleccionado_code == "Q":
-                facturacion_evolution_df['Periodo'] = facturacion_evolution_df['FECHA FACTURA'].dt.to_period('Q').astype(str)
-            elif periodo_seleccionado_code == "Y":
-                facturacion_evolution_df['Periodo'] = facturacion_evolution_df['FECHA FACTURA'].dt.year.astype(str)
-            else:
-                facturacion_evolution_df['Periodo'] = facturacion_evolution_df['FECHA FACTURA'].dt.strftime('%Y-%m-%d')
-
-            facturacion_evolution_df.drop(columns=['FECHA FACTURA'], inplace=True)
-            facturacion_evolution_df.set_index('Periodo', inplace=True)
-            facturacion_evolution_df.sort_index(inplace=True)
-
-            facturador_facturacion_evolution_df = facturacion_evolution_df[facturacion_evolution_df['USUARIO'] == facturador_seleccionado[0]].reset_index().sort_values('Periodo')
+            facturador_facturacion_evolution_df = facturacion_evolution_df
 
             if not facturador_facturacion_evolution_df.empty:
                 fig_facturacion_evol, ax_facturacion_evol = plt.subplots(figsize=(12, 6))
@@ -1150,15 +1132,117 @@ if st.session_state.df_facturacion is not None and not st.session_state.df_factu
                     ax_facturacion_evol.text(x, y + 0.5, f'{int(y)}', color='darkorange', ha='center', va='bottom', fontsize=9)
 
                 plt.tight_layout()
-                st.pyplot(fig_facturacion_evol)
+                render_figure(fig_facturacion_evol, "Facturación")
             else:
                 st.info(f"No hay datos de Facturación para mostrar la evolución del facturador seleccionado con los filtros actuales.")
         else:
             st.info("No hay datos de Facturación válidos cargados para realizar análisis o tu selección de facturadores no es válida.")
 
+
+if df_facturacion is not None and not df_facturacion.empty:
+    seccion_facturacion()
 else:
     st.info("Por favor, sube el archivo de Facturación para ver el análisis de Facturación por facturador.")
 
 
+# --- CICLO LEGALIZACIÓN → FACTURACIÓN (conciliación por paciente y fecha) ---
+@st.fragment
+def seccion_ciclo():
+    st.markdown("---")
+    st.header("Ciclo Legalización → Facturación")
+    st.caption("Cada legalización se relaciona con la primera factura del mismo paciente "
+               "(NUMERO_IDENTIFICACION ↔ IDENTIFICACION) y del mismo tipo (PPL o Convenios) "
+               "emitida en la fecha de la legalización o después.")
+
+    with st.expander("Filtros Adicionales del Ciclo"):
+        tipo_ciclo_seleccionado = st.multiselect(
+            'Filtrar por Tipo de Legalización',
+            options=['Todos'] + list(TIPOS_CONCILIABLES),
+            default=['Todos'],
+            key="filter_tipo_ciclo"
+        )
+        if 'Todos' in tipo_ciclo_seleccionado or not tipo_ciclo_seleccionado:
+            tipo_ciclo_seleccionado = ['Todos']
+        max_dias = st.number_input(
+            "Máximo de días entre la legalización y la factura (0 = sin límite)",
+            min_value=0, value=0, step=1, key="ciclo_max_dias"
+        ) or None
+    filtros_seccion = {**filtros, "tipo_legalizacion": tipo_ciclo_seleccionado}
+
+    version_ciclo = f"{legalizaciones_version}|{dataset_versions['facturacion']}"
+    entradas_ciclo = section_inputs(CICLO, filtros_seccion)
+    resumen_ciclo, distribucion_ciclo = reconciliation_results(
+        version_ciclo, max_dias, entradas_ciclo, df_legalizaciones, df_facturacion
+    )
+
+    st.subheader(f"Tiempo de Ciclo por Tipo de Legalización ({start_date} a {end_date})")
+    if resumen_ciclo.empty:
+        st.info("No hay legalizaciones para la selección actual de filtros.")
+        return
+    st.dataframe(resumen_ciclo, hide_index=True)
+
+    if distribucion_ciclo['Legalizaciones'].sum() > 0:
+        st.subheader("Distribución del Tiempo de Ciclo (legalizaciones facturadas)")
+        plt, sns = plotting()
+        fig_ciclo, ax_ciclo = plt.subplots(figsize=(12, 6))
+        sns.barplot(x='Rango_Dias', y='Legalizaciones', hue=CICLO["categoria"], data=distribucion_ciclo,
+                    ax=ax_ciclo, palette='viridis')
+        ax_ciclo.set_title('Días entre la legalización y su factura')
+        ax_ciclo.set_xlabel('Días de ciclo')
+        ax_ciclo.set_ylabel('Legalizaciones')
+        for container in ax_ciclo.containers:
+            ax_ciclo.bar_label(container, fmt='%.0f', label_type='edge', padding=3)
+        plt.tight_layout()
+        render_figure(fig_ciclo, CICLO["nombre"])
+    else:
+        st.info("Ninguna legalización de la selección tiene factura.")
+
+    # Las filas filtradas que se exportan son las legalizaciones sin facturar
+    sin_facturar = unbilled_table(version_ciclo, max_dias, df_legalizaciones, df_facturacion)
+    export_buttons(
+        "Ciclo Legalización → Facturación", "ciclo",
+        {"resumen_ciclo": resumen_ciclo, "distribucion_ciclo": distribucion_ciclo},
+        filas_filtradas=sin_facturar,
+        mascara=functools.partial(
+            filter_mask, sin_facturar, CICLO, start_date, end_date,
+            facturador_seleccionado, tipo_ciclo_seleccionado
+        ),
+    )
+
+    # --- Legalizaciones sin facturar (tabla paginada en el servidor) ---
+    if st.toggle("Mostrar legalizaciones sin facturar", key="mostrar_sin_facturar"):
+        paginated_table(
+            sin_facturar, "tabla_sin_facturar",
+            mask=unbilled_mask(version_ciclo, max_dias, entradas_ciclo, df_legalizaciones, df_facturacion),
+            default_sort=CICLO["fecha"],
+        )
+
+
+if can_reconcile(df_legalizaciones, df_facturacion):
+    seccion_ciclo()
+elif df_legalizaciones is not None and df_facturacion is not None:
+    st.info("Para analizar el ciclo Legalización → Facturación, los archivos deben incluir "
+            "NUMERO_IDENTIFICACION (Legalizaciones) e IDENTIFICACION (Facturación).")
+
+
+# --- Vista previa aproximada: reemplazo por los resultados exactos ---
+if st.session_state.resultados_pendientes:
+    @st.fragment(run_every=1)
+    def esperar_resultados_exactos():
+        # Cuando todos los resultados exactos están listos (o alguno falló) se vuelve a ejecutar
+        # el dashboard, que ahora los encuentra calculados o muestra el error del cálculo; el
+        # cálculo fallido se descarta y se reintenta en la siguiente ejecución
+        if all(futuro.done() for futuro in st.session_state.resultados_pendientes):
+            st.rerun()
+
+    esperar_resultados_exactos()
+st.session_state.ejecucion_completa = False
+
+
+# --- Panel de Rendimiento (opcional, en la barra lateral) ---
+if perfilador_activo is not None:
+    st.session_state.ultimo_perfil = stop_profiler(perfilador_activo)
+performance_panel(registros_rendimiento)
+
 st.markdown("---")
 st.markdown("Creado desde el área de Facturación por Dilan Heredia")
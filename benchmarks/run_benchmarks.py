@@ -0,0 +1,277 @@
+"""
+Benchmarks de los pipelines del dashboard con datos sintéticos.
+
+Mide ingesta (CSV con fechas del ERP), persistencia (Parquet ida y vuelta), validación,
+filtros, cada agregación por sección y periodo (para cada motor), el render de gráficos y una
+ejecución completa del dashboard sin navegador con AppTest de Streamlit. Los resultados se
+guardan en JSON y se comparan con la ejecución anterior para detectar regresiones.
+
+    python benchmarks/run_benchmarks.py --tamanos 10k 1M
+    python benchmarks/run_benchmarks.py --tamanos 10M --sin-app --fallar-si-regresion
+"""
+import argparse
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import pandas as pd  # noqa: E402
+
+from benchmarks.synthetic_data import as_erp_export, make_datasets  # noqa: E402
+from dashboard_core.ingestion import (  # noqa: E402
+    CONVENIOS_FILENAME,
+    FACTURACION_FILENAME,
+    PPL_FILENAME,
+    RIPS_FILENAME,
+)
+from dashboard_core.normalization import (  # noqa: E402
+    combine_legalizaciones,
+    prepare_facturacion,
+    prepare_legalizaciones,
+    prepare_rips,
+    validate_and_normalize,
+)
+from dashboard_core.pipelines import (  # noqa: E402
+    ENGINES,
+    FACTURACION,
+    LEGALIZACIONES,
+    PERIODO_TIEMPO_OPTIONS,
+    RIPS,
+    compute_section,
+    filter_dataset,
+)
+from dashboard_core.reconciliation import reconcile  # noqa: E402
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+PERSISTED_FILENAMES = {
+    'ppl': PPL_FILENAME,
+    'convenios': CONVENIOS_FILENAME,
+    'rips': RIPS_FILENAME,
+    'facturacion': FACTURACION_FILENAME,
+}
+
+
+def timed(resultados, tamano, medicion, fn, repeticiones=1, filas=None):
+    """Ejecuta fn `repeticiones` veces, guarda el mejor tiempo y retorna el último resultado."""
+    tiempos = []
+    valor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        valor = fn()
+        tiempos.append(time.perf_counter() - inicio)
+    resultados.append({"tamano": tamano, "medicion": medicion, "segundos": round(min(tiempos), 6), "filas": filas})
+    print(f"  {medicion:<55} {min(tiempos):>10.4f} s")
+    return valor
+
+
+def bench_size(etiqueta, n, workdir, engines, repeticiones, incluir_app):
+    resultados = []
+    print(f"\n=== {etiqueta} ({n:,} filas) ===")
+    datasets = make_datasets(n)
+    carpeta = os.path.join(workdir, etiqueta)
+    persisted_dir = os.path.join(carpeta, "persisted_data")
+    os.makedirs(persisted_dir, exist_ok=True)
+
+    # --- Ingesta: CSV con fechas como texto, igual que los archivos del ERP ---
+    preparados = {}
+    for nombre, df in datasets.items():
+        ruta_csv = os.path.join(carpeta, f"{nombre}.csv")
+        as_erp_export(df).to_csv(ruta_csv, index=False)
+        crudo = timed(resultados, etiqueta, f"ingesta.read_csv.{nombre}",
+                      lambda: pd.read_csv(ruta_csv, encoding='utf-8', on_bad_lines='skip'), filas=len(df))
+        if nombre == 'ppl':
+            preparar = lambda: prepare_legalizaciones(crudo.copy(), 'PPL')  # noqa: E731
+        elif nombre == 'convenios':
+            preparar = lambda: prepare_legalizaciones(crudo.copy(), 'Convenios')  # noqa: E731
+        elif nombre == 'rips':
+            preparar = lambda: prepare_rips(crudo.copy())  # noqa: E731
+        else:
+            preparar = lambda: prepare_facturacion(crudo.copy())  # noqa: E731
+        preparados[nombre] = timed(resultados, etiqueta, f"ingesta.preparar.{nombre}", preparar, filas=len(df))
+
+    # --- Validación / normalización (conversión de fechas, descarte y orden) ---
+    legalizaciones = timed(
+        resultados, etiqueta, "validacion.legalizaciones",
+        lambda: validate_and_normalize(combine_legalizaciones(preparados['ppl'], preparados['convenios']), LEGALIZACIONES),
+        repeticiones, filas=n,
+    )
+    normalizados = {
+        LEGALIZACIONES["nombre"]: legalizaciones,
+        RIPS["nombre"]: timed(resultados, etiqueta, "validacion.rips",
+                              lambda: validate_and_normalize(preparados['rips'], RIPS), repeticiones, filas=n),
+        FACTURACION["nombre"]: timed(resultados, etiqueta, "validacion.facturacion",
+                                     lambda: validate_and_normalize(preparados['facturacion'], FACTURACION),
+                                     repeticiones, filas=n),
+    }
+
+    # --- Persistencia: Parquet ida y vuelta ---
+    for nombre, df in datasets.items():
+        ruta = os.path.join(persisted_dir, PERSISTED_FILENAMES[nombre])
+        timed(resultados, etiqueta, f"persistencia.to_parquet.{nombre}",
+              lambda: df.to_parquet(ruta, index=False), repeticiones, filas=len(df))
+        timed(resultados, etiqueta, f"persistencia.read_parquet.{nombre}",
+              lambda: pd.read_parquet(ruta), repeticiones, filas=len(df))
+
+    # --- Filtros y agregaciones por sección ---
+    for spec in (LEGALIZACIONES, RIPS, FACTURACION):
+        df = normalizados[spec["nombre"]]
+        inicio = df[spec["fecha"]].min().date()
+        fin = df[spec["fecha"]].max().date()
+        medio = inicio + (fin - inicio) / 2
+        algunos = sorted(df[spec["facturador"]].unique())[:3]
+        seccion = spec["nombre"].lower().replace('ó', 'o')
+
+        timed(resultados, etiqueta, f"filtro.{seccion}.todos",
+              lambda: filter_dataset(df, spec, inicio, fin), repeticiones, filas=len(df))
+        timed(resultados, etiqueta, f"filtro.{seccion}.3_facturadores_medio_rango",
+              lambda: filter_dataset(df, spec, medio, fin, algunos), repeticiones, filas=len(df))
+
+        for engine in engines:
+            timed(resultados, etiqueta, f"agregacion.{engine}.{seccion}.resumen",
+                  lambda: compute_section(df, spec, inicio, fin, engine=engine), repeticiones, filas=len(df))
+            for periodo_label, periodo_code in PERIODO_TIEMPO_OPTIONS.items():
+                timed(resultados, etiqueta, f"agregacion.{engine}.{seccion}.evolucion.{periodo_code}",
+                      lambda: compute_section(df, spec, inicio, fin, algunos, periodo_code=periodo_code, engine=engine),
+                      repeticiones, filas=len(df))
+
+        if len(engines) > 1:
+            # Los motores deben producir exactamente el mismo resultado
+            referencia = compute_section(df, spec, inicio, fin, algunos, periodo_code="W", engine=engines[0])
+            for engine in engines[1:]:
+                otro = compute_section(df, spec, inicio, fin, algunos, periodo_code="W", engine=engine)
+                pd.testing.assert_frame_equal(referencia[0], otro[0])
+                pd.testing.assert_frame_equal(referencia[1], otro[1])
+
+        # --- Render de gráficos (barras acumuladas y evolución) ---
+        timed(resultados, etiqueta, f"render.{seccion}",
+              lambda: _render_charts(df, spec, inicio, fin, algunos), repeticiones)
+
+    # --- Conciliación Legalización → Facturación (unión as-of por paciente y fecha) ---
+    timed(resultados, etiqueta, "conciliacion.legalizacion_facturacion",
+          lambda: reconcile(legalizaciones, normalizados[FACTURACION["nombre"]]), repeticiones, filas=n)
+
+    # --- Dashboard completo sin navegador ---
+    if incluir_app:
+        timed(resultados, etiqueta, "app.primera_ejecucion", lambda: _run_app(carpeta), filas=n)
+
+    return resultados
+
+
+def _render_charts(df, spec, inicio, fin, facturadores):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    from dashboard_core.reports import _evolution_figure, _summary_figure
+
+    summary, evolution = compute_section(df, spec, inicio, fin, facturadores, periodo_code="M")
+    for fig in (_summary_figure(summary, spec, "benchmark"), _evolution_figure(evolution, spec, "Mes", "benchmark")):
+        fig.savefig(io.BytesIO(), format='png')
+        plt.close(fig)
+
+
+def _run_app(carpeta):
+    from streamlit.testing.v1 import AppTest
+
+    # El dashboard busca los datos persistentes en ../persisted_data respecto al directorio actual
+    app_dir = os.path.join(carpeta, "app")
+    os.makedirs(app_dir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(app_dir)
+    try:
+        at = AppTest.from_file(os.path.join(REPO_DIR, "appdashboard.py"), default_timeout=3600)
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"El dashboard falló en AppTest: {at.exception[0].message}")
+    finally:
+        os.chdir(cwd)
+
+
+def _metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versiones = {"python": platform.python_version(), "pandas": pd.__version__}
+    try:
+        import polars
+        versiones["polars"] = polars.__version__
+    except ImportError:
+        pass
+    return {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "maquina": platform.node(),
+        "cpus": os.cpu_count(),
+        "versiones": versiones,
+    }
+
+
+def compare(actual, anterior, umbral):
+    """Imprime la comparación con una ejecución anterior y retorna las mediciones que empeoraron."""
+    previos = {(r["tamano"], r["medicion"]): r["segundos"] for r in anterior["resultados"]}
+    regresiones = []
+    print(f"\nComparación con {anterior['fecha']} (commit {anterior.get('commit')}):")
+    for r in actual["resultados"]:
+        previo = previos.get((r["tamano"], r["medicion"]))
+        if not previo:
+            continue
+        ratio = r["segundos"] / previo
+        marca = ""
+        # Las mediciones muy cortas son ruidosas; solo se marcan si superan 10 ms
+        if ratio > 1 + umbral and r["segundos"] > 0.01:
+            marca = "  <-- REGRESIÓN"
+            regresiones.append(r)
+        print(f"  {r['tamano']:>5} {r['medicion']:<55} {previo:>9.4f} -> {r['segundos']:>9.4f} s  x{ratio:.2f}{marca}")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del dashboard con datos sintéticos.")
+    parser.add_argument("--tamanos", nargs="+", choices=list(SIZES), default=["10k", "1M"])
+    parser.add_argument("--motores", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--sin-app", action="store_true", help="No ejecutar el dashboard con AppTest.")
+    parser.add_argument("--resultados", default=RESULTS_DIR, help="Carpeta donde se guardan los resultados JSON.")
+    parser.add_argument("--umbral", type=float, default=0.2,
+                        help="Empeoramiento relativo considerado regresión (por defecto 0.2 = 20%%).")
+    parser.add_argument("--fallar-si-regresion", action="store_true",
+                        help="Termina con código 1 si alguna medición empeora más que el umbral.")
+    args = parser.parse_args(argv)
+
+    actual = {**_metadata(), "resultados": []}
+    with tempfile.TemporaryDirectory(prefix="dashboard_bench_") as workdir:
+        for etiqueta in args.tamanos:
+            actual["resultados"].extend(
+                bench_size(etiqueta, SIZES[etiqueta], workdir, args.motores, args.repeticiones, not args.sin_app)
+            )
+
+    os.makedirs(args.resultados, exist_ok=True)
+    anteriores = sorted(glob.glob(os.path.join(args.resultados, "bench_*.json")))
+    ruta = os.path.join(args.resultados, f"bench_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(actual, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {ruta}")
+
+    regresiones = []
+    if anteriores:
+        with open(anteriores[-1], encoding="utf-8") as f:
+            regresiones = compare(actual, json.load(f), args.umbral)
+    if regresiones and args.fallar_si_regresion:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Datos sintéticos con las mismas columnas que los archivos reales del ERP
+(PPL, Convenios, RIPS y Facturación), para benchmarks y pruebas de carga.
+"""
+import numpy as np
+import pandas as pd
+
+FACTURADORES = [f"FACTURADOR {i:02d}" for i in range(1, 41)]
+ESTADOS_RIPS = ['CERRADO', 'ABIERTO', 'RADICADO', 'GLOSADO', 'ANULADO']
+PREFIJOS = ['SM', 'E', 'FE', 'sm ', 'e']
+FECHA_INICIO = pd.Timestamp('2022-01-01')
+DIAS_HISTORIA = 3 * 365
+
+# Formato de fecha de los archivos exportados por el ERP
+FORMATO_FECHA_ERP = '%d/%m/%Y %H:%M'
+
+
+def _fechas(rng, n):
+    segundos = rng.integers(0, DIAS_HISTORIA * 86400, n)
+    return FECHA_INICIO + pd.to_timedelta(segundos, unit='s')
+
+
+def _identificaciones(rng, n, pacientes):
+    return rng.integers(10_000_000, 10_000_000 + pacientes, n).astype(str)
+
+
+def make_legalizaciones(n, seed=0, pacientes=None):
+    """Legalizaciones (PPL o Convenios): FECHA_REAL, Usuario, NUMERO_IDENTIFICACION, PROCEDIMIENTO, CodigoEspecialidad."""
+    rng = np.random.default_rng(seed)
+    pacientes = pacientes or max(n // 3, 1)
+    return pd.DataFrame({
+        'FECHA_REAL': _fechas(rng, n),
+        'Usuario': rng.choice(FACTURADORES, n),
+        'NUMERO_IDENTIFICACION': _identificaciones(rng, n, pacientes),
+        'PROCEDIMIENTO': rng.integers(890000, 890500, n).astype(str),
+        'CodigoEspecialidad': rng.integers(100, 160, n).astype(str),
+    })
+
+
+def make_rips(n, seed=2):
+    """RIPS: NOMBRE, ESTADO, ULTIMA_MODIFICACION y un consecutivo por registro."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'CONSECUTIVO': np.arange(1, n + 1).astype(str),
+        'NOMBRE': rng.choice(FACTURADORES, n),
+        'ESTADO': rng.choice(ESTADOS_RIPS, n, p=[0.5, 0.2, 0.15, 0.1, 0.05]),
+        'ULTIMA_MODIFICACION': _fechas(rng, n),
+    })
+
+
+def make_facturacion(n, seed=3, pacientes=None):
+    """Facturación: FECHA FACTURA, USUARIO, PREFIJO, IDENTIFICACION y número de factura."""
+    rng = np.random.default_rng(seed)
+    pacientes = pacientes or max(n // 3, 1)
+    return pd.DataFrame({
+        'NUMERO FACTURA': np.arange(1, n + 1).astype(str),
+        'FECHA FACTURA': _fechas(rng, n),
+        'USUARIO': rng.choice(FACTURADORES, n),
+        'PREFIJO': rng.choice(PREFIJOS, n, p=[0.45, 0.35, 0.1, 0.05, 0.05]),
+        'IDENTIFICACION': _identificaciones(rng, n, pacientes),
+    })
+
+
+def make_datasets(n):
+    """Los cuatro datasets con n filas en total de legalizaciones (mitad PPL, mitad Convenios)."""
+    pacientes = max(n // 3, 1)
+    return {
+        'ppl': make_legalizaciones(n // 2, seed=0, pacientes=pacientes),
+        'convenios': make_legalizaciones(n - n // 2, seed=1, pacientes=pacientes),
+        'rips': make_rips(n),
+        'facturacion': make_facturacion(n, pacientes=pacientes),
+    }
+
+
+def as_erp_export(df):
+    """Copia con las columnas de fecha como texto 'dd/mm/aaaa hh:mm', como llegan del ERP."""
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime(FORMATO_FECHA_ERP)
+    return df
@@ -0,0 +1,75 @@
+"""
+Lógica de cálculo del Dashboard de Productividad, independiente de la interfaz de Streamlit.
+"""
+from dashboard_core.dates import detect_date_format, parse_dates
+from dashboard_core.indexing import build_facturador_index, index_positions
+from dashboard_core.ingestion import (
+    PERSISTED_FILENAMES,
+    load_persisted_dataset,
+    load_persisted_datasets,
+    read_uploaded_file,
+    remove_persisted_file,
+)
+from dashboard_core.kpis import daily_counts, productivity_kpis, update_daily_counts
+from dashboard_core.normalization import (
+    CLAVES_REGISTRO,
+    REQUIRED_COLUMNS,
+    combine_legalizaciones,
+    ingest_dataset,
+    is_normalized,
+    missing_columns,
+    prepare_dataset,
+    prepare_facturacion,
+    prepare_legalizaciones,
+    prepare_rips,
+    validate_and_normalize,
+)
+from dashboard_core.pipelines import (
+    DEFAULT_ENGINE,
+    ENGINES,
+    FACTURACION,
+    FILTROS,
+    LEGALIZACIONES,
+    PERIODO_TIEMPO_OPTIONS,
+    RIPS,
+    add_percentage,
+    compute_section,
+    compute_section_from_inputs,
+    evolution_by_period,
+    filter_dataset,
+    filter_mask,
+    is_todos,
+    pandas_freq,
+    period_labels,
+    section_inputs,
+    summary_by_facturador,
+)
+from dashboard_core.preview import approximate_section, combine_rollups, monthly_rollup
+from dashboard_core.quality import QUALITY_ATTR, quality_summary
+from dashboard_core.reconciliation import (
+    CICLO,
+    TIPOS_CONCILIABLES,
+    can_reconcile,
+    cycle_time_distribution,
+    cycle_time_summary,
+    reconcile,
+    unbilled_legalizations,
+)
+from dashboard_core.rips_history import (
+    backlog_by_estado,
+    diff_snapshots,
+    dwell_summary,
+    dwell_times,
+    load_events,
+    record_rips_snapshot,
+)
+from dashboard_core.reports import compute_report_tables, split_date_range, write_report
+from dashboard_core.store import (
+    ROL_ADMINISTRADOR,
+    ROL_ANALISTA,
+    current_snapshot,
+    remove_all_versions,
+    resolve_data_dir,
+    save_version,
+    write_transaction,
+)
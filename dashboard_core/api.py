@@ -0,0 +1,314 @@
+"""
+API HTTP/JSON de agregaciones (sin Streamlit), sobre los mismos datos persistentes y el mismo
+código de cálculo del dashboard, para que otras herramientas obtengan las mismas cifras.
+
+Ejemplo:
+
+    python -m dashboard_core.api --puerto 8000
+    curl "http://127.0.0.1:8000/api/legalizaciones/resumen?desde=2024-01-01&hasta=2024-03-31&tipo=PPL"
+    curl "http://127.0.0.1:8000/api/rips/evolucion?facturador=ANA&facturador=LUIS&periodo=Semana"
+
+Rutas:
+  - GET /api/version: versión de los datos y filas de cada sección.
+  - GET /api/{seccion}/resumen: total por facturador con su porcentaje (como la tabla del dashboard).
+  - GET /api/{seccion}/evolucion: total por periodo y facturador.
+  seccion es legalizaciones, rips o facturacion. Filtros (todos opcionales): desde y hasta
+  (AAAA-MM-DD; por defecto el rango completo de la sección), facturador (repetible), tipo
+  (Legalizaciones y Facturación) o estado (RIPS), repetibles, y periodo (solo evolución).
+
+Los datos se recargan solos cuando cambia la foto vigente del almacén (ver store). Las
+respuestas se guardan en memoria por versión de los datos y filtros, y llevan un ETag derivado
+de ambos: un cliente que envía If-None-Match con el mismo ETag recibe 304 sin recalcular nada.
+
+Requiere FastAPI y uvicorn (pip install fastapi uvicorn), que son opcionales para el resto del
+dashboard.
+"""
+import argparse
+import asyncio
+import collections
+import datetime
+import hashlib
+import json
+import os
+import sys
+import threading
+
+try:
+    import fastapi
+    import uvicorn
+except ImportError:  # FastAPI y uvicorn son opcionales: solo se necesitan para la API
+    fastapi = None
+    uvicorn = None
+
+from dashboard_core.indexing import build_facturador_index
+from dashboard_core.ingestion import file_version, load_persisted_datasets
+from dashboard_core.pipelines import (
+    ENGINES,
+    FACTURACION,
+    LEGALIZACIONES,
+    PERIODO_TIEMPO_OPTIONS,
+    RIPS,
+    add_percentage,
+    compute_section_from_inputs,
+)
+from dashboard_core.store import DEFAULT_DATA_DIR, current_snapshot, resolve_data_dir
+
+# Secciones expuestas: ruta → (especificación, nombre del parámetro de categoría)
+SECCIONES = {
+    "legalizaciones": (LEGALIZACIONES, "tipo"),
+    "rips": (RIPS, "estado"),
+    "facturacion": (FACTURACION, "tipo"),
+}
+
+# Respuestas guardadas en memoria (las más recientes)
+API_CACHE_ENTRIES = int(os.environ.get("DASHBOARD_API_CACHE_ENTRIES", "256"))
+
+
+def _require_fastapi():
+    if fastapi is None or uvicorn is None:
+        raise ImportError(
+            "La API requiere FastAPI y uvicorn. Instálalos con 'pip install fastapi uvicorn'."
+        )
+
+
+def data_version(data_dir):
+    """
+    Versión de los datos vigentes: (versión, archivos). Cambia con cada guardado del almacén y
+    también si un archivo con nombre fijo (carpetas sin catálogo) se reescribe.
+    """
+    _, archivos = current_snapshot(data_dir)
+    partes = []
+    for tipo in sorted(archivos):
+        ruta = archivos[tipo]
+        try:
+            partes.append(f"{tipo}={file_version(ruta) if ruta else '-'}")
+        except OSError:
+            # Se eliminó entre la consulta al catálogo y ahora: la próxima consulta lo verá
+            partes.append(f"{tipo}=-")
+    return hashlib.sha1("|".join(partes).encode()).hexdigest()[:16], archivos
+
+
+class AggregationService:
+    """
+    Datos cargados y respuestas memoizadas de la API. Es independiente del framework web para
+    poder usarse (y probarse) sin FastAPI.
+    """
+
+    def __init__(self, data_dir, engine=None, cache_entries=API_CACHE_ENTRIES):
+        self.data_dir = resolve_data_dir(data_dir)
+        self.engine = engine
+        self.cache_entries = cache_entries
+        # (versión, datasets, índices) en una sola tupla: se reemplaza completa con una asignación,
+        # así ninguna solicitud ve la versión nueva con los datos viejos (o al revés)
+        self._estado = (None, {}, {})
+        self._carga = threading.Lock()
+        self._respuestas = collections.OrderedDict()
+        self._respuestas_lock = threading.Lock()
+
+    def current(self):
+        """(versión, datasets, índices) vigentes; recarga los datos si la versión cambió."""
+        version, archivos = data_version(self.data_dir)
+        estado = self._estado
+        if version != estado[0]:
+            with self._carga:
+                # Otra solicitud pudo haber recargado mientras se esperaba el candado
+                estado = self._estado
+                if version != estado[0]:
+                    datasets = load_persisted_datasets(self.data_dir, archivos)
+                    indices = {}
+                    for spec, _ in SECCIONES.values():
+                        if datasets.get(spec["nombre"]) is not None:
+                            indices[spec["nombre"]] = build_facturador_index(datasets[spec["nombre"]], spec)
+                    estado = (version, datasets, indices)
+                    self._estado = estado
+                    with self._respuestas_lock:
+                        self._respuestas.clear()
+        return estado
+
+    def entradas(self, seccion, datasets, desde=None, hasta=None, facturadores=None, categorias=None,
+                 periodo=None):
+        """
+        Entradas (como las de section_inputs) de una consulta. Lanza KeyError si la sección no
+        existe o no tiene datos, y ValueError si un filtro no es válido.
+        """
+        spec, _ = SECCIONES[seccion]
+        df = datasets.get(spec["nombre"])
+        if df is None or df.empty:
+            raise KeyError(f"No hay datos de {spec['nombre']}.")
+        desde = desde or df[spec["fecha"]].min().date()
+        hasta = hasta or df[spec["fecha"]].max().date()
+        if desde > hasta:
+            raise ValueError("La fecha de inicio no puede ser posterior a la fecha de fin.")
+        if periodo is not None:
+            periodo = PERIODO_TIEMPO_OPTIONS.get(periodo, periodo)
+            if periodo not in PERIODO_TIEMPO_OPTIONS.values():
+                opciones = ", ".join(list(PERIODO_TIEMPO_OPTIONS) + list(PERIODO_TIEMPO_OPTIONS.values()))
+                raise ValueError(f"Periodo desconocido. Opciones válidas: {opciones}.")
+        return (
+            ("fechas", (desde, hasta)),
+            ("facturador", tuple(facturadores or ())),
+            (spec["filtro_categoria"], tuple(categorias or ())),
+            ("periodo", periodo),
+        )
+
+    def _clave(self, seccion, vista, version, entradas):
+        return (version, seccion, vista, entradas, self.engine)
+
+    def etag(self, seccion, vista, version, entradas):
+        """
+        ETag de una vista: depende solo de la versión de los datos y de las entradas, así que se
+        conoce sin calcular la respuesta.
+        """
+        clave = self._clave(seccion, vista, version, entradas)
+        return '"' + hashlib.sha1(repr(clave).encode()).hexdigest()[:32] + '"'
+
+    def response(self, seccion, vista, version, datasets, indices, entradas):
+        """
+        Cuerpo JSON (bytes) y ETag de una vista ('resumen' o 'evolucion'). Las respuestas se
+        memoizan por versión de los datos y entradas.
+        """
+        clave = self._clave(seccion, vista, version, entradas)
+        with self._respuestas_lock:
+            if clave in self._respuestas:
+                self._respuestas.move_to_end(clave)
+                return self._respuestas[clave]
+
+        spec, _ = SECCIONES[seccion]
+        nombre = spec["nombre"]
+        resumen, evolucion = compute_section_from_inputs(
+            datasets[nombre], spec, entradas, engine=self.engine, indice=indices.get(nombre)
+        )
+        tabla = add_percentage(resumen, spec) if vista == "resumen" else evolucion
+        filtros = dict(entradas)
+        cuerpo = {
+            "seccion": nombre,
+            "version": version,
+            "filtros": {
+                "desde": filtros["fechas"][0].isoformat(),
+                "hasta": filtros["fechas"][1].isoformat(),
+                "facturador": list(filtros["facturador"]),
+                SECCIONES[seccion][1]: list(filtros[spec["filtro_categoria"]]),
+                **({"periodo": filtros["periodo"]} if vista == "evolucion" else {}),
+            },
+            "filas": json.loads(tabla.to_json(orient="records", force_ascii=False)),
+        }
+        contenido = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        etag = self.etag(seccion, vista, version, entradas)
+
+        with self._respuestas_lock:
+            self._respuestas[clave] = (contenido, etag)
+            while len(self._respuestas) > self.cache_entries:
+                self._respuestas.popitem(last=False)
+        return contenido, etag
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    etiquetas = {valor.strip().removeprefix("W/") for valor in if_none_match.split(",")}
+    return "*" in etiquetas or etag in etiquetas
+
+
+def create_app(data_dir=None, engine=None):
+    """Aplicación FastAPI de la API (también sirve con 'uvicorn dashboard_core.api:create_app --factory')."""
+    _require_fastapi()
+    from fastapi import HTTPException, Query, Request, Response
+
+    servicio = AggregationService(data_dir, engine=engine)
+    app = fastapi.FastAPI(title="Dashboard de Productividad - API de agregaciones")
+
+    @app.get("/api/version")
+    async def version():
+        version_datos, datasets, _ = await asyncio.to_thread(servicio.current)
+        return {
+            "version": version_datos,
+            "secciones": {
+                seccion: (len(datasets[spec["nombre"]]) if datasets.get(spec["nombre"]) is not None else None)
+                for seccion, (spec, _) in SECCIONES.items()
+            },
+        }
+
+    async def _responder(request, seccion, vista, desde, hasta, facturador, tipo, estado, periodo):
+        if seccion not in SECCIONES:
+            raise HTTPException(404, f"Sección desconocida: '{seccion}'. Opciones válidas: {', '.join(SECCIONES)}.")
+        spec, parametro = SECCIONES[seccion]
+        otro = "estado" if parametro == "tipo" else "tipo"
+        if (estado if otro == "estado" else tipo):
+            raise HTTPException(400, f"La sección {spec['nombre']} se filtra por {parametro}, no por {otro}.")
+
+        version_datos, datasets, indices = await asyncio.to_thread(servicio.current)
+        try:
+            entradas = servicio.entradas(
+                seccion, datasets, desde, hasta, facturador, tipo if parametro == "tipo" else estado, periodo
+            )
+        except KeyError as exc:
+            raise HTTPException(404, exc.args[0])
+        except ValueError as exc:
+            raise HTTPException(400, str(exc))
+
+        # El ETag se conoce antes de calcular: si el cliente ya tiene la respuesta no se calcula
+        # (aunque haya salido de la memoria de respuestas)
+        etag = servicio.etag(seccion, vista, version_datos, entradas)
+        encabezados = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=encabezados)
+        contenido, etag = await asyncio.to_thread(
+            servicio.response, seccion, vista, version_datos, datasets, indices, entradas
+        )
+        return Response(contenido, media_type="application/json", headers=encabezados)
+
+    @app.get("/api/{seccion}/resumen")
+    async def resumen(
+        request: Request,
+        seccion: str,
+        desde: datetime.date | None = None,
+        hasta: datetime.date | None = None,
+        facturador: list[str] | None = Query(None),
+        tipo: list[str] | None = Query(None),
+        estado: list[str] | None = Query(None),
+    ):
+        return await _responder(request, seccion, "resumen", desde, hasta, facturador, tipo, estado, None)
+
+    @app.get("/api/{seccion}/evolucion")
+    async def evolucion(
+        request: Request,
+        seccion: str,
+        desde: datetime.date | None = None,
+        hasta: datetime.date | None = None,
+        facturador: list[str] | None = Query(None),
+        tipo: list[str] | None = Query(None),
+        estado: list[str] | None = Query(None),
+        periodo: str = "Mes",
+    ):
+        return await _responder(request, seccion, "evolucion", desde, hasta, facturador, tipo, estado, periodo)
+
+    return app
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m dashboard_core.api",
+        description="Sirve las agregaciones del dashboard como una API HTTP/JSON.",
+    )
+    parser.add_argument("--datos", default=None,
+                        help=f"Carpeta de datos persistentes (por defecto: DASHBOARD_DATA_DIR o {DEFAULT_DATA_DIR}).")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección donde escuchar (por defecto: 127.0.0.1).")
+    parser.add_argument("--puerto", type=int, default=8000, help="Puerto (por defecto: 8000).")
+    parser.add_argument("--motor", choices=ENGINES, default=None,
+                        help="Motor de cálculo (por defecto: DASHBOARD_ENGINE o pandas).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        app = create_app(args.datos, engine=args.motor)
+    except ImportError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    uvicorn.run(app, host=args.host, port=args.puerto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Generador de reportes por línea de comandos (sin Streamlit).
+
+Ejemplo: reportes mensuales de todo el 2024 para dos facturadores, en paralelo:
+
+    python -m dashboard_core.cli --desde 2024-01-01 --hasta 2024-12-31 \\
+        --dividir-por mes --periodo Semana --facturador ANA --facturador LUIS \\
+        --salida reportes/
+"""
+import argparse
+import datetime
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from dashboard_core.ingestion import load_persisted_datasets
+from dashboard_core.pipelines import ENGINES, FACTURACION, LEGALIZACIONES, PERIODO_TIEMPO_OPTIONS, RIPS
+from dashboard_core.reports import (
+    OUTPUT_FORMATS,
+    SPLIT_FREQUENCIES,
+    compute_report_tables,
+    split_date_range,
+    write_report,
+)
+from dashboard_core.store import DEFAULT_DATA_DIR, current_snapshot, resolve_data_dir
+
+# Datos cargados una vez por proceso. Con 'fork' los procesos hijos los heredan del padre.
+_DATASETS = None
+
+
+def _init_worker(data_dir):
+    global _DATASETS
+    if _DATASETS is None:
+        # Versión vigente de cada archivo según el catálogo del almacén
+        _, archivos = current_snapshot(data_dir)
+        _DATASETS = load_persisted_datasets(data_dir, archivos)
+
+
+def _run_report(args, inicio, fin, etiqueta):
+    """Calcula y escribe el reporte de un periodo. Se ejecuta en un proceso del pool."""
+    tablas = compute_report_tables(
+        _DATASETS, inicio, fin,
+        facturadores=args.facturador,
+        categorias={
+            LEGALIZACIONES["nombre"]: args.tipo_legalizacion,
+            RIPS["nombre"]: args.estado_rips,
+            FACTURACION["nombre"]: args.tipo_facturacion,
+        },
+        periodo_code=PERIODO_TIEMPO_OPTIONS.get(args.periodo, args.periodo),
+        engine=args.motor,
+    )
+    return write_report(
+        tablas, os.path.join(args.salida, etiqueta), formats=args.formatos,
+        titulo=f"{inicio} a {fin}", periodo_label=args.periodo,
+    )
+
+
+def _fecha(valor):
+    return datetime.date.fromisoformat(valor)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m dashboard_core.cli",
+        description="Genera los reportes de productividad del dashboard a partir de los datos persistentes.",
+    )
+    parser.add_argument("--datos", default=None,
+                        help=f"Carpeta de datos persistentes (por defecto: DASHBOARD_DATA_DIR o {DEFAULT_DATA_DIR}).")
+    parser.add_argument("--desde", type=_fecha, required=True, help="Fecha inicial (AAAA-MM-DD).")
+    parser.add_argument("--hasta", type=_fecha, required=True, help="Fecha final (AAAA-MM-DD).")
+    parser.add_argument("--facturador", action="append",
+                        help="Facturador a incluir (repetible). Por defecto: todos.")
+    parser.add_argument("--tipo-legalizacion", action="append", help="Tipo de legalización (repetible).")
+    parser.add_argument("--estado-rips", action="append", help="Estado de RIPS (repetible).")
+    parser.add_argument("--tipo-facturacion", action="append", help="Tipo de facturación (repetible).")
+    parser.add_argument("--periodo", default="Mes",
+                        choices=list(PERIODO_TIEMPO_OPTIONS) + list(PERIODO_TIEMPO_OPTIONS.values()),
+                        help="Agrupación de la evolución de productividad (por defecto: Mes).")
+    parser.add_argument("--dividir-por", choices=list(SPLIT_FREQUENCIES),
+                        help="Genera un reporte por cada mes, trimestre o año del rango.")
+    parser.add_argument("--formatos", nargs="+", choices=OUTPUT_FORMATS, default=list(OUTPUT_FORMATS),
+                        help="Formatos de salida (por defecto: todos).")
+    parser.add_argument("--salida", default="reportes", help="Carpeta de salida (por defecto: reportes).")
+    parser.add_argument("--motor", choices=ENGINES, default=None,
+                        help="Motor de cálculo (por defecto: DASHBOARD_ENGINE o pandas).")
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="Número de procesos en paralelo (por defecto: uno por CPU).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.desde > args.hasta:
+        print("Error: la fecha de inicio no puede ser posterior a la fecha de fin.", file=sys.stderr)
+        return 2
+
+    args.datos = resolve_data_dir(args.datos)
+    _init_worker(args.datos)
+    if all(df is None for df in _DATASETS.values()):
+        print(f"Error: no se encontraron datos persistentes en '{args.datos}'.", file=sys.stderr)
+        return 1
+
+    periodos = split_date_range(args.desde, args.hasta, args.dividir_por)
+    if len(periodos) == 1 or args.procesos == 1:
+        resultados = [_run_report(args, *periodo) for periodo in periodos]
+    else:
+        with ProcessPoolExecutor(max_workers=args.procesos, initializer=_init_worker,
+                                 initargs=(args.datos,)) as pool:
+            futuros = [pool.submit(_run_report, args, *periodo) for periodo in periodos]
+            resultados = [futuro.result() for futuro in futuros]
+
+    for (_, _, etiqueta), archivos in zip(periodos, resultados):
+        print(f"{etiqueta}: {len(archivos)} archivo(s) generados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Formatos de fecha conocidos, en orden de preferencia. Los archivos del ERP llegan como
+# 'dd/mm/aaaa hh:mm', por eso los formatos con el día primero van antes que los ISO.
+DATE_FORMATS = [
+    '%d/%m/%Y %H:%M',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%Y-%m-%dT%H:%M:%S',
+    '%d-%m-%Y %H:%M',
+    '%d-%m-%Y',
+]
+
+# Formato explícito para todas las columnas de fecha (variable de entorno DASHBOARD_DATE_FORMAT).
+# Si no se define, el formato se detecta en cada columna.
+DEFAULT_DATE_FORMAT = os.environ.get("DASHBOARD_DATE_FORMAT") or None
+
+# Filas que se revisan para detectar el formato
+FORMAT_SAMPLE_SIZE = 1000
+
+# Si hay a lo sumo esta proporción de valores distintos, se convierte cada valor distinto una
+# sola vez y el resultado se reparte a todas las filas
+UNIQUE_CACHE_MAX_RATIO = 0.5
+
+
+def detect_date_format(values, sample_size=FORMAT_SAMPLE_SIZE):
+    """
+    Detecta el formato de una columna de fechas en texto a partir de una muestra de valores
+    no nulos. Retorna el formato de DATE_FORMATS que convierte más valores de la muestra, o
+    None si ninguno convierte alguno.
+    """
+    sample = pd.Series(values).dropna()
+    sample = sample.sample(min(sample_size, len(sample)), random_state=0).astype(str).str.strip()
+    best_format, best_count = None, 0
+    for date_format in DATE_FORMATS:
+        count = pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum()
+        if count > best_count:
+            best_format, best_count = date_format, count
+            if count == len(sample):
+                break
+    return best_format
+
+
+# Directivas de ancho fijo que entiende _parse_fixed_width: campo y cantidad de dígitos
+_FIXED_WIDTH_DIRECTIVES = {
+    '%Y': ('year', 4),
+    '%m': ('month', 2),
+    '%d': ('day', 2),
+    '%H': ('hour', 2),
+    '%M': ('minute', 2),
+    '%S': ('second', 2),
+}
+
+# Filas por bloque en la conversión de ancho fijo
+FIXED_WIDTH_BLOCK_ROWS = 500_000
+
+# Resolución que usa pandas al convertir texto a fechas (ns o us según la versión)
+_PARSED_DTYPE = pd.to_datetime(pd.Series(['2024-01-01']), format='%Y-%m-%d').dtype
+
+
+def _fixed_width_layout(date_format):
+    """
+    Posición de cada campo y de cada separador en un formato de ancho fijo. Retorna
+    (campos, separadores, ancho), o None si el formato usa directivas no soportadas.
+    """
+    campos, separadores, pos, i = {}, {}, 0, 0
+    while i < len(date_format):
+        if date_format[i] == '%':
+            directiva = date_format[i:i + 2]
+            if directiva not in _FIXED_WIDTH_DIRECTIVES:
+                return None
+            campo, ancho = _FIXED_WIDTH_DIRECTIVES[directiva]
+            campos[campo] = (pos, pos + ancho)
+            pos, i = pos + ancho, i + 2
+        else:
+            separadores[pos] = date_format[i]
+            pos, i = pos + 1, i + 1
+    return campos, separadores, pos
+
+
+def _parse_fixed_width(values, layout):
+    """
+    Convierte texto de ancho fijo (p. ej. '05/03/2024 14:30') leyendo los dígitos de cada posición
+    con numpy, sin strptime. Los valores que no encajan exactamente en el formato quedan como NaT.
+    Se procesa por bloques para acotar la memoria de la matriz de caracteres.
+    """
+    partes = [
+        _parse_fixed_width_block(values.iloc[inicio:inicio + FIXED_WIDTH_BLOCK_ROWS], layout)
+        for inicio in range(0, len(values), FIXED_WIDTH_BLOCK_ROWS)
+    ]
+    resultado = np.concatenate(partes) if partes else np.array([], dtype=_PARSED_DTYPE)
+    return pd.Series(resultado, index=values.index)
+
+
+def _parse_fixed_width_block(values, layout):
+    campos, separadores, ancho = layout
+    texto = values.fillna('').astype(str)
+    validos = (texto.str.len() == ancho).to_numpy(dtype=bool, copy=True)
+    matriz = texto.to_numpy(dtype=f'U{ancho}').view(np.uint32).reshape(len(texto), ancho)
+
+    for pos, separador in separadores.items():
+        validos &= matriz[:, pos] == ord(separador)
+
+    def campo(nombre, defecto):
+        if nombre not in campos:
+            return np.full(len(texto), defecto, dtype=np.int64)
+        inicio, fin = campos[nombre]
+        digitos = matriz[:, inicio:fin].astype(np.int64) - ord('0')
+        validos[:] &= ((digitos >= 0) & (digitos <= 9)).all(axis=1)
+        numero = np.zeros(len(texto), dtype=np.int64)
+        for pos in range(fin - inicio):
+            numero = numero * 10 + digitos[:, pos]
+        return numero
+
+    year, month, day = campo('year', 1970), campo('month', 1), campo('day', 1)
+    hour, minute, second = campo('hour', 0), campo('minute', 0), campo('second', 0)
+    validos &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+    validos &= (hour <= 23) & (minute <= 59) & (second <= 59)
+
+    meses = (np.where(validos, year, 1970) - 1970) * 12 + np.where(validos, month, 1) - 1
+    inicio_mes = meses.astype('datetime64[M]')
+    fechas = inicio_mes.astype('datetime64[D]') + (np.where(validos, day, 1) - 1).astype('timedelta64[D]')
+    # Un día que no existe en el mes (31/04) se desborda al mes siguiente
+    validos &= fechas.astype('datetime64[M]') == inicio_mes
+
+    segundos = (hour * 3600 + minute * 60 + second).astype('timedelta64[s]')
+    resultado = (fechas.astype('datetime64[s]') + segundos).astype(_PARSED_DTYPE)
+    resultado[~validos] = np.datetime64('NaT')
+    return resultado
+
+
+def _parse_strings(values, date_format):
+    """
+    Convierte texto a fechas con un formato explícito (vectorizado). Los valores que no cumplen
+    el formato exacto se intentan, solo ellos, con strptime en ese y los demás formatos conocidos
+    y, por último, con el análisis flexible de pandas (día primero).
+    """
+    layout = _fixed_width_layout(date_format) if date_format else None
+    if layout is not None:
+        parsed = _parse_fixed_width(values, layout)
+    else:
+        parsed = pd.Series(pd.NaT, index=values.index, dtype=_PARSED_DTYPE)
+
+    intentos = [{'format': f} for f in [date_format] + DATE_FORMATS if f]
+    intentos.append({'format': 'mixed', 'dayfirst': True})
+    for intento in intentos:
+        fallidos = parsed.isna() & values.notna()
+        if not fallidos.any():
+            break
+        parsed[fallidos] = pd.to_datetime(values[fallidos], errors='coerce', **intento)
+    return parsed
+
+
+def parse_dates(values, date_format=None):
+    """
+    Convierte una columna a datetime de forma rápida. Si no se indica date_format (ni
+    DEFAULT_DATE_FORMAT), se detecta con detect_date_format. Las columnas con pocos valores distintos se convierten por valor
+    único. Retorna (serie_convertida, reporte), donde el reporte indica el formato usado, cuántos
+    valores venían vacíos y cuántos no se pudieron convertir (quedan como NaT).
+    """
+    values = pd.Series(values)
+    vacias = int(values.isna().sum())
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values, {"formato": None, "vacias": vacias, "invalidas": 0}
+    if pd.api.types.is_numeric_dtype(values):
+        # Sin texto que analizar: mismo tratamiento que pd.to_datetime
+        parsed = pd.to_datetime(values, errors='coerce')
+        return parsed, {"formato": None, "vacias": vacias, "invalidas": int(parsed.isna().sum()) - vacias}
+
+    if values.dtype == object or pd.api.types.is_string_dtype(values):
+        values = values.where(values.isna(), values.astype(str).str.strip())
+        # Un texto en blanco es una fecha vacía, no una fecha inválida
+        values = values.mask(values == '')
+        vacias = int(values.isna().sum())
+    date_format = date_format or DEFAULT_DATE_FORMAT or detect_date_format(values)
+
+    codes, uniques = pd.factorize(values)
+    if len(values) and len(uniques) <= UNIQUE_CACHE_MAX_RATIO * len(values):
+        # factorize marca los nulos con -1, que en take apunta al NaT agregado al final
+        tabla = np.append(_parse_strings(pd.Series(uniques), date_format).to_numpy(), np.datetime64('NaT'))
+        parsed = pd.Series(tabla.take(codes), index=values.index)
+    else:
+        parsed = _parse_strings(values, date_format)
+
+    invalidas = int(parsed.isna().sum()) - vacias
+    return parsed, {"formato": date_format, "vacias": vacias, "invalidas": invalidas}
@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+# Filas por bloque al escribir archivos grandes
+EXPORT_CHUNK_ROWS = 100_000
+
+# Excel admite 1.048.576 filas por hoja (incluyendo el encabezado)
+EXCEL_MAX_ROWS_PER_SHEET = 1_048_575
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _chunks(df, chunk_rows=EXPORT_CHUNK_ROWS, posiciones=None):
+    # Con posiciones solo se copia un bloque de las filas elegidas a la vez
+    if posiciones is None:
+        for inicio in range(0, len(df), chunk_rows):
+            yield df.iloc[inicio:inicio + chunk_rows]
+    else:
+        for inicio in range(0, len(posiciones), chunk_rows):
+            yield df.iloc[posiciones[inicio:inicio + chunk_rows]]
+
+
+def write_csv_chunked(df, filepath, chunk_rows=EXPORT_CHUNK_ROWS, posiciones=None):
+    """
+    Escribe un CSV por bloques de filas, sin generar el texto completo en memoria. Con posiciones
+    (enteras, en orden) solo se escriben esas filas de df.
+    """
+    with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
+        df.head(0).to_csv(f, index=False)
+        for chunk in _chunks(df, chunk_rows, posiciones):
+            chunk.to_csv(f, index=False, header=False)
+    return filepath
+
+
+def write_xlsx_streaming(df, filepath, sheet_name="Datos", chunk_rows=EXPORT_CHUNK_ROWS, posiciones=None):
+    """
+    Escribe un libro Excel con openpyxl en modo write-only (las filas se vuelcan a disco a medida
+    que se agregan). Si hay más filas de las que admite una hoja, continúa en hojas nuevas. Con
+    posiciones solo se escriben esas filas de df.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    encabezado = [str(col) for col in df.columns]
+    ws = None
+    filas_en_hoja = EXCEL_MAX_ROWS_PER_SHEET
+    numero_hoja = 0
+
+    for chunk in _chunks(df, chunk_rows, posiciones):
+        for fila in chunk.itertuples(index=False, name=None):
+            if filas_en_hoja >= EXCEL_MAX_ROWS_PER_SHEET:
+                numero_hoja += 1
+                ws = wb.create_sheet(sheet_name[:31] if numero_hoja == 1 else f"{sheet_name[:27]} ({numero_hoja})")
+                ws.append(encabezado)
+                filas_en_hoja = 0
+            ws.append([_excel_value(valor) for valor in fila])
+            filas_en_hoja += 1
+
+    if ws is None:
+        wb.create_sheet(sheet_name[:31]).append(encabezado)
+    wb.save(filepath)
+    return filepath
+
+
+def _excel_value(valor):
+    # openpyxl no acepta NaT/NaN/NA de pandas ni tipos de numpy sin convertir
+    if pd.api.types.is_scalar(valor) and pd.isna(valor):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return valor
+
+
+def write_parquet_chunked(df, filepath, chunk_rows=EXPORT_CHUNK_ROWS, posiciones=None):
+    """
+    Escribe un Parquet convirtiendo a Arrow un grupo de filas a la vez. Con posiciones solo se
+    escriben esas filas de df.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in _chunks(df, chunk_rows, posiciones):
+            if writer is None:
+                # El esquema se toma del primer bloque: inferirlo de df completo recorrería todas sus filas
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(filepath, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        if writer is None:
+            pq.write_table(pa.Table.from_pandas(df.head(0), preserve_index=False), filepath)
+    finally:
+        if writer is not None:
+            writer.close()
+    return filepath
+
+
+def export_dataframe(df, formato, nombre="export", posiciones=None):
+    """
+    Exporta un DataFrame a un archivo temporal en el formato indicado ('csv', 'xlsx' o 'parquet')
+    usando escritores por bloques. Con posiciones (p. ej. np.flatnonzero de una máscara) solo se
+    exportan esas filas, sin copiarlas antes. Retorna la ruta del archivo.
+    """
+    if formato not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación no soportado: '{formato}'.")
+    carpeta = tempfile.mkdtemp(prefix="dashboard_export_")
+    filepath = os.path.join(carpeta, f"{nombre}.{formato}")
+    escritor = {"csv": write_csv_chunked, "xlsx": write_xlsx_streaming, "parquet": write_parquet_chunked}[formato]
+    try:
+        return escritor(df, filepath, posiciones=posiciones)
+    except BaseException:
+        shutil.rmtree(carpeta, ignore_errors=True)
+        raise
+
+
+def export_bytes(df, formato, nombre="export", posiciones=None):
+    """
+    Exporta el DataFrame (o solo las filas de posiciones) y retorna el contenido del archivo,
+    listo para descargarse. Streamlit guarda la descarga en memoria de todos modos, así que se lee
+    una sola vez y la carpeta temporal se elimina enseguida, ya con el archivo cerrado (también
+    en Windows, que no permite borrar archivos abiertos).
+    """
+    filepath = export_dataframe(df, formato, nombre, posiciones)
+    try:
+        with open(filepath, 'rb') as archivo:
+            return archivo.read()
+    finally:
+        shutil.rmtree(os.path.dirname(filepath), ignore_errors=True)
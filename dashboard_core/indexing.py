@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+
+def build_facturador_index(df, spec):
+    """
+    Índice invertido de facturador → filas de un dataset. Las posiciones de las filas se ordenan
+    por (facturador, fecha), de modo que las filas de cada facturador forman un rango contiguo
+    y, dentro de él, un rango de fechas es otro rango contiguo (búsqueda binaria). El DataFrame
+    no se reordena.
+
+    Retorna un diccionario con:
+      - "orden": posiciones de las filas ordenadas por (facturador, fecha)
+      - "fechas": fechas en ese mismo orden
+      - "rangos": {facturador: (inicio, fin)} dentro de "orden"
+      - "filas": cantidad de filas del dataset indexado
+    """
+    facturadores = df[spec["facturador"]].to_numpy()
+    fechas = df[spec["fecha"]].to_numpy()
+    codigos, nombres = pd.factorize(facturadores, sort=True)
+    # lexsort ordena por la última clave primero: facturador y, a igualdad, fecha (estable)
+    orden = np.lexsort((fechas, codigos))
+    codigos_ordenados = codigos[orden]
+    limites = np.searchsorted(codigos_ordenados, np.arange(len(nombres) + 1))
+    return {
+        "orden": orden,
+        "fechas": fechas[orden],
+        "rangos": {nombre: (limites[i], limites[i + 1]) for i, nombre in enumerate(nombres)},
+        "filas": len(df),
+    }
+
+
+def index_positions(indice, facturadores, start_date, end_date):
+    """
+    Posiciones (en orden creciente) de las filas de los facturadores indicados con fecha dentro
+    del rango (inclusive). Cada facturador aporta un solo tramo contiguo del índice.
+    """
+    fechas = indice["fechas"]
+    desde = np.datetime64(pd.Timestamp(start_date)).astype(fechas.dtype)
+    hasta = np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1)).astype(fechas.dtype)
+
+    tramos = []
+    for facturador in dict.fromkeys(facturadores):
+        if facturador not in indice["rangos"]:
+            continue
+        inicio, fin = indice["rangos"][facturador]
+        a = inicio + np.searchsorted(fechas[inicio:fin], desde, side='left')
+        b = inicio + np.searchsorted(fechas[inicio:fin], hasta, side='left')
+        tramos.append(indice["orden"][a:b])
+
+    if not tramos:
+        return np.array([], dtype=np.intp)
+    # Orden original de las filas, igual que con una máscara booleana
+    return np.sort(np.concatenate(tramos))
@@ -0,0 +1,214 @@
+import json
+import os
+import warnings
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+
+from dashboard_core.normalization import (
+    SPEC_POR_TIPO,
+    combine_legalizaciones,
+    ingest_dataset,
+    is_normalized,
+    validate_and_normalize,
+)
+from dashboard_core.pipelines import FACTURACION, LEGALIZACIONES, RIPS
+from dashboard_core.preview import PREVIEW_ENABLED, ROLLUP_SUFFIX, monthly_rollup
+from dashboard_core.quality import QUALITY_ATTR, skipped_lines
+
+# Nombres de archivo de los DataFrames persistentes (dentro de PERSISTED_DATA_DIR)
+PPL_FILENAME = "df_ppl.parquet"
+CONVENIOS_FILENAME = "df_convenios.parquet"
+RIPS_FILENAME = "df_rips.parquet"
+FACTURACION_FILENAME = "df_facturacion.parquet"
+
+PERSISTED_FILENAMES = {
+    'ppl': PPL_FILENAME,
+    'convenios': CONVENIOS_FILENAME,
+    'rips': RIPS_FILENAME,
+    'facturacion': FACTURACION_FILENAME,
+}
+
+# --- Caché caliente en Arrow IPC (Feather v2) ---
+# Junto a cada Parquet persistente se guarda una copia ya preparada y normalizada, sin comprimir,
+# que se abre con memory-map: las columnas numéricas y de fecha se usan directamente desde el
+# archivo (sin copiar) y el texto queda respaldado por Arrow. Varios procesos que lean el mismo
+# archivo comparten la caché de páginas del sistema operativo. Se desactiva con
+# DASHBOARD_HOT_CACHE=0.
+HOT_CACHE_ENABLED = os.environ.get("DASHBOARD_HOT_CACHE", "1").strip() != "0"
+HOT_CACHE_SUFFIX = ".arrow"
+
+
+def read_uploaded_file(uploaded_file):
+    """
+    Lee un archivo subido (CSV o Excel) en un DataFrame. Intenta primero CSV y, si falla, Excel
+    con openpyxl. Las excepciones de lectura de Excel se propagan al llamador.
+    Las líneas del CSV que no se pueden leer se omiten y se cuentan en df.attrs["calidad"].
+    """
+    uploaded_file.seek(0) # Siempre resetear el puntero antes de intentar leer
+    try:
+        # Con 'warn' pandas omite las líneas igual que con 'skip', pero avisa cuáles fueron
+        with warnings.catch_warnings(record=True) as avisos:
+            warnings.simplefilter("always", pd.errors.ParserWarning)
+            df = pd.read_csv(uploaded_file, encoding='utf-8', encoding_errors='ignore', on_bad_lines='warn')
+    except Exception:
+        # Si falla CSV, intentar como Excel
+        uploaded_file.seek(0)
+        df = pd.read_excel(uploaded_file, engine='openpyxl')
+        df.attrs[QUALITY_ATTR] = {"lineas_omitidas": None}
+        return df
+    omitidas, ejemplos = skipped_lines(avisos)
+    df.attrs[QUALITY_ATTR] = {"lineas_omitidas": omitidas, "ejemplos_lineas": ejemplos}
+    return df
+
+
+def read_parquet_if_exists(filepath):
+    """Lee un archivo Parquet; retorna None si no existe."""
+    if os.path.exists(filepath):
+        return pd.read_parquet(filepath)
+    return None
+
+
+def file_version(filepath):
+    """Versión de un archivo persistente: cambia cada vez que el archivo se reescribe."""
+    stat = os.stat(filepath)
+    return f"{os.path.basename(filepath)}@{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def hot_cache_path(filepath):
+    """Ruta de la caché caliente (.arrow) de un archivo Parquet persistente."""
+    return os.path.splitext(filepath)[0] + HOT_CACHE_SUFFIX
+
+
+def write_hot_cache(df, filepath):
+    """
+    Guarda df (ya preparado y normalizado) como caché caliente del Parquet filepath, en Arrow IPC
+    sin compresión. Registra la versión del Parquet de origen y df.attrs (marca de normalización
+    y reporte de fechas). La escritura es atómica: otros procesos nunca leen un archivo a medias.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"dashboard_origen": file_version(filepath).encode(),
+        b"dashboard_attrs": json.dumps(df.attrs).encode(),
+    })
+    path = hot_cache_path(filepath)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_hot_cache(filepath):
+    """
+    Abre con memory-map la caché caliente del Parquet filepath. Retorna None si no existe o si
+    el Parquet cambió después de crearla. Las columnas que vienen del archivo son de solo lectura.
+    """
+    path = hot_cache_path(filepath)
+    if not os.path.exists(path):
+        return None
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    metadata = table.schema.metadata or {}
+    if metadata.get(b"dashboard_origen") != file_version(filepath).encode():
+        return None
+    # split_blocks evita consolidar columnas en bloques nuevos, que obligaría a copiarlas. Las
+    # columnas de texto solo se leen sin copiar con pandas >= 3, donde son ArrowStringArray
+    # (con pandas 2 se copian a objetos de Python); por eso requirements.txt exige pandas >= 3.
+    df = table.to_pandas(split_blocks=True)
+    df.attrs = json.loads(metadata.get(b"dashboard_attrs", b"{}"))
+    return df
+
+
+def rollup_path(filepath):
+    """Ruta del resumen mensual (ver dashboard_core/preview.py) de un archivo Parquet persistente."""
+    return os.path.splitext(filepath)[0] + ROLLUP_SUFFIX
+
+
+def write_rollup(df, filepath, tipo):
+    """
+    Guarda el resumen mensual de df (ya preparado y normalizado) junto al Parquet filepath, con la
+    versión del Parquet de origen. No hace nada si df no está normalizado. Escritura atómica.
+    """
+    spec = SPEC_POR_TIPO[tipo]
+    if not is_normalized(df, spec):
+        return
+    table = pa.Table.from_pandas(monthly_rollup(df, spec), preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"dashboard_origen": file_version(filepath).encode(),
+    })
+    path = rollup_path(filepath)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_rollup(filepath):
+    """Resumen mensual del Parquet filepath. Retorna None si no existe o si el Parquet cambió después."""
+    path = rollup_path(filepath)
+    if not os.path.exists(path):
+        return None
+    table = pq.read_table(path)
+    if (table.schema.metadata or {}).get(b"dashboard_origen") != file_version(filepath).encode():
+        return None
+    return table.to_pandas()
+
+
+def remove_persisted_file(filepath):
+    """Elimina un archivo persistente, su caché caliente y su resumen mensual. Retorna True si existía el archivo."""
+    existed = os.path.exists(filepath)
+    for path in (filepath, hot_cache_path(filepath), rollup_path(filepath)):
+        if os.path.exists(path):
+            os.remove(path)
+    return existed
+
+
+def load_persisted_dataset(filepath, tipo):
+    """
+    Carga un archivo persistente listo para el análisis (ver ingest_dataset). Usa la caché
+    caliente si está vigente; si no, lee el Parquet y vuelve a crear la caché.
+    Retorna None si el archivo no existe.
+    """
+    if not os.path.exists(filepath):
+        return None
+    df = read_hot_cache(filepath) if HOT_CACHE_ENABLED else None
+    if df is None:
+        df = ingest_dataset(pd.read_parquet(filepath), tipo)
+        if HOT_CACHE_ENABLED:
+            try:
+                write_hot_cache(df, filepath)
+            except (OSError, pa.ArrowException):
+                # La caché es opcional: si no se puede escribir se sigue con el Parquet
+                pass
+    if PREVIEW_ENABLED and read_rollup(filepath) is None:
+        # Se crea una vez por versión del archivo; como la caché, es opcional
+        try:
+            write_rollup(df, filepath, tipo)
+        except (OSError, pa.ArrowException):
+            pass
+    return df
+
+
+def load_persisted_datasets(data_dir, archivos=None):
+    """
+    Carga los datos persistentes de una carpeta y los deja listos para el análisis,
+    igual que lo hace el dashboard. archivos es {tipo: ruta o None} (p. ej. la foto vigente del
+    almacén, ver store.current_snapshot); si no se indica se usan los nombres de
+    PERSISTED_FILENAMES. Retorna un diccionario con las claves 'Legalizaciones', 'RIPS' y
+    'Facturación' (valor None si el dataset no está disponible).
+    """
+    if archivos is None:
+        archivos = {tipo: os.path.join(data_dir, filename) for tipo, filename in PERSISTED_FILENAMES.items()}
+    datasets = {}
+    for tipo in PERSISTED_FILENAMES:
+        datasets[tipo] = load_persisted_dataset(archivos[tipo], tipo) if archivos.get(tipo) else None
+
+    return {
+        LEGALIZACIONES["nombre"]: validate_and_normalize(
+            combine_legalizaciones(datasets['ppl'], datasets['convenios']), LEGALIZACIONES
+        ),
+        RIPS["nombre"]: validate_and_normalize(datasets['rips'], RIPS),
+        FACTURACION["nombre"]: validate_and_normalize(datasets['facturacion'], FACTURACION),
+    }
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from dashboard_core.pipelines import is_todos, pandas_freq
+
+# Ventanas (en días) de los promedios móviles
+ROLLING_WINDOWS = (7, 30)
+
+# Columnas de la serie diaria por facturador (además de la fecha y el facturador)
+SERIES_COLUMNS = ['Diario', 'Media_7_dias', 'Media_30_dias', 'Acumulado']
+
+
+def daily_counts(df, spec):
+    """
+    Registros por día, facturador y categoría. Es la base de todos los indicadores: se calcula
+    una sola vez por dataset y los indicadores trabajan sobre ella, no sobre las filas.
+    """
+    claves = [df[spec["fecha"]].dt.normalize().rename('Dia'), spec["facturador"]]
+    if spec["categoria"] in df.columns:
+        claves.append(spec["categoria"])
+    return df.groupby(claves, observed=True).size().reset_index(name='Registros')
+
+
+def update_daily_counts(diario, df_nuevas, spec):
+    """
+    Agrega a un conteo diario (de daily_counts) las filas nuevas de df_nuevas, sin recorrer de
+    nuevo las filas ya contadas. Sirve para mantener los indicadores al día cuando llegan días nuevos.
+    """
+    nuevos = daily_counts(df_nuevas, spec)
+    claves = [col for col in diario.columns if col != 'Registros']
+    combinado = pd.concat([diario, nuevos], ignore_index=True)
+    return combinado.groupby(claves, observed=True)['Registros'].sum().reset_index()
+
+
+def _daily_matrix(diario, spec, start_date, end_date, categorias):
+    """
+    Matriz día × facturador con los registros de las categorías elegidas, desde el primer día con
+    datos (para que los promedios móviles del inicio del rango tengan historia) hasta end_date.
+    """
+    if not is_todos(categorias) and spec["categoria"] in diario.columns:
+        diario = diario[diario[spec["categoria"]].isin(categorias)]
+    hasta = pd.Timestamp(end_date)
+    diario = diario[diario['Dia'] <= hasta]
+
+    matriz = diario.pivot_table(
+        index='Dia', columns=spec["facturador"], values='Registros', aggfunc='sum', fill_value=0
+    )
+    primer_dia = min(matriz.index.min(), pd.Timestamp(start_date)) if not matriz.empty else pd.Timestamp(start_date)
+    return matriz.reindex(pd.date_range(primer_dia, hasta, freq='D'), fill_value=0).rename_axis('Dia')
+
+
+def productivity_kpis(diario, spec, start_date, end_date, facturadores=None, categorias=None,
+                      periodo_code="M"):
+    """
+    Indicadores de productividad por facturador a partir del conteo diario.
+
+    Retorna (indicadores, serie):
+      - indicadores: por facturador, Total del rango, promedios diarios de los últimos 7 y 30 días
+        (hasta end_date), Crecimiento_% del último periodo frente al anterior y Ranking dentro del
+        equipo (todos los facturadores de la sección, aunque se muestren solo los elegidos).
+        El último periodo puede estar incompleto si end_date no coincide con su cierre.
+      - serie: por día y facturador, registros del día, promedios móviles de 7 y 30 días y
+        acumulado desde start_date.
+    """
+    facturador_col = spec["facturador"]
+    columnas = [facturador_col, 'Total', 'Promedio_7_dias', 'Promedio_30_dias', 'Crecimiento_%', 'Ranking']
+    matriz = _daily_matrix(diario, spec, start_date, end_date, categorias)
+    if matriz.columns.empty:
+        return pd.DataFrame(columns=columnas), pd.DataFrame(columns=['Dia', facturador_col] + SERIES_COLUMNS)
+
+    medias = {ventana: matriz.rolling(ventana, min_periods=1).mean() for ventana in ROLLING_WINDOWS}
+    en_rango = matriz.loc[pd.Timestamp(start_date):]
+    totales = en_rango.sum()
+
+    por_periodo = en_rango.groupby(pd.Grouper(freq=pandas_freq(periodo_code))).sum()
+    if len(por_periodo) >= 2:
+        anterior = por_periodo.iloc[-2].replace(0, np.nan)
+        crecimiento = ((por_periodo.iloc[-1] - anterior) / anterior * 100).round(1)
+    else:
+        crecimiento = pd.Series(np.nan, index=matriz.columns)
+
+    indicadores = pd.DataFrame({
+        facturador_col: matriz.columns,
+        'Total': totales.to_numpy(),
+        'Promedio_7_dias': medias[7].iloc[-1].round(2).to_numpy(),
+        'Promedio_30_dias': medias[30].iloc[-1].round(2).to_numpy(),
+        'Crecimiento_%': crecimiento.to_numpy(),
+        'Ranking': totales.rank(ascending=False, method='min').astype(int).to_numpy(),
+    })
+    indicadores = indicadores.sort_values(['Ranking', facturador_col], kind='mergesort').reset_index(drop=True)
+
+    tablas = {
+        'Diario': en_rango,
+        'Media_7_dias': medias[7].loc[en_rango.index],
+        'Media_30_dias': medias[30].loc[en_rango.index],
+        'Acumulado': en_rango.cumsum(),
+    }
+    if not is_todos(facturadores):
+        seleccion = [f for f in dict.fromkeys(facturadores) if f in matriz.columns]
+        indicadores = indicadores[indicadores[facturador_col].isin(seleccion)].reset_index(drop=True)
+        tablas = {nombre: tabla[seleccion] for nombre, tabla in tablas.items()}
+
+    # Formato largo: una fila por día y facturador (todas las tablas tienen la misma forma)
+    serie = None
+    for nombre, tabla in tablas.items():
+        largo = tabla.reset_index().melt(id_vars='Dia', var_name=facturador_col, value_name=nombre)
+        serie = largo if serie is None else serie.assign(**{nombre: largo[nombre].to_numpy()})
+    return indicadores, serie
@@ -0,0 +1,142 @@
+import datetime
+import os
+
+import pandas as pd
+
+try:
+    import polars as pl
+except ImportError:  # Polars es opcional: solo se necesita para DASHBOARD_ENGINE=lazy
+    pl = None
+
+# Tipo que pandas asigna a las columnas de texto (object o str según la versión)
+_TEXT_DTYPE = pd.Series(['']).dtype
+
+
+def _require_polars():
+    if pl is None:
+        raise ImportError(
+            "El motor 'lazy' requiere Polars. Instálalo con 'pip install polars' "
+            "o usa DASHBOARD_ENGINE=pandas."
+        )
+
+
+def to_lazyframe(source):
+    """
+    Convierte la fuente de datos en un LazyFrame de Polars.
+    Acepta una ruta a un archivo Parquet (se escanea sin cargarlo), un DataFrame de pandas
+    o un DataFrame/LazyFrame de Polars.
+    """
+    _require_polars()
+    if isinstance(source, (str, os.PathLike)):
+        return pl.scan_parquet(source)
+    if isinstance(source, pl.LazyFrame):
+        return source
+    if isinstance(source, pl.DataFrame):
+        return source.lazy()
+    if isinstance(source, pd.DataFrame):
+        return pl.from_pandas(source).lazy()
+    raise TypeError(f"Fuente de datos no soportada por el motor lazy: {type(source).__name__}")
+
+
+def _fecha_expr(lf, fecha_col):
+    """Expresión de fecha; si la columna viene como texto (Parquet sin normalizar) se parsea."""
+    if lf.collect_schema()[fecha_col] == pl.String:
+        return pl.col(fecha_col).str.to_datetime(strict=False)
+    return pl.col(fecha_col)
+
+
+def _filtered(lf, spec, start_date, end_date, facturadores, categorias):
+    """Aplica los mismos filtros que pipelines.filter_dataset como predicados del plan."""
+    from dashboard_core.pipelines import is_todos
+
+    fecha = _fecha_expr(lf, spec["fecha"])
+    inicio = datetime.datetime.combine(start_date, datetime.time.min)
+    fin = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
+    predicado = (fecha >= inicio) & (fecha < fin)
+
+    if not is_todos(categorias) and spec["categoria"] in lf.collect_schema().names():
+        predicado &= pl.col(spec["categoria"]).is_in(list(categorias))
+
+    if not is_todos(facturadores):
+        predicado &= pl.col(spec["facturador"]).is_in(list(facturadores))
+
+    return lf.with_columns(fecha.alias(spec["fecha"])).filter(predicado)
+
+
+def _period_start(fecha, periodo_code):
+    """
+    Fecha que identifica el periodo de cada registro, equivalente a la etiqueta de
+    pd.Grouper para el mismo código (solo se usa para construir 'Periodo').
+    """
+    if periodo_code == "5D":
+        # pandas ancla los bloques de 5 días en la medianoche de la fecha mínima agrupada
+        origen = fecha.min().dt.truncate("1d")
+        bloques = (fecha.dt.truncate("1d") - origen).dt.total_days() // 5
+        return origen + pl.duration(days=bloques * 5)
+    if periodo_code == "W":
+        # Semanas W-SUN de pandas: de lunes a domingo, etiquetadas con el domingo
+        return fecha.dt.truncate("1w") + pl.duration(days=6)
+    if periodo_code == "M":
+        return fecha.dt.truncate("1mo")
+    if periodo_code == "Q":
+        return fecha.dt.truncate("1q")
+    if periodo_code == "Y":
+        return fecha.dt.truncate("1y")
+    return fecha.dt.truncate("1d")
+
+
+def _period_label(inicio, periodo_code):
+    """Mismo formato de 'Periodo' que pipelines.period_labels."""
+    if periodo_code == "W":
+        return inicio.dt.strftime('Semana %U - %Y')
+    if periodo_code == "M":
+        return inicio.dt.strftime('%Y-%m')
+    if periodo_code == "Q":
+        return pl.format("{}Q{}", inicio.dt.year(), inicio.dt.quarter())
+    if periodo_code == "Y":
+        return inicio.dt.year().cast(pl.String)
+    return inicio.dt.strftime('%Y-%m-%d')
+
+
+def compute_section(source, spec, start_date, end_date, facturadores=None, categorias=None,
+                    periodo_code=None):
+    """
+    Versión perezosa de pipelines.compute_section.
+
+    El filtro se declara una sola vez y el resumen y la evolución se recolectan juntos con
+    collect_all, de modo que Polars comparte el sub-plan filtrado y ejecuta todo en paralelo.
+    """
+    lf = to_lazyframe(source)
+    fecha_col = spec["fecha"]
+    facturador_col = spec["facturador"]
+    total_acumulado = spec["total_acumulado"]
+
+    filtrado = _filtered(lf, spec, start_date, end_date, facturadores, categorias)
+
+    planes = [
+        filtrado.group_by(facturador_col)
+        .agg(pl.len().cast(pl.Int64).alias(total_acumulado))
+        .sort([total_acumulado, facturador_col], descending=[True, False])
+    ]
+    if periodo_code:
+        inicio = _period_start(pl.col(fecha_col), periodo_code)
+        planes.append(
+            filtrado.select(_period_label(inicio, periodo_code).alias('Periodo'), pl.col(facturador_col))
+            .group_by(['Periodo', facturador_col])
+            .agg(pl.len().cast(pl.Int64).alias(spec["total"]))
+            .sort(['Periodo', facturador_col])
+        )
+
+    resultados = [df.to_pandas() for df in pl.collect_all(planes)]
+
+    # Mantener los mismos tipos de columna de texto que produce el motor pandas
+    facturador_dtype = _TEXT_DTYPE
+    if isinstance(source, pd.DataFrame) and facturador_col in source.columns:
+        facturador_dtype = source[facturador_col].dtype
+    for resultado in resultados:
+        resultado[facturador_col] = resultado[facturador_col].astype(facturador_dtype)
+
+    if periodo_code:
+        resultados[1]['Periodo'] = resultados[1]['Periodo'].astype(_TEXT_DTYPE)
+        return resultados[0], resultados[1]
+    return resultados[0], None
@@ -0,0 +1,188 @@
+import os
+
+import pandas as pd
+
+from dashboard_core.dates import parse_dates
+from dashboard_core.pipelines import FACTURACION, LEGALIZACIONES, RIPS
+from dashboard_core.profiling import stage
+from dashboard_core.quality import (
+    QUALITY_ATTR,
+    duplicate_keys,
+    has_report,
+    null_counts,
+    unknown_prefixes,
+)
+
+# Columnas que se convierten a texto al cargar cada tipo de archivo
+LEGALIZACIONES_STR_COLUMNS = ['NUMERO_IDENTIFICACION', 'PROCEDIMIENTO', 'CodigoEspecialidad', 'Usuario']
+RIPS_STR_COLUMNS = ['NOMBRE', 'ESTADO']
+FACTURACION_STR_COLUMNS = ['IDENTIFICACION', 'PREFIJO', 'USUARIO']
+
+# Sección a la que pertenece cada tipo de archivo
+SPEC_POR_TIPO = {
+    'ppl': LEGALIZACIONES,
+    'convenios': LEGALIZACIONES,
+    'rips': RIPS,
+    'facturacion': FACTURACION,
+}
+
+# Columnas mínimas para poder analizar cada dataset
+REQUIRED_COLUMNS = {
+    LEGALIZACIONES["nombre"]: ['Usuario', 'FECHA_REAL'],
+    RIPS["nombre"]: ['NOMBRE', 'ESTADO', 'ULTIMA_MODIFICACION'],
+    FACTURACION["nombre"]: ['USUARIO', 'FECHA FACTURA', 'PREFIJO'],
+}
+
+# Columna que identifica cada registro de RIPS entre cargas (variable de entorno DASHBOARD_RIPS_KEY)
+RIPS_KEY = os.environ.get("DASHBOARD_RIPS_KEY", "CONSECUTIVO").strip()
+
+# Columnas que identifican un registro de cada tipo de archivo: las filas que las repiten se
+# reportan como claves duplicadas en el reporte de calidad
+CLAVES_REGISTRO = {
+    'ppl': ('NUMERO_IDENTIFICACION', 'PROCEDIMIENTO', 'FECHA_REAL'),
+    'convenios': ('NUMERO_IDENTIFICACION', 'PROCEDIMIENTO', 'FECHA_REAL'),
+    'rips': (RIPS_KEY,),
+    'facturacion': ('PREFIJO', 'NUMERO FACTURA'),
+}
+
+# Versión de las reglas de normalización. Se guarda en df.attrs (y con él en el Parquet
+# persistido) para reconocer un dataset ya normalizado; cambiarla obliga a normalizar de nuevo.
+NORMALIZATION_VERSION = 1
+
+# PREFIJO de la factura → tipo de facturación
+TIPO_FACTURACION_POR_PREFIJO = {'SM': 'PPL', 'E': 'Convenios'}
+
+
+def cast_str_columns(df, columns):
+    """Convierte a texto las columnas indicadas que existan en el DataFrame (en el mismo objeto)."""
+    for col in columns:
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+    return df
+
+
+def tipo_facturacion_from_prefijo(prefijo):
+    """Clasifica cada PREFIJO como 'PPL' (SM), 'Convenios' (E) u 'Otro'."""
+    return prefijo.astype(str).str.strip().str.upper().map(TIPO_FACTURACION_POR_PREFIJO).fillna('Otro')
+
+
+def prepare_legalizaciones(df, tipo_legalizacion):
+    """Tipos de datos y columna Tipo_Legalizacion ('PPL' o 'Convenios') de un archivo de legalizaciones."""
+    cast_str_columns(df, LEGALIZACIONES_STR_COLUMNS)
+    df['Tipo_Legalizacion'] = tipo_legalizacion
+    return df
+
+
+def prepare_rips(df):
+    """Tipos de datos de un archivo de RIPS."""
+    return cast_str_columns(df, RIPS_STR_COLUMNS)
+
+
+def prepare_facturacion(df):
+    """
+    Columnas en mayúsculas, tipos de datos y columna Tipo_Facturacion de un archivo de Facturación.
+    Si no existe PREFIJO, Tipo_Facturacion queda como 'Desconocido'.
+    """
+    df.columns = df.columns.str.upper()
+    cast_str_columns(df, FACTURACION_STR_COLUMNS)
+    if 'PREFIJO' in df.columns:
+        df['Tipo_Facturacion'] = tipo_facturacion_from_prefijo(df['PREFIJO'])
+    else:
+        df['Tipo_Facturacion'] = 'Desconocido'
+    return df
+
+
+def prepare_dataset(df, tipo):
+    """
+    Prepara un archivo recién cargado según su tipo: 'ppl', 'convenios', 'rips' o 'facturacion'.
+    Modifica y retorna el mismo DataFrame.
+    """
+    if tipo == 'ppl':
+        return prepare_legalizaciones(df, 'PPL')
+    if tipo == 'convenios':
+        return prepare_legalizaciones(df, 'Convenios')
+    if tipo == 'rips':
+        return prepare_rips(df)
+    if tipo == 'facturacion':
+        return prepare_facturacion(df)
+    raise ValueError(f"Tipo de archivo desconocido: '{tipo}'.")
+
+
+def ingest_dataset(df, tipo):
+    """
+    Prepara y normaliza una sola vez un archivo recién cargado (subido o leído de disco), para
+    que los reruns del dashboard no repitan la conversión de fechas, el descarte y el orden.
+    Si faltan columnas requeridas se retorna solo preparado, y el dashboard lo reporta al validar.
+    En el mismo recorrido se arma el reporte de calidad (df.attrs["calidad"], ver quality), salvo
+    que el archivo ya lo traiga de cuando se guardó.
+    """
+    calidad = None
+    if not has_report(df):
+        # Las celdas vacías se cuentan antes de convertir las columnas a texto
+        calidad = {**df.attrs.get(QUALITY_ATTR, {}), "filas": len(df), "nulos": null_counts(df)}
+    df = prepare_dataset(df, tipo)
+    if calidad is not None and tipo == 'facturacion' and 'PREFIJO' in df.columns:
+        calidad["prefijos_desconocidos"] = unknown_prefixes(df['PREFIJO'], df['Tipo_Facturacion'])
+    spec = SPEC_POR_TIPO[tipo]
+    if not missing_columns(df, spec):
+        df = validate_and_normalize(df, spec)
+    if calidad is not None:
+        # Después de normalizar: las fechas de la clave ya son datetime (más rápido que comparar texto)
+        calidad["claves_duplicadas"] = duplicate_keys(df, CLAVES_REGISTRO[tipo])
+        df.attrs[QUALITY_ATTR] = calidad
+    return df
+
+
+def combine_legalizaciones(df_ppl, df_convenios):
+    """Une los DataFrames de legalizaciones PPL y Convenios (cualquiera puede ser None)."""
+    if df_ppl is not None and df_convenios is not None:
+        return pd.concat([df_ppl, df_convenios], ignore_index=True)
+    elif df_ppl is not None:
+        return df_ppl
+    return df_convenios
+
+
+def missing_columns(df, spec):
+    """Columnas requeridas para el análisis que no están en el DataFrame."""
+    return [col for col in REQUIRED_COLUMNS[spec["nombre"]] if col not in df.columns]
+
+
+def normalized_flag(spec):
+    """Marca que validate_and_normalize deja en df.attrs["normalizado"] para la sección."""
+    return f"{spec['nombre']}:v{NORMALIZATION_VERSION}"
+
+
+def is_normalized(df, spec):
+    """
+    Indica si el DataFrame ya está normalizado para la sección con las reglas actuales. Además
+    de la marca se comprueba el orden por fecha, porque la marca se conserva al concatenar.
+    """
+    return df.attrs.get("normalizado") == normalized_flag(spec) and df[spec["fecha"]].is_monotonic_increasing
+
+
+def validate_and_normalize(df, spec):
+    """
+    Deja un dataset listo para el análisis: facturador como texto, columna de fecha como
+    datetime (ver parse_dates; las fechas vacías o inválidas se descartan y se reportan en
+    df.attrs["fechas"]) y filas ordenadas por fecha.
+    Retorna None si faltan columnas requeridas. Si el dataset ya estaba normalizado
+    (ver is_normalized) se retorna el mismo objeto sin recorrerlo de nuevo.
+    """
+    if df is None or missing_columns(df, spec):
+        return None
+    if is_normalized(df, spec):
+        return df
+
+    fecha_col = spec["fecha"]
+    df = df.copy()
+    # Las columnas requeridas distintas de la fecha (facturador, estado, prefijo) son texto
+    cast_str_columns(df, [col for col in REQUIRED_COLUMNS[spec["nombre"]] if col != fecha_col])
+    ya_convertida = pd.api.types.is_datetime64_any_dtype(df[fecha_col])
+    with stage(spec["nombre"], "conversión de fechas", filas=len(df)):
+        df[fecha_col], reporte = parse_dates(df[fecha_col])
+    if not ya_convertida:
+        # Cuántas fechas venían vacías o no se pudieron convertir (esas filas se descartan)
+        df.attrs["fechas"] = {"columna": fecha_col, **reporte}
+    df = df.dropna(subset=[fecha_col]).sort_values(by=fecha_col)
+    df.attrs["normalizado"] = normalized_flag(spec)
+    return df
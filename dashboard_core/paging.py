@@ -0,0 +1,78 @@
+import weakref
+
+import numpy as np
+
+# Límite de celdas (filas × columnas) y de bytes enviados al navegador por página
+MAX_PAGE_CELLS = 200_000
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+
+# Índices de ordenamiento por DataFrame y columna. Se calculan una vez por dataset y se
+# liberan automáticamente cuando el DataFrame deja de existir.
+_SORT_INDEXES = {}
+
+
+def sorted_positions(df, column, ascending=True):
+    """
+    Posiciones (np.ndarray) que ordenan el DataFrame completo por la columna indicada, de forma
+    estable (los empates conservan el orden original) y con los valores faltantes al final en
+    ambas direcciones. Si el DataFrame ya está ordenado por esa columna (como las fechas tras la
+    normalización) no se ordena nada. Se guarda un índice por columna y dirección.
+    """
+    key = id(df)
+    if key not in _SORT_INDEXES:
+        _SORT_INDEXES[key] = {}
+        weakref.finalize(df, _SORT_INDEXES.pop, key, None)
+    cache = _SORT_INDEXES[key]
+    if cache.get('_filas') != len(df):
+        # El DataFrame se modificó en el mismo objeto: los índices anteriores ya no sirven
+        cache.clear()
+        cache['_filas'] = len(df)
+
+    if (column, ascending) not in cache:
+        valores = df[column]
+        ya_ordenado = valores.is_monotonic_increasing if ascending else valores.is_monotonic_decreasing
+        if ya_ordenado:
+            cache[column, ascending] = np.arange(len(df))
+        else:
+            cache[column, ascending] = valores.reset_index(drop=True).sort_values(
+                ascending=ascending, kind='stable', na_position='last'
+            ).index.to_numpy()
+    return cache[column, ascending]
+
+
+def page_positions(df, mask=None, sort_column=None, ascending=True, page=1, page_size=100):
+    """
+    Posiciones de las filas de una página y total de filas que cumplen la máscara.
+
+    El orden se obtiene del índice precalculado de todo el dataset y se restringe a las filas
+    de la máscara, sin volver a ordenar el subconjunto filtrado.
+    """
+    if sort_column is not None:
+        orden = sorted_positions(df, sort_column, ascending)
+    else:
+        # Sin columna de orden, el orden original del archivo (invertido si es descendente)
+        orden = np.arange(len(df)) if ascending else np.arange(len(df))[::-1]
+
+    if mask is not None:
+        mask_values = np.asarray(mask, dtype=bool)
+        orden = orden[mask_values[orden]]
+
+    total = len(orden)
+    inicio = (max(page, 1) - 1) * page_size
+    return orden[inicio:inicio + page_size], total
+
+
+def cap_page_size(df, page_size):
+    """Reduce el tamaño de página para no superar MAX_PAGE_CELLS con las columnas del DataFrame."""
+    return max(1, min(page_size, MAX_PAGE_CELLS // max(len(df.columns), 1)))
+
+
+def cap_page_bytes(page_df):
+    """Recorta la página si su tamaño en memoria supera MAX_PAGE_BYTES. Retorna (página, recortada)."""
+    if page_df.empty:
+        return page_df, False
+    total_bytes = page_df.memory_usage(deep=True, index=False).sum()
+    if total_bytes <= MAX_PAGE_BYTES:
+        return page_df, False
+    filas = max(1, int(len(page_df) * MAX_PAGE_BYTES / total_bytes))
+    return page_df.iloc[:filas], True
@@ -0,0 +1,249 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from dashboard_core.indexing import index_positions
+from dashboard_core.profiling import stage
+
+# --- Descripción de los datasets analizados ---
+# Cada sección del dashboard sigue el mismo pipeline: filtro por fecha, por categoría
+# (tipo de legalización, estado de RIPS o tipo de facturación) y por facturador, y luego
+# agrupación por facturador y por periodo. Estas especificaciones indican qué columnas usa
+# cada sección para que el mismo código sirva para las tres.
+# "filtros" declara de qué filtros globales depende la sección (ver section_inputs) y
+# "filtro_categoria" cuál de ellos se aplica sobre la columna de categoría.
+LEGALIZACIONES = {
+    "nombre": "Legalizaciones",
+    "fecha": "FECHA_REAL",
+    "facturador": "Usuario",
+    "categoria": "Tipo_Legalizacion",
+    "total": "Total_Legalizaciones",
+    "total_acumulado": "Total_Legalizaciones_Acumuladas",
+    "filtros": ("fechas", "facturador", "tipo_legalizacion", "periodo"),
+    "filtro_categoria": "tipo_legalizacion",
+}
+
+RIPS = {
+    "nombre": "RIPS",
+    "fecha": "ULTIMA_MODIFICACION",
+    "facturador": "NOMBRE",
+    "categoria": "ESTADO",
+    "total": "Total_RIPS",
+    "total_acumulado": "Total_RIPS_Acumulados",
+    "filtros": ("fechas", "facturador", "rips_estado", "periodo"),
+    "filtro_categoria": "rips_estado",
+}
+
+FACTURACION = {
+    "nombre": "Facturación",
+    "fecha": "FECHA FACTURA",
+    "facturador": "USUARIO",
+    "categoria": "Tipo_Facturacion",
+    "total": "Total_Facturacion",
+    "total_acumulado": "Total_Facturacion_Acumulada",
+    "filtros": ("fechas", "facturador", "tipo_facturacion", "periodo"),
+    "filtro_categoria": "tipo_facturacion",
+}
+
+# Periodos disponibles en el selector "Agrupar productividad por"
+PERIODO_TIEMPO_OPTIONS = {
+    "Día": "D",
+    "5 Días": "5D",
+    "Semana": "W",
+    "Mes": "M",
+    "Trimestre": "Q",
+    "Año": "Y"
+}
+
+# Filtros globales del dashboard de los que puede depender una sección
+FILTROS = ("fechas", "facturador", "tipo_legalizacion", "rips_estado", "tipo_facturacion", "periodo")
+
+# --- Motor de cálculo ---
+# "pandas" ejecuta el pipeline de forma ansiosa (comportamiento original).
+# "lazy" construye un único plan perezoso con Polars que fusiona filtros y agrupaciones.
+# Se selecciona con la variable de entorno DASHBOARD_ENGINE.
+ENGINES = ("pandas", "lazy")
+DEFAULT_ENGINE = os.environ.get("DASHBOARD_ENGINE", "pandas").strip().lower()
+
+
+def _resolve_pandas_freq():
+    """Traduce los códigos de periodo a alias válidos para la versión de pandas instalada."""
+    try:
+        pd.tseries.frequencies.to_offset("ME")
+        return {"M": "ME", "Q": "QE", "Y": "YE"}
+    except ValueError:
+        # Versiones de pandas anteriores a 2.2 solo conocen los alias originales
+        return {}
+
+
+_PANDAS_FREQ = _resolve_pandas_freq()
+
+
+def pandas_freq(periodo_code):
+    """Alias de frecuencia de pandas para un código de PERIODO_TIEMPO_OPTIONS."""
+    return _PANDAS_FREQ.get(periodo_code, periodo_code)
+
+
+def is_todos(seleccion):
+    """Indica si una selección de multiselect equivale a 'Todos' (o está vacía)."""
+    return not seleccion or 'Todos' in seleccion
+
+
+def section_inputs(spec, filtros):
+    """
+    Entradas de una sección: los valores (hashables) de los filtros declarados en spec["filtros"],
+    tomados del diccionario con el estado de todos los filtros. Es la clave con la que se memoizan
+    sus resultados, así que un cambio en otro filtro no la invalida. El periodo solo cuenta cuando
+    se eligen facturadores específicos, porque con 'Todos' no se calcula la evolución.
+    """
+    entradas = []
+    for nombre in spec["filtros"]:
+        valor = filtros[nombre]
+        if nombre == "periodo" and is_todos(filtros["facturador"]):
+            valor = None
+        entradas.append((nombre, tuple(valor) if isinstance(valor, list) else valor))
+    return tuple(entradas)
+
+
+def _uses_index(df, facturadores, indice):
+    """El índice solo sirve si hay facturadores específicos y corresponde a este DataFrame."""
+    return indice is not None and not is_todos(facturadores) and indice["filas"] == len(df)
+
+
+def filter_mask(df, spec, start_date, end_date, facturadores=None, categorias=None, indice=None):
+    """
+    Máscara booleana (Serie alineada con df) de las filas dentro del rango de fechas (inclusive),
+    la categoría y los facturadores seleccionados. Las selecciones que contienen 'Todos' no filtran.
+    Con el índice de facturadores del dataset (ver build_facturador_index) solo se revisan las
+    filas de los facturadores seleccionados.
+    """
+    if _uses_index(df, facturadores, indice):
+        posiciones = index_positions(indice, facturadores, start_date, end_date)
+        if not is_todos(categorias) and spec["categoria"] in df.columns:
+            posiciones = posiciones[df[spec["categoria"]].take(posiciones).isin(categorias).to_numpy()]
+        mask = np.zeros(len(df), dtype=bool)
+        mask[posiciones] = True
+        return pd.Series(mask, index=df.index)
+
+    fechas = df[spec["fecha"]]
+    mask = (fechas >= pd.Timestamp(start_date)) & \
+           (fechas < pd.Timestamp(end_date) + pd.Timedelta(days=1))
+
+    if not is_todos(categorias) and spec["categoria"] in df.columns:
+        mask &= df[spec["categoria"]].isin(categorias)
+
+    if not is_todos(facturadores):
+        mask &= df[spec["facturador"]].isin(facturadores)
+
+    return mask
+
+
+def filter_dataset(df, spec, start_date, end_date, facturadores=None, categorias=None, indice=None):
+    """
+    Filtra un DataFrame por rango de fechas (inclusive), categoría y facturador. Con el índice
+    de facturadores se toman directamente sus filas en vez de recorrer todo el dataset.
+    """
+    if _uses_index(df, facturadores, indice):
+        subset = df.take(index_positions(indice, facturadores, start_date, end_date))
+        if not is_todos(categorias) and spec["categoria"] in subset.columns:
+            subset = subset[subset[spec["categoria"]].isin(categorias)]
+        return subset
+    return df[filter_mask(df, spec, start_date, end_date, facturadores, categorias)]
+
+
+def period_labels(fechas, periodo_code):
+    """Convierte las fechas de inicio/fin de cada periodo en la etiqueta 'Periodo' mostrada."""
+    if periodo_code == "W":
+        return fechas.dt.strftime('Semana %U - %Y')
+    elif periodo_code == "M":
+        return fechas.dt.strftime('%Y-%m')
+    elif periodo_code == "Q":
+        return fechas.dt.to_period('Q').astype(str)
+    elif periodo_code == "Y":
+        return fechas.dt.year.astype(str)
+    else:
+        # "D", "5D" y cualquier otro código usan la fecha completa
+        return fechas.dt.strftime('%Y-%m-%d')
+
+
+def summary_by_facturador(df_filtrado, spec):
+    """Total de registros por facturador, ordenado de mayor a menor."""
+    total_col = spec["total_acumulado"]
+    summary = df_filtrado.groupby(spec["facturador"]).size().reset_index(name=total_col)
+    return summary.sort_values(total_col, ascending=False, kind='mergesort').reset_index(drop=True)
+
+
+def evolution_by_period(df_filtrado, spec, periodo_code):
+    """Total de registros por periodo y facturador, con la columna de etiquetas 'Periodo'."""
+    fecha_col = spec["fecha"]
+    facturador_col = spec["facturador"]
+    evolution = df_filtrado.groupby([
+        pd.Grouper(key=fecha_col, freq=pandas_freq(periodo_code)),
+        facturador_col
+    ]).size().reset_index(name=spec["total"])
+
+    evolution['Periodo'] = period_labels(evolution[fecha_col], periodo_code)
+    evolution = evolution.drop(columns=[fecha_col])
+    evolution = evolution.sort_values(by=['Periodo', facturador_col], kind='mergesort').reset_index(drop=True)
+    return evolution[['Periodo', facturador_col, spec["total"]]]
+
+
+def add_percentage(summary, spec):
+    """Agrega la columna 'Porcentaje_del_Total' (texto con '%') a un resumen por facturador."""
+    summary = summary.copy()
+    total_col = spec["total_acumulado"]
+    total_general = summary[total_col].sum()
+    if total_general > 0:
+        summary['Porcentaje_del_Total'] = (summary[total_col] / total_general * 100).round(2)
+        summary['Porcentaje_del_Total'] = summary['Porcentaje_del_Total'].astype(str) + '%'
+    else:
+        summary['Porcentaje_del_Total'] = '0%'
+    return summary
+
+
+def compute_section(source, spec, start_date, end_date, facturadores=None, categorias=None,
+                    periodo_code=None, engine=None, indice=None):
+    """
+    Ejecuta el pipeline completo de una sección (filtro → agrupación).
+
+    Retorna una tupla (resumen_por_facturador, evolucion_por_periodo). La evolución es None
+    si no se pide un periodo. Ambos motores producen exactamente los mismos resultados.
+    indice es el índice de facturadores del dataset (opcional, solo lo usa el motor pandas).
+    """
+    engine = (engine or DEFAULT_ENGINE).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Motor de cálculo desconocido: '{engine}'. Opciones válidas: {', '.join(ENGINES)}.")
+
+    if engine == "lazy":
+        from dashboard_core import lazy_engine
+        # El motor perezoso fusiona filtro y agregación en un solo plan
+        with stage(spec["nombre"], "filtro+agregación (lazy)"):
+            return lazy_engine.compute_section(
+                source, spec, start_date, end_date, facturadores, categorias, periodo_code
+            )
+
+    if isinstance(source, (str, os.PathLike)):
+        source = pd.read_parquet(source)
+
+    with stage(spec["nombre"], "filtro", filas=len(source)) as registro:
+        df_filtrado = filter_dataset(source, spec, start_date, end_date, facturadores, categorias, indice)
+        registro["filas_resultado"] = len(df_filtrado)
+    with stage(spec["nombre"], "agregación", filas=len(df_filtrado)):
+        summary = summary_by_facturador(df_filtrado, spec)
+        evolution = evolution_by_period(df_filtrado, spec, periodo_code) if periodo_code else None
+    return summary, evolution
+
+
+def compute_section_from_inputs(source, spec, entradas, engine=None, indice=None):
+    """compute_section con los filtros dados como las entradas de section_inputs."""
+    entradas = dict(entradas)
+    start_date, end_date = entradas["fechas"]
+    return compute_section(
+        source, spec, start_date, end_date,
+        facturadores=list(entradas["facturador"]),
+        categorias=list(entradas[spec["filtro_categoria"]]),
+        periodo_code=entradas.get("periodo"),
+        engine=engine,
+        indice=indice,
+    )
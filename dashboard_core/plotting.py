@@ -0,0 +1,57 @@
+"""
+Pila de gráficos (matplotlib y seaborn) cargada de forma diferida.
+
+Importar matplotlib.pyplot y seaborn toma cerca de un segundo, y el primer gráfico paga además
+la carga de la caché de fuentes y la inicialización del backend. Por eso se importan recién
+cuando se va a dibujar el primer gráfico (plotting()), con el backend Agg elegido antes de
+importar pyplot: los gráficos siempre se generan como imágenes, sin ventanas. Las paletas se
+construyen una sola vez por proceso (palette()). warm_up() hace todo esto por adelantado, en un
+hilo aparte, para que el primer gráfico no espere.
+"""
+import functools
+import threading
+import time
+
+# Paletas que usan los gráficos del dashboard y de los reportes
+PALETAS = ('crest', 'viridis', 'cividis', 'tab10', 'magma')
+
+_MODULOS = None
+_LOCK = threading.Lock()
+
+
+def plotting():
+    """(pyplot, seaborn) listos para dibujar. La primera llamada del proceso los importa."""
+    global _MODULOS
+    if _MODULOS is None:
+        with _LOCK:
+            if _MODULOS is None:
+                import matplotlib
+                matplotlib.use('Agg')
+                import matplotlib.pyplot as plt
+                import seaborn as sns
+                _MODULOS = (plt, sns)
+    return _MODULOS
+
+
+@functools.lru_cache(maxsize=None)
+def palette(nombre):
+    """Colores de una paleta de seaborn, construidos una vez por proceso."""
+    _, sns = plotting()
+    return tuple(sns.color_palette(nombre))
+
+
+def warm_up():
+    """
+    Importa la pila de gráficos, construye las paletas y dibuja una figura mínima con texto (para
+    cargar las fuentes e iniciar el backend). Retorna los segundos que tomó.
+    """
+    inicio = time.perf_counter()
+    plt, sns = plotting()
+    for nombre in PALETAS:
+        palette(nombre)
+    fig, ax = plt.subplots(figsize=(2, 2))
+    sns.barplot(x=[1], y=['a'], ax=ax)
+    ax.set_title('calentamiento')
+    fig.canvas.draw()
+    plt.close(fig)
+    return time.perf_counter() - inicio
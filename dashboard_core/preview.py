@@ -0,0 +1,125 @@
+"""
+Vista previa aproximada para datasets grandes.
+
+Junto a cada archivo persistente se guarda su resumen mensual: registros por mes, facturador y
+categoría (unas miles de filas aunque el archivo tenga decenas de millones). Con él se estiman
+el resumen por facturador y la evolución por periodo de cualquier combinación de filtros sin
+recorrer las filas, suponiendo que los registros de cada mes se reparten por igual entre sus
+días (solo los meses que el rango de fechas corta a la mitad, y los periodos menores a un mes,
+quedan aproximados). El dashboard muestra esta estimación mientras calcula los resultados
+exactos en segundo plano.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from dashboard_core.pipelines import is_todos, pandas_freq, period_labels
+
+# Se desactiva con DASHBOARD_PREVIEW=0
+PREVIEW_ENABLED = os.environ.get("DASHBOARD_PREVIEW", "1").strip() != "0"
+
+# Filas a partir de las cuales un dataset usa la vista previa
+PREVIEW_MIN_ROWS = int(os.environ.get("DASHBOARD_PREVIEW_ROWS", "1000000"))
+
+# Segundos que se esperan los resultados exactos antes de mostrar la estimación
+PREVIEW_WAIT_SECONDS = 0.3
+
+ROLLUP_SUFFIX = ".mensual.parquet"
+
+
+def monthly_rollup(df, spec):
+    """Registros por mes (primer día del mes), facturador y categoría de un dataset normalizado."""
+    claves = [df[spec["fecha"]].dt.to_period('M').dt.start_time.rename('Mes'), spec["facturador"]]
+    if spec["categoria"] in df.columns:
+        claves.append(spec["categoria"])
+    return df.groupby(claves, observed=True).size().reset_index(name='Registros')
+
+
+def combine_rollups(*rollups):
+    """Une los resúmenes mensuales de varios archivos de la misma sección (p. ej. PPL y Convenios)."""
+    rollups = [rollup for rollup in rollups if rollup is not None]
+    if len(rollups) == 1:
+        return rollups[0]
+    combinado = pd.concat(rollups, ignore_index=True)
+    claves = [col for col in combinado.columns if col != 'Registros']
+    return combinado.groupby(claves, observed=True)['Registros'].sum().reset_index()
+
+
+def _estimated_days(rollup, start_date, end_date):
+    """
+    Registros estimados de cada fila del resumen mensual dentro de [start_date, end_date]: los
+    del mes completo por la fracción de sus días que cae en el rango. Retorna también el primer
+    y el último día del mes que caen en el rango.
+    """
+    inicio, fin = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    dias_mes = rollup['Mes'].dt.days_in_month.to_numpy()
+    fin_mes = rollup['Mes'] + pd.to_timedelta(dias_mes - 1, unit='D')
+    desde = rollup['Mes'].clip(lower=inicio)
+    hasta = fin_mes.clip(upper=fin)
+    dias = ((hasta - desde) / pd.Timedelta(days=1)).to_numpy() + 1
+    return rollup['Registros'].to_numpy() * np.clip(dias, 0, None) / dias_mes, desde, dias
+
+
+def approximate_section(rollup, spec, start_date, end_date, facturadores=None, categorias=None,
+                        periodo_code=None):
+    """
+    Estimación de compute_section a partir del resumen mensual: (resumen, evolución) con las
+    mismas columnas, totales redondeados y df.attrs["aproximado"] = True. La evolución es None
+    si no se pide un periodo.
+    """
+    facturador_col = spec["facturador"]
+    seleccion = rollup[(rollup['Mes'] <= pd.Timestamp(end_date))]
+    if not is_todos(categorias) and spec["categoria"] in seleccion.columns:
+        seleccion = seleccion[seleccion[spec["categoria"]].isin(categorias)]
+    if not is_todos(facturadores):
+        seleccion = seleccion[seleccion[facturador_col].isin(facturadores)]
+    # Las categorías ya no se necesitan: se suman por mes y facturador
+    seleccion = seleccion.groupby(['Mes', facturador_col], observed=True)['Registros'].sum().reset_index()
+
+    estimados, desde, dias = _estimated_days(seleccion, start_date, end_date)
+    en_rango = dias > 0
+    seleccion, estimados, desde, dias = seleccion[en_rango], estimados[en_rango], desde[en_rango], dias[en_rango]
+
+    total_col = spec["total_acumulado"]
+    summary = (
+        pd.Series(estimados, index=seleccion[facturador_col].to_numpy()).groupby(level=0).sum()
+        .round().astype(int).rename(total_col).rename_axis(facturador_col).reset_index()
+    )
+    summary = summary[summary[total_col] > 0]
+    summary = summary.sort_values(total_col, ascending=False, kind='mergesort').reset_index(drop=True)
+    summary.attrs["aproximado"] = True
+    if not periodo_code:
+        return summary, None
+
+    # Evolución: cada fila se reparte por igual entre sus días dentro del rango
+    dias = dias.astype(int)
+    repeticiones = np.repeat(np.arange(len(seleccion)), dias)
+    desplazamiento = np.arange(len(repeticiones)) - np.repeat(np.cumsum(dias) - dias, dias)
+    diario = pd.DataFrame({
+        spec["fecha"]: desde.to_numpy()[repeticiones] + pd.to_timedelta(desplazamiento, unit='D').to_numpy(),
+        facturador_col: seleccion[facturador_col].to_numpy()[repeticiones],
+        spec["total"]: (estimados / dias)[repeticiones],
+    })
+    evolution = diario.groupby([
+        pd.Grouper(key=spec["fecha"], freq=pandas_freq(periodo_code)), facturador_col
+    ])[spec["total"]].sum().reset_index()
+    evolution[spec["total"]] = evolution[spec["total"]].round().astype(int)
+    evolution = evolution[evolution[spec["total"]] > 0]
+    evolution['Periodo'] = period_labels(evolution[spec["fecha"]], periodo_code)
+    evolution = evolution.sort_values(by=['Periodo', facturador_col], kind='mergesort').reset_index(drop=True)
+    evolution = evolution[['Periodo', facturador_col, spec["total"]]]
+    evolution.attrs["aproximado"] = True
+    return summary, evolution
+
+
+def approximate_section_from_inputs(rollup, spec, entradas):
+    """approximate_section con los filtros dados como las entradas de section_inputs."""
+    entradas = dict(entradas)
+    start_date, end_date = entradas["fechas"]
+    return approximate_section(
+        rollup, spec, start_date, end_date,
+        facturadores=list(entradas["facturador"]),
+        categorias=list(entradas[spec["filtro_categoria"]]),
+        periodo_code=entradas.get("periodo"),
+    )
@@ -0,0 +1,94 @@
+import contextlib
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+
+logger = logging.getLogger("dashboard_core.profiling")
+
+# Registros de la ejecución actual (una por rerun). Si no hay ejecución activa, stage() no mide nada.
+_CURRENT_RUN = contextvars.ContextVar("dashboard_profile_run", default=None)
+
+PROFILERS = ("cProfile", "pyinstrument")
+
+
+def _rss_bytes():
+    """Memoria residente del proceso en bytes (None si no se puede medir en esta plataforma)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def start_run():
+    """Inicia el registro de etapas de una ejecución y retorna la lista donde se acumulan."""
+    registros = []
+    _CURRENT_RUN.set(registros)
+    return registros
+
+
+def current_run():
+    return _CURRENT_RUN.get()
+
+
+@contextlib.contextmanager
+def stage(seccion, etapa, filas=None):
+    """
+    Mide una etapa (carga, validación, filtro, agregación, render...) de una sección:
+    duración, variación de memoria del proceso y filas procesadas. Cada medición se agrega
+    a la ejecución actual y se emite como log estructurado (JSON).
+
+    El registro que entrega el contexto puede completarse dentro del bloque, por ejemplo
+    registro['filas'] = len(df).
+    """
+    registros = _CURRENT_RUN.get()
+    registro = {"seccion": seccion, "etapa": etapa, "filas": filas}
+    if registros is None:
+        yield registro
+        return
+
+    rss_inicio = _rss_bytes()
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+        rss_fin = _rss_bytes()
+        registro["memoria_delta_mb"] = (
+            round((rss_fin - rss_inicio) / 2**20, 2) if rss_inicio is not None and rss_fin is not None else None
+        )
+        registros.append(registro)
+        logger.info(json.dumps({"evento": "etapa", **registro}, ensure_ascii=False, default=str))
+
+
+def start_profiler(herramienta="cProfile"):
+    """Inicia la captura de un perfil completo (cProfile o pyinstrument si está instalado)."""
+    if herramienta == "pyinstrument":
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        return profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profiler(profiler, top=40):
+    """Detiene la captura y retorna el reporte en texto."""
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        salida = io.StringIO()
+        pstats.Stats(profiler, stream=salida).sort_stats("cumulative").print_stats(top)
+        return salida.getvalue()
+    profiler.stop()
+    return profiler.output_text(unicode=True, color=False)
@@ -0,0 +1,100 @@
+"""
+Reporte de calidad de datos de cada archivo cargado.
+
+Las estadísticas se toman durante la ingesta, sobre las columnas que la ingesta ya recorre
+(lectura del CSV, conversión a texto, clasificación del PREFIJO y conversión de fechas), y se
+guardan en df.attrs["calidad"]. Como df.attrs viaja con el Parquet persistido y con la caché
+caliente, el reporte se conserva con los datos guardados y no se recalcula al volver a cargarlos.
+
+Contenido del reporte:
+  - filas: filas leídas del archivo (antes de descartar fechas inválidas).
+  - lineas_omitidas: líneas del CSV con más columnas de las esperadas, que no se pudieron leer
+    (None si el archivo no era CSV), y las primeras de ellas en ejemplos_lineas.
+  - nulos: celdas vacías por columna (solo las columnas que tienen alguna).
+  - prefijos_desconocidos: facturas con un PREFIJO que no es de PPL ni de Convenios, y los
+    valores más frecuentes (solo Facturación).
+  - claves_duplicadas: filas (con fecha válida) que repiten la clave de registro de CLAVES_REGISTRO.
+Las fechas vacías o no reconocidas se reportan aparte en df.attrs["fechas"] (ver validate_and_normalize).
+"""
+import re
+
+import pandas as pd
+
+QUALITY_ATTR = "calidad"
+
+# Líneas omitidas que se conservan como ejemplo
+MAX_EJEMPLOS = 10
+
+_LINEA_OMITIDA = re.compile(r"Skipping line (\d+)")
+
+
+def skipped_lines(avisos):
+    """
+    Líneas omitidas por pd.read_csv(on_bad_lines='warn') a partir de los avisos capturados con
+    warnings.catch_warnings(record=True). Retorna (cantidad, primeras líneas).
+    """
+    lineas = []
+    for aviso in avisos:
+        if issubclass(aviso.category, pd.errors.ParserWarning):
+            lineas.extend(int(numero) for numero in _LINEA_OMITIDA.findall(str(aviso.message)))
+    return len(lineas), lineas[:MAX_EJEMPLOS]
+
+
+def null_counts(df):
+    """
+    Celdas vacías por columna, solo de las columnas que tienen alguna. Se cuentan columna por
+    columna (Series.count) en lugar de con df.isna(), que arma una copia booleana de todo el
+    DataFrame; en las columnas respaldadas por Arrow el conteo sale de los nulos que ya registra.
+    """
+    filas = len(df)
+    nulos = {}
+    for col in df.columns:
+        n = filas - int(df[col].count())
+        if n:
+            nulos[str(col)] = n
+    return nulos
+
+
+def unknown_prefixes(prefijos, tipos, desconocido='Otro', max_valores=MAX_EJEMPLOS):
+    """Facturas cuyo PREFIJO no se pudo clasificar y sus valores más frecuentes."""
+    desconocidos = tipos == desconocido
+    valores = prefijos[desconocidos].value_counts().head(max_valores)
+    return {"filas": int(desconocidos.sum()), "valores": {str(v): int(n) for v, n in valores.items()}}
+
+
+def duplicate_keys(df, columnas):
+    """Filas que repiten una clave ya vista (None si falta alguna columna de la clave)."""
+    if not columnas or any(col not in df.columns for col in columnas):
+        return None
+    return {"columnas": list(columnas), "filas": int(df.duplicated(subset=list(columnas)).sum())}
+
+
+def has_report(df):
+    """Indica si el dataset ya trae su reporte de calidad completo (p. ej. porque viene del Parquet persistido)."""
+    return "filas" in df.attrs.get(QUALITY_ATTR, {})
+
+
+def quality_summary(reportes):
+    """
+    Tabla de salud de los datos: una fila por archivo con los totales de cada problema.
+    reportes: diccionario nombre del archivo → df.attrs del dataset.
+    """
+    filas = []
+    for nombre, attrs in reportes.items():
+        calidad = attrs.get(QUALITY_ATTR, {})
+        fechas = attrs.get("fechas", {})
+        prefijos = calidad.get("prefijos_desconocidos")
+        duplicados = calidad.get("claves_duplicadas")
+        filas.append({
+            "Archivo": nombre,
+            "Filas_Leidas": calidad.get("filas"),
+            "Lineas_Omitidas": calidad.get("lineas_omitidas"),
+            "Celdas_Vacias": sum(calidad.get("nulos", {}).values()) if "nulos" in calidad else None,
+            "Fechas_Vacias": fechas.get("vacias"),
+            "Fechas_No_Reconocidas": fechas.get("invalidas"),
+            "Prefijos_Desconocidos": prefijos["filas"] if prefijos else None,
+            "Claves_Duplicadas": duplicados["filas"] if duplicados else None,
+        })
+    tabla = pd.DataFrame(filas)
+    # Enteros con vacíos (el dato no aplica o no se tomó) en lugar de decimales
+    return tabla.astype({col: 'Int64' for col in tabla.columns if col != "Archivo"})
@@ -0,0 +1,159 @@
+"""
+Conciliación Legalización → Facturación.
+
+Cada legalización se relaciona con la primera factura del mismo paciente y del mismo tipo
+(PPL o Convenios) emitida en la fecha de la legalización o después. La relación se resuelve
+con una unión "as-of" ordenada por fecha (pd.merge_asof), agrupada por una clave entera de
+paciente y tipo: cada lado se recorre una sola vez, sin el producto cartesiano que produciría
+unir por paciente y luego filtrar por fecha.
+"""
+import numpy as np
+import pandas as pd
+
+from dashboard_core.pipelines import FACTURACION, LEGALIZACIONES
+
+# Identificación del paciente en cada dataset
+ID_LEGALIZACION = 'NUMERO_IDENTIFICACION'
+ID_FACTURACION = 'IDENTIFICACION'
+
+# Tipos que se pueden conciliar (Tipo_Legalizacion ↔ Tipo_Facturacion)
+TIPOS_CONCILIABLES = ('PPL', 'Convenios')
+
+# Columnas de la legalización que se conservan en el resultado de la conciliación
+COLUMNAS_LEGALIZACION = [
+    LEGALIZACIONES["fecha"], LEGALIZACIONES["facturador"], ID_LEGALIZACION, 'PROCEDIMIENTO',
+    LEGALIZACIONES["categoria"],
+]
+
+# Vista de la conciliación para los filtros globales: las legalizaciones conciliadas se filtran
+# por fecha de legalización, facturador que legalizó y tipo, igual que en su sección
+CICLO = {
+    **LEGALIZACIONES,
+    "nombre": "Ciclo Legalización → Facturación",
+    "filtros": ("fechas", "facturador", "tipo_legalizacion"),
+}
+
+# Rangos (en días completos) de la distribución del tiempo de ciclo: 7,5 días cuenta como 7
+CICLO_RANGOS = [0, 7, 15, 30, 60, 90, np.inf]
+CICLO_ETIQUETAS = ['0-7 días', '8-15 días', '16-30 días', '31-60 días', '61-90 días', 'Más de 90 días']
+
+
+def can_reconcile(df_legalizaciones, df_facturacion):
+    """Indica si ambos datasets están disponibles y tienen la identificación del paciente."""
+    return (
+        df_legalizaciones is not None and df_facturacion is not None
+        and ID_LEGALIZACION in df_legalizaciones.columns and ID_FACTURACION in df_facturacion.columns
+    )
+
+
+def _patient_keys(ids_legalizacion, tipos_legalizacion, ids_facturacion, tipos_facturacion):
+    """
+    Clave entera (paciente, tipo) de cada fila de ambos lados. Los pacientes se codifican juntos
+    para que un mismo documento tenga el mismo código en los dos datasets. Las filas sin
+    identificación o con un tipo no conciliable quedan con clave -1.
+    """
+    ids = pd.concat([ids_legalizacion, ids_facturacion], ignore_index=True).astype(str).str.strip()
+    codigos, _ = pd.factorize(ids.mask(ids.isin(['', 'nan', 'None'])))
+    # Los tipos tienen pocos valores distintos: se codifican y se traducen por valor único
+    codigos_tipo, valores_tipo = pd.factorize(pd.concat([tipos_legalizacion, tipos_facturacion], ignore_index=True))
+    tabla = np.array([TIPOS_CONCILIABLES.index(v) if v in TIPOS_CONCILIABLES else -1 for v in valores_tipo] + [-1])
+    tipos = tabla.take(codigos_tipo)
+    claves = np.where((codigos >= 0) & (tipos >= 0), codigos * len(TIPOS_CONCILIABLES) + tipos, -1)
+    return claves[:len(ids_legalizacion)], claves[len(ids_legalizacion):]
+
+
+def reconcile(df_legalizaciones, df_facturacion, max_dias=None):
+    """
+    Relaciona cada legalización con su factura (ver el docstring del módulo).
+
+    Retorna las legalizaciones (columnas de COLUMNAS_LEGALIZACION, en el mismo orden de filas)
+    con la fecha de la factura encontrada (NaT si no hay), 'Dias_Ciclo' (días entre la
+    legalización y la factura) y 'Facturada'. Con max_dias, una factura emitida más de
+    max_dias días después no cuenta. Retorna None si falta algún dataset o la identificación.
+    Ambos datasets deben venir normalizados (fechas convertidas).
+    """
+    if not can_reconcile(df_legalizaciones, df_facturacion):
+        return None
+
+    fecha_leg, fecha_fact = LEGALIZACIONES["fecha"], FACTURACION["fecha"]
+    claves_leg, claves_fact = _patient_keys(
+        df_legalizaciones[ID_LEGALIZACION], df_legalizaciones[LEGALIZACIONES["categoria"]],
+        df_facturacion[ID_FACTURACION], df_facturacion[FACTURACION["categoria"]],
+    )
+
+    fechas_leg = df_legalizaciones[fecha_leg].to_numpy()
+    izquierda = pd.DataFrame({'_clave': claves_leg, '_fecha': fechas_leg, '_fila': np.arange(len(fechas_leg))})
+    if not izquierda['_fecha'].is_monotonic_increasing:
+        izquierda = izquierda.sort_values('_fecha', kind='mergesort')
+
+    # Solo las facturas que pueden conciliarse, con la misma resolución de fecha que la izquierda
+    validas = claves_fact >= 0
+    derecha = pd.DataFrame({
+        '_clave': claves_fact[validas],
+        '_fecha_factura': df_facturacion[fecha_fact].to_numpy()[validas].astype(fechas_leg.dtype),
+    })
+    if not derecha['_fecha_factura'].is_monotonic_increasing:
+        derecha = derecha.sort_values('_fecha_factura', kind='mergesort')
+
+    unidas = pd.merge_asof(
+        izquierda, derecha, left_on='_fecha', right_on='_fecha_factura', by='_clave',
+        direction='forward', allow_exact_matches=True,
+        tolerance=pd.Timedelta(days=max_dias) if max_dias else None,
+    )
+    fechas_factura = np.empty(len(fechas_leg), dtype=fechas_leg.dtype)
+    # Las filas sin clave (-1) quedan sin factura: a la derecha no hay claves -1
+    fechas_factura[unidas['_fila'].to_numpy()] = unidas['_fecha_factura'].to_numpy()
+
+    conciliado = df_legalizaciones[[col for col in COLUMNAS_LEGALIZACION if col in df_legalizaciones.columns]].copy()
+    conciliado[fecha_fact] = fechas_factura
+    conciliado['Dias_Ciclo'] = ((conciliado[fecha_fact] - conciliado[fecha_leg]) / pd.Timedelta(days=1)).round(2)
+    conciliado['Facturada'] = conciliado[fecha_fact].notna()
+    return conciliado
+
+
+def cycle_time_summary(conciliado):
+    """
+    Tiempo de ciclo por tipo de legalización (y en total): legalizaciones, facturadas, sin
+    facturar, porcentaje facturado y promedio, mediana, percentil 90 y máximo de días.
+    """
+    tipo_col = LEGALIZACIONES["categoria"]
+    columnas = [tipo_col, 'Legalizaciones', 'Facturadas', 'Sin_Facturar', 'Porcentaje_Facturado',
+                'Dias_Promedio', 'Dias_Mediana', 'Dias_P90', 'Dias_Max']
+
+    def resumen(grupo):
+        dias = grupo['Dias_Ciclo'].dropna()
+        facturadas = int(grupo['Facturada'].sum())
+        return {
+            'Legalizaciones': len(grupo),
+            'Facturadas': facturadas,
+            'Sin_Facturar': len(grupo) - facturadas,
+            'Porcentaje_Facturado': round(facturadas / len(grupo) * 100, 2) if len(grupo) else 0.0,
+            'Dias_Promedio': round(dias.mean(), 2) if len(dias) else np.nan,
+            'Dias_Mediana': round(dias.median(), 2) if len(dias) else np.nan,
+            'Dias_P90': round(dias.quantile(0.9), 2) if len(dias) else np.nan,
+            'Dias_Max': round(dias.max(), 2) if len(dias) else np.nan,
+        }
+
+    filas = [{tipo_col: tipo, **resumen(grupo)} for tipo, grupo in conciliado.groupby(tipo_col, observed=True)]
+    if len(filas) > 1:
+        filas.append({tipo_col: 'Total', **resumen(conciliado)})
+    return pd.DataFrame(filas, columns=columnas)
+
+
+def cycle_time_distribution(conciliado):
+    """
+    Legalizaciones facturadas por rango de días de ciclo (CICLO_RANGOS) y tipo de legalización.
+    Dias_Ciclo es fraccionario: se toman los días completos para que cada valor caiga en el rango
+    que indica su etiqueta.
+    """
+    tipo_col = LEGALIZACIONES["categoria"]
+    facturadas = conciliado[conciliado['Facturada']]
+    rangos = pd.cut(np.floor(facturadas['Dias_Ciclo']), CICLO_RANGOS, labels=CICLO_ETIQUETAS, include_lowest=True)
+    distribucion = facturadas.groupby([rangos.rename('Rango_Dias'), tipo_col], observed=False).size()
+    return distribucion.reset_index(name='Legalizaciones')
+
+
+def unbilled_legalizations(conciliado):
+    """Legalizaciones sin factura encontrada, de la más antigua a la más reciente."""
+    sin_facturar = conciliado[~conciliado['Facturada']]
+    return sin_facturar.drop(columns=[FACTURACION["fecha"], 'Dias_Ciclo', 'Facturada']).reset_index(drop=True)
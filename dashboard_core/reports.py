@@ -0,0 +1,165 @@
+import datetime
+import os
+
+import pandas as pd
+
+from dashboard_core.pipelines import (
+    FACTURACION,
+    LEGALIZACIONES,
+    RIPS,
+    add_percentage,
+    compute_section,
+)
+from dashboard_core.plotting import plotting
+
+# Secciones incluidas en los reportes, en el mismo orden que el dashboard
+SECTIONS = (LEGALIZACIONES, RIPS, FACTURACION)
+
+OUTPUT_FORMATS = ("xlsx", "csv", "png", "pdf")
+
+# Paletas de los gráficos de cada sección (las mismas del dashboard)
+SECTION_PALETTES = {
+    LEGALIZACIONES["nombre"]: 'crest',
+    RIPS["nombre"]: 'viridis',
+    FACTURACION["nombre"]: 'cividis',
+}
+
+# Frecuencias para dividir el rango de fechas en varios periodos de reporte
+SPLIT_FREQUENCIES = {"mes": "MS", "trimestre": "QS", "año": "YS"}
+
+
+def split_date_range(start_date, end_date, dividir_por=None):
+    """
+    Divide [start_date, end_date] en periodos de reporte consecutivos (mes, trimestre o año).
+    Retorna una lista de tuplas (inicio, fin, etiqueta). Sin división, retorna un solo periodo.
+    """
+    if not dividir_por:
+        return [(start_date, end_date, f"{start_date}_a_{end_date}")]
+
+    inicios = pd.date_range(start_date, end_date, freq=SPLIT_FREQUENCIES[dividir_por]).date.tolist()
+    if not inicios or inicios[0] != start_date:
+        inicios.insert(0, start_date)
+
+    periodos = []
+    for i, inicio in enumerate(inicios):
+        fin = inicios[i + 1] - datetime.timedelta(days=1) if i + 1 < len(inicios) else end_date
+        periodos.append((inicio, fin, f"{inicio}_a_{fin}"))
+    return periodos
+
+
+def compute_report_tables(datasets, start_date, end_date, facturadores=None, categorias=None,
+                          periodo_code="M", engine=None):
+    """
+    Calcula las mismas tablas del dashboard para cada sección con datos.
+
+    datasets: diccionario nombre de sección → DataFrame normalizado (o None).
+    categorias: diccionario nombre de sección → selección de tipo/estado (opcional).
+    Retorna un diccionario nombre de sección → (resumen con porcentaje, evolución por periodo).
+    """
+    categorias = categorias or {}
+    tablas = {}
+    for spec in SECTIONS:
+        df = datasets.get(spec["nombre"])
+        if df is None or df.empty:
+            continue
+        summary, evolution = compute_section(
+            df, spec, start_date, end_date,
+            facturadores=facturadores,
+            categorias=categorias.get(spec["nombre"]),
+            periodo_code=periodo_code,
+            engine=engine,
+        )
+        tablas[spec["nombre"]] = (add_percentage(summary, spec), evolution)
+    return tablas
+
+
+def _summary_figure(summary, spec, titulo):
+    plt, sns = plotting()
+
+    total_col = spec["total_acumulado"]
+    facturador_col = spec["facturador"]
+    fig, ax = plt.subplots(figsize=(10, max(6, len(summary) * 0.5)))
+    sns.barplot(x=total_col, y=facturador_col, data=summary, ax=ax,
+                palette=SECTION_PALETTES[spec["nombre"]], hue=facturador_col, legend=False)
+    ax.set_title(f'Total Acumulado de {spec["nombre"]} por Facturador ({titulo})')
+    ax.set_xlabel(total_col.replace('_', ' '))
+    ax.set_ylabel('Facturador')
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%.0f', label_type='edge', padding=5)
+    fig.tight_layout()
+    return fig
+
+
+def _evolution_figure(evolution, spec, periodo_label, titulo):
+    plt, sns = plotting()
+
+    fig, ax = plt.subplots(figsize=(14, 7))
+    sns.lineplot(x='Periodo', y=spec["total"], hue=spec["facturador"], data=evolution, ax=ax,
+                 marker='o', palette=SECTION_PALETTES[spec["nombre"]])
+    ax.set_title(f'Evolución de {spec["nombre"]} por Facturador(es) ({periodo_label}) - {titulo}')
+    ax.set_xlabel(f'Periodo ({periodo_label})')
+    ax.set_ylabel(spec["total"].replace('_', ' '))
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    return fig
+
+
+def write_report(tablas, output_dir, formats=OUTPUT_FORMATS, titulo="", periodo_label=""):
+    """
+    Escribe las tablas de un periodo de reporte en output_dir en los formatos pedidos:
+    un libro Excel con una hoja por tabla, un CSV por tabla, un PNG por gráfico y un PDF
+    con todos los gráficos. Retorna la lista de archivos generados.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    archivos = []
+
+    if "csv" in formats:
+        for nombre, (summary, evolution) in tablas.items():
+            for sufijo, tabla in (("resumen", summary), ("evolucion", evolution)):
+                if tabla is None:
+                    continue
+                ruta = os.path.join(output_dir, f"{sufijo}_{_slug(nombre)}.csv")
+                tabla.to_csv(ruta, index=False, encoding='utf-8-sig')
+                archivos.append(ruta)
+
+    if "xlsx" in formats:
+        ruta = os.path.join(output_dir, "reporte.xlsx")
+        with pd.ExcelWriter(ruta, engine='openpyxl') as writer:
+            for nombre, (summary, evolution) in tablas.items():
+                summary.to_excel(writer, sheet_name=f"Resumen {nombre}"[:31], index=False)
+                if evolution is not None:
+                    evolution.to_excel(writer, sheet_name=f"Evolucion {nombre}"[:31], index=False)
+        archivos.append(ruta)
+
+    if "png" in formats or "pdf" in formats:
+        plt, _ = plotting()
+        from matplotlib.backends.backend_pdf import PdfPages
+
+        figuras = []
+        for nombre, (summary, evolution) in tablas.items():
+            spec = next(s for s in SECTIONS if s["nombre"] == nombre)
+            if not summary.empty:
+                figuras.append((f"resumen_{_slug(nombre)}", _summary_figure(summary, spec, titulo)))
+            if evolution is not None and not evolution.empty:
+                figuras.append((f"evolucion_{_slug(nombre)}", _evolution_figure(evolution, spec, periodo_label, titulo)))
+
+        if "png" in formats:
+            for nombre_archivo, fig in figuras:
+                ruta = os.path.join(output_dir, f"{nombre_archivo}.png")
+                fig.savefig(ruta, dpi=120)
+                archivos.append(ruta)
+        if "pdf" in formats and figuras:
+            ruta = os.path.join(output_dir, "reporte.pdf")
+            with PdfPages(ruta) as pdf:
+                for _, fig in figuras:
+                    pdf.savefig(fig)
+            archivos.append(ruta)
+        for _, fig in figuras:
+            plt.close(fig)
+
+    return archivos
+
+
+def _slug(nombre):
+    return nombre.lower().replace('ó', 'o').replace(' ', '_')
@@ -0,0 +1,250 @@
+"""
+Historial de estados de RIPS (captura de cambios).
+
+Cada archivo de RIPS trae solo el ESTADO actual de cada registro, y al guardarlo reemplaza al
+anterior. Para saber cuánto tiempo pasa cada RIPS en cada estado, antes de reemplazar el
+archivo persistente se compara el nuevo con el anterior (unión por hash sobre la clave del
+registro) y solo las transiciones de estado se agregan a un registro de eventos. El registro
+crece con la cantidad de cambios, no con la cantidad de cargas por el tamaño del archivo.
+
+Cada evento tiene: CLAVE, NOMBRE / NOMBRE_ANTERIOR (facturador), ESTADO_ANTERIOR, ESTADO,
+FECHA_CAMBIO y FECHA_DETECCION. Un registro nuevo tiene ESTADO_ANTERIOR vacío y uno que
+desaparece del archivo tiene ESTADO vacío (su FECHA_CAMBIO es la fecha de detección).
+"""
+import datetime
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from dashboard_core.ingestion import load_persisted_dataset
+from dashboard_core.normalization import RIPS_KEY, missing_columns
+from dashboard_core.pipelines import RIPS, is_todos, pandas_freq, period_labels
+
+# Carpeta (dentro de la carpeta de datos persistentes) con el registro de eventos. Cada
+# detección agrega un archivo Parquet con sus eventos; los anteriores no se reescriben.
+RIPS_EVENTS_DIRNAME = "rips_eventos"
+
+EVENT_COLUMNS = ['CLAVE', 'NOMBRE', 'NOMBRE_ANTERIOR', 'ESTADO_ANTERIOR', 'ESTADO', 'FECHA_CAMBIO', 'FECHA_DETECCION']
+
+
+def can_track(df, clave=RIPS_KEY):
+    """Indica si un dataset de RIPS tiene las columnas necesarias para el historial de estados."""
+    return df is not None and clave in df.columns and not missing_columns(df, RIPS)
+
+
+def _snapshot(df, clave):
+    """Clave (texto), facturador, estado y fecha de cada registro; si una clave se repite, su versión más reciente."""
+    estado = df[[clave, RIPS["facturador"], RIPS["categoria"], RIPS["fecha"]]].rename(columns={clave: 'CLAVE'})
+    estado = estado.assign(CLAVE=estado['CLAVE'].astype(str).str.strip())
+    return estado.sort_values(RIPS["fecha"], kind='mergesort').drop_duplicates('CLAVE', keep='last')
+
+
+def diff_snapshots(df_anterior, df_nuevo, clave=RIPS_KEY, detectado=None):
+    """
+    Eventos de cambio de estado entre dos archivos de RIPS: registros nuevos, registros cuyo
+    ESTADO cambió y registros que ya no aparecen. df_anterior puede ser None (todos son nuevos).
+    La fecha del cambio es ULTIMA_MODIFICACION del registro nuevo.
+
+    La unión es por hash: las claves de ambos archivos se codifican juntas (pd.factorize) y
+    cada registro nuevo encuentra su versión anterior con una tabla código → posición, sin
+    ordenar ninguno de los dos archivos por clave.
+    """
+    detectado = pd.Timestamp(detectado or datetime.datetime.now()).floor('s')
+    fecha_col, estado_col, facturador_col = RIPS["fecha"], RIPS["categoria"], RIPS["facturador"]
+    nuevo = _snapshot(df_nuevo, clave)
+    anterior = _snapshot(df_anterior, clave) if df_anterior is not None else nuevo.iloc[0:0]
+
+    codigos, claves = pd.factorize(pd.concat([anterior['CLAVE'], nuevo['CLAVE']], ignore_index=True))
+    codigos_anterior, codigos_nuevo = codigos[:len(anterior)], codigos[len(anterior):]
+    posicion_anterior = np.full(len(claves), -1, dtype=np.int64)
+    posicion_anterior[codigos_anterior] = np.arange(len(anterior))
+    en_nuevo = np.zeros(len(claves), dtype=bool)
+    en_nuevo[codigos_nuevo] = True
+
+    # Registros del archivo nuevo: nuevos (sin versión anterior) o con otro ESTADO
+    previa = posicion_anterior[codigos_nuevo]
+    existia = previa >= 0
+    estado_anterior = pd.Series(pd.NA, index=nuevo.index, dtype=nuevo[estado_col].dtype)
+    estado_anterior[existia] = anterior[estado_col].to_numpy()[previa[existia]]
+    nombre_anterior = pd.Series(pd.NA, index=nuevo.index, dtype=nuevo[facturador_col].dtype)
+    nombre_anterior[existia] = anterior[facturador_col].to_numpy()[previa[existia]]
+    cambiados = ~existia | (nuevo[estado_col] != estado_anterior).fillna(True).to_numpy()
+    cambios = pd.DataFrame({
+        'CLAVE': nuevo['CLAVE'],
+        'NOMBRE': nuevo[facturador_col],
+        'NOMBRE_ANTERIOR': nombre_anterior,
+        'ESTADO_ANTERIOR': estado_anterior,
+        'ESTADO': nuevo[estado_col],
+        'FECHA_CAMBIO': nuevo[fecha_col],
+    })[cambiados]
+
+    # Registros del archivo anterior que ya no aparecen
+    eliminados = anterior[~en_nuevo[codigos_anterior]]
+    bajas = pd.DataFrame({
+        'CLAVE': eliminados['CLAVE'],
+        'NOMBRE': pd.Series(pd.NA, index=eliminados.index, dtype=eliminados[facturador_col].dtype),
+        'NOMBRE_ANTERIOR': eliminados[facturador_col],
+        'ESTADO_ANTERIOR': eliminados[estado_col],
+        'ESTADO': pd.Series(pd.NA, index=eliminados.index, dtype=eliminados[estado_col].dtype),
+        'FECHA_CAMBIO': pd.Series(detectado, index=eliminados.index).astype(nuevo[fecha_col].dtype),
+    })
+
+    eventos = pd.concat([cambios, bajas], ignore_index=True) if len(bajas) else cambios.reset_index(drop=True)
+    return eventos.assign(FECHA_DETECCION=detectado)
+
+
+def events_dir(data_dir):
+    """Carpeta del registro de eventos dentro de la carpeta de datos persistentes."""
+    return os.path.join(data_dir, RIPS_EVENTS_DIRNAME)
+
+
+def _event_files(directorio):
+    return sorted(glob.glob(os.path.join(directorio, "eventos-*.parquet")))
+
+
+def events_version(directorio):
+    """Versión del registro de eventos: cambia cada vez que se agregan eventos."""
+    archivos = _event_files(directorio)
+    return f"{len(archivos)}:{os.path.basename(archivos[-1])}" if archivos else "0"
+
+
+def append_events(eventos, directorio):
+    """Agrega los eventos al registro como un archivo nuevo (escritura atómica). Retorna cuántos se agregaron."""
+    if eventos is None or eventos.empty:
+        return 0
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"eventos-{datetime.datetime.now():%Y%m%d%H%M%S%f}.parquet"
+    path = os.path.join(directorio, nombre)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    eventos.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return len(eventos)
+
+
+def load_events(directorio):
+    """Registro de eventos completo, ordenado por fecha de cambio (vacío si no hay eventos)."""
+    archivos = _event_files(directorio)
+    if not archivos:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    eventos = pd.concat([pd.read_parquet(archivo) for archivo in archivos], ignore_index=True)
+    return eventos.sort_values(['FECHA_CAMBIO', 'FECHA_DETECCION'], kind='mergesort').reset_index(drop=True)
+
+
+def current_state(eventos):
+    """Último estado conocido de cada registro según el registro de eventos (como un archivo de RIPS)."""
+    ultimos = eventos.drop_duplicates('CLAVE', keep='last')
+    ultimos = ultimos[ultimos['ESTADO'].notna()]
+    return pd.DataFrame({
+        'CLAVE': ultimos['CLAVE'],
+        RIPS["facturador"]: ultimos['NOMBRE'],
+        RIPS["categoria"]: ultimos['ESTADO'],
+        RIPS["fecha"]: ultimos['FECHA_CAMBIO'],
+    })
+
+
+def record_rips_snapshot(df_nuevo, snapshot_path, directorio, clave=RIPS_KEY):
+    """
+    Registra las transiciones de estado de un archivo de RIPS que va a reemplazar al archivo
+    persistente snapshot_path (None si no hay). Se llama antes de guardarlo. Si el registro de eventos está
+    vacío y ya existía un archivo persistente, primero se registra ese archivo como línea base;
+    si no hay archivo persistente (p. ej. después de limpiar los datos) se compara con el
+    último estado del registro. Retorna la cantidad de eventos agregados, o None si el archivo
+    no tiene la clave o las columnas de RIPS.
+    """
+    if not can_track(df_nuevo, clave):
+        return None
+    anterior = load_persisted_dataset(snapshot_path, 'rips') if snapshot_path else None
+    if anterior is not None and not can_track(anterior, clave):
+        anterior = None
+
+    agregados = 0
+    if _event_files(directorio):
+        if anterior is None:
+            anterior = current_state(load_events(directorio)).rename(columns={'CLAVE': clave})
+    elif anterior is not None:
+        agregados += append_events(diff_snapshots(None, anterior, clave), directorio)
+    return agregados + append_events(diff_snapshots(anterior, df_nuevo, clave), directorio)
+
+
+def dwell_times(eventos, hasta):
+    """
+    Estancias: cada período que un registro pasó en un estado, desde su evento hasta el
+    siguiente evento del mismo registro o, si sigue en ese estado, hasta `hasta` (En_Curso).
+    """
+    eventos = eventos.sort_values(['CLAVE', 'FECHA_CAMBIO', 'FECHA_DETECCION'], kind='mergesort')
+    misma_clave = eventos['CLAVE'].eq(eventos['CLAVE'].shift(-1))
+    fin = eventos['FECHA_CAMBIO'].shift(-1).where(misma_clave, pd.Timestamp(hasta))
+    estancias = eventos.assign(FECHA_FIN=fin, En_Curso=~misma_clave)
+    estancias = estancias[estancias['ESTADO'].notna()]
+    dias = (estancias['FECHA_FIN'] - estancias['FECHA_CAMBIO']) / pd.Timedelta(days=1)
+    return estancias.assign(Dias=dias.clip(lower=0).round(2)).reset_index(drop=True)
+
+
+def dwell_summary(estancias, start_date, end_date, facturadores=None, estados=None):
+    """
+    Tiempo en cada estado (estancias que empezaron en el rango): estancias cerradas con su
+    promedio, mediana y percentil 90 de días, y estancias en curso con su antigüedad promedio.
+    """
+    columnas = ['ESTADO', 'Estancias_Cerradas', 'Dias_Promedio', 'Dias_Mediana', 'Dias_P90',
+                'En_Curso', 'Antiguedad_Promedio_En_Curso']
+    desde, hasta = pd.Timestamp(start_date), pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    estancias = estancias[(estancias['FECHA_CAMBIO'] >= desde) & (estancias['FECHA_CAMBIO'] < hasta)]
+    if not is_todos(facturadores):
+        estancias = estancias[estancias['NOMBRE'].isin(facturadores)]
+    if not is_todos(estados):
+        estancias = estancias[estancias['ESTADO'].isin(estados)]
+    if estancias.empty:
+        return pd.DataFrame(columns=columnas)
+
+    cerradas = estancias[~estancias['En_Curso']].groupby('ESTADO')['Dias']
+    en_curso = estancias[estancias['En_Curso']].groupby('ESTADO')['Dias']
+    resumen = pd.DataFrame({
+        'Estancias_Cerradas': cerradas.size(),
+        'Dias_Promedio': cerradas.mean().round(2),
+        'Dias_Mediana': cerradas.median().round(2),
+        'Dias_P90': cerradas.quantile(0.9).round(2),
+        'En_Curso': en_curso.size(),
+        'Antiguedad_Promedio_En_Curso': en_curso.mean().round(2),
+    })
+    resumen[['Estancias_Cerradas', 'En_Curso']] = resumen[['Estancias_Cerradas', 'En_Curso']].fillna(0).astype(int)
+    return resumen.rename_axis('ESTADO').reset_index()[columnas]
+
+
+def backlog_by_estado(eventos, periodo_code, start_date, end_date, facturadores=None, estados=None):
+    """
+    Registros en cada estado al cierre de cada periodo (formato largo: Periodo, ESTADO,
+    Registros). Cada evento suma uno al estado nuevo y resta uno al anterior, y el backlog es
+    la suma acumulada desde el primer evento. Los periodos sin eventos conservan el backlog del
+    anterior. Con facturadores, la entrada cuenta para NOMBRE y la salida para NOMBRE_ANTERIOR.
+    """
+    columnas = ['Periodo', 'ESTADO', 'Registros']
+    eventos = eventos[eventos['FECHA_CAMBIO'] < pd.Timestamp(end_date) + pd.Timedelta(days=1)]
+    entradas = eventos[eventos['ESTADO'].notna()]
+    salidas = eventos[eventos['ESTADO_ANTERIOR'].notna()]
+    if not is_todos(facturadores):
+        entradas = entradas[entradas['NOMBRE'].isin(facturadores)]
+        salidas = salidas[salidas['NOMBRE_ANTERIOR'].isin(facturadores)]
+    deltas = pd.concat([
+        pd.DataFrame({'FECHA_CAMBIO': entradas['FECHA_CAMBIO'], 'ESTADO': entradas['ESTADO'], 'Delta': 1}),
+        pd.DataFrame({'FECHA_CAMBIO': salidas['FECHA_CAMBIO'], 'ESTADO': salidas['ESTADO_ANTERIOR'], 'Delta': -1}),
+    ], ignore_index=True)
+    if not is_todos(estados):
+        deltas = deltas[deltas['ESTADO'].isin(estados)]
+    if deltas.empty:
+        return pd.DataFrame(columns=columnas)
+
+    por_fecha = deltas.pivot_table(index='FECHA_CAMBIO', columns='ESTADO', values='Delta', aggfunc='sum', fill_value=0)
+    # Fila en cero al final del rango: la serie llega hasta el último periodo aunque no tenga eventos
+    por_fecha = pd.concat([por_fecha, pd.DataFrame(0, index=[pd.Timestamp(end_date)], columns=por_fecha.columns)])
+    # resample incluye los periodos sin eventos (delta 0): la suma acumulada arrastra el backlog anterior
+    por_periodo = por_fecha.resample(pandas_freq(periodo_code)).sum().rename_axis('FECHA_CAMBIO')
+    backlog = por_periodo.cumsum()
+    backlog = backlog[backlog.index >= pd.Timestamp(start_date)]
+    if backlog.empty:
+        return pd.DataFrame(columns=columnas)
+
+    largo = backlog.rename_axis(columns='ESTADO').stack().rename('Registros').reset_index()
+    largo['Periodo'] = period_labels(largo['FECHA_CAMBIO'], periodo_code)
+    return largo[columnas]
@@ -0,0 +1,237 @@
+"""
+Almacén compartido de datos persistentes para varios usuarios.
+
+Cada vez que se guardan datos, cada archivo se escribe como una versión nueva e inmutable
+(p. ej. df_rips.v000012.parquet) y un catálogo SQLite (catalogo.sqlite, en la misma carpeta)
+registra cuál es la versión vigente de cada tipo. Así:
+  - los escritores se coordinan con la transacción de escritura del catálogo (BEGIN IMMEDIATE):
+    dos guardados nunca se mezclan y ninguno ve archivos a medio escribir;
+  - cada sesión lee una foto consistente del catálogo (current_snapshot) y sigue trabajando con
+    ella aunque otra sesión guarde datos nuevos, hasta que decida actualizarla;
+  - las acciones destructivas (eliminar los datos de todos) requieren el rol administrador.
+
+Las carpetas sin catálogo (instalaciones anteriores) siguen funcionando: los archivos con
+nombre fijo de PERSISTED_FILENAMES se usan como la versión vigente de cada tipo.
+"""
+import contextlib
+import datetime
+import hmac
+import os
+import sqlite3
+
+from dashboard_core.ingestion import PERSISTED_FILENAMES, remove_persisted_file
+
+# Carpeta de datos persistentes (variable de entorno DASHBOARD_DATA_DIR). Si no se define, se
+# usa ../persisted_data respecto al directorio de trabajo, como antes; siempre se resuelve a
+# una ruta absoluta.
+DEFAULT_DATA_DIR = "../persisted_data"
+
+CATALOG_FILENAME = "catalogo.sqlite"
+
+# Versiones anteriores de cada tipo que se conservan en disco
+VERSIONS_RETAINED = int(os.environ.get("DASHBOARD_VERSIONS_RETAINED", "3"))
+
+# Segundos que un escritor espera a que otro termine antes de fallar
+WRITE_LOCK_TIMEOUT = 60
+
+# --- Roles ---
+# Con DASHBOARD_ADMIN_PASSWORD definida el dashboard funciona en modo multiusuario: cada sesión
+# es "analista" hasta que ingresa la clave de administrador. Sin ella (uso local de una sola
+# persona) todas las sesiones son administradoras, como antes.
+ROL_ANALISTA = "analista"
+ROL_ADMINISTRADOR = "administrador"
+ADMIN_PASSWORD = os.environ.get("DASHBOARD_ADMIN_PASSWORD") or None
+
+
+def resolve_data_dir(path=None):
+    """Ruta absoluta de la carpeta de datos (path, DASHBOARD_DATA_DIR o la predeterminada). La crea si no existe."""
+    data_dir = os.path.abspath(os.path.expanduser(path or os.environ.get("DASHBOARD_DATA_DIR") or DEFAULT_DATA_DIR))
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+
+def multi_user_mode():
+    """Indica si hay una clave de administrador configurada (modo multiusuario)."""
+    return ADMIN_PASSWORD is not None
+
+
+def default_role():
+    """Rol de una sesión nueva."""
+    return ROL_ANALISTA if multi_user_mode() else ROL_ADMINISTRADOR
+
+
+def check_admin_password(password):
+    """Indica si la clave corresponde a la de administrador (comparación en tiempo constante)."""
+    return multi_user_mode() and hmac.compare_digest(str(password).encode(), ADMIN_PASSWORD.encode())
+
+
+def _catalog_path(data_dir):
+    return os.path.join(data_dir, CATALOG_FILENAME)
+
+
+def _connect(data_dir):
+    conn = sqlite3.connect(_catalog_path(data_dir), timeout=WRITE_LOCK_TIMEOUT, isolation_level=None)
+    # WAL: los lectores no bloquean al escritor ni el escritor a los lectores
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS versiones ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " tipo TEXT NOT NULL,"
+        " archivo TEXT,"  # NULL: los datos del tipo se eliminaron
+        " filas INTEGER,"
+        " creado TEXT NOT NULL,"
+        " autor TEXT)"
+    )
+    return conn
+
+
+def current_snapshot(data_dir):
+    """
+    Foto consistente del almacén: (id, archivos), donde id identifica la foto (cambia con cada
+    guardado o eliminación) y archivos es {tipo: ruta del archivo vigente o None}.
+    """
+    archivos = {}
+    for tipo, filename in PERSISTED_FILENAMES.items():
+        legado = os.path.join(data_dir, filename)
+        archivos[tipo] = legado if os.path.exists(legado) else None
+    if not os.path.exists(_catalog_path(data_dir)):
+        return 0, archivos
+
+    with contextlib.closing(_connect(data_dir)) as conn:
+        # Una sola consulta: se lee la versión vigente de todos los tipos a la vez
+        filas = conn.execute(
+            "SELECT v.tipo, v.archivo, u.ultimo FROM versiones v"
+            " JOIN (SELECT tipo, MAX(id) AS id FROM versiones GROUP BY tipo) t ON v.id = t.id"
+            " CROSS JOIN (SELECT MAX(id) AS ultimo FROM versiones) u"
+        ).fetchall()
+    snapshot_id = 0
+    for tipo, archivo, ultimo in filas:
+        archivos[tipo] = os.path.join(data_dir, archivo) if archivo else None
+        snapshot_id = ultimo
+    return snapshot_id, archivos
+
+
+def pinned_snapshot(data_dir, snapshot):
+    """
+    La foto de una sesión, con un archivo en disco para cada tipo. Si prune_versions ya eliminó
+    el archivo de algún tipo (la sesión quedó más de VERSIONS_RETAINED guardados atrás), ese tipo
+    pasa a su versión vigente: así, al volver a leerlo (p. ej. cuando se libera de la caché) no
+    se pierden los datos. Retorna (foto, tipos que cambiaron de versión).
+    """
+    foto_id, archivos = snapshot
+    faltantes = [tipo for tipo, ruta in archivos.items() if ruta is not None and not os.path.exists(ruta)]
+    if not faltantes:
+        return snapshot, []
+    _, vigentes = current_snapshot(data_dir)
+    return (foto_id, {**archivos, **{tipo: vigentes.get(tipo) for tipo in faltantes}}), faltantes
+
+
+def snapshot_id(data_dir):
+    """Id de la foto vigente (barato: sirve para saber si hay datos más recientes)."""
+    if not os.path.exists(_catalog_path(data_dir)):
+        return 0
+    with contextlib.closing(_connect(data_dir)) as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM versiones").fetchone()[0]
+
+
+@contextlib.contextmanager
+def write_transaction(data_dir):
+    """
+    Transacción de escritura del almacén. Solo un escritor a la vez (en cualquier proceso)
+    puede tenerla; los demás esperan hasta WRITE_LOCK_TIMEOUT segundos. Si ocurre un error,
+    las versiones registradas dentro de la transacción se descartan.
+    """
+    conn = _connect(data_dir)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def current_file(conn, data_dir, tipo):
+    """Archivo vigente de un tipo dentro de una transacción de escritura (None si no hay)."""
+    fila = conn.execute("SELECT archivo FROM versiones WHERE tipo = ? ORDER BY id DESC LIMIT 1", (tipo,)).fetchone()
+    if fila is None:
+        legado = os.path.join(data_dir, PERSISTED_FILENAMES[tipo])
+        return legado if os.path.exists(legado) else None
+    return os.path.join(data_dir, fila[0]) if fila[0] else None
+
+
+def save_version(conn, data_dir, tipo, df, autor=None):
+    """
+    Guarda df como una versión nueva del tipo dentro de una transacción de escritura. El archivo
+    se escribe completo con otro nombre y se renombra al final, así que nunca se lee a medias.
+    Retorna la ruta del archivo nuevo.
+    """
+    creado = datetime.datetime.now().isoformat(timespec='seconds')
+    version = conn.execute(
+        "INSERT INTO versiones (tipo, archivo, filas, creado, autor) VALUES (?, NULL, ?, ?, ?)",
+        (tipo, len(df), creado, autor),
+    ).lastrowid
+    stem = os.path.splitext(PERSISTED_FILENAMES[tipo])[0]
+    archivo = f"{stem}.v{version:06d}.parquet"
+    path = os.path.join(data_dir, archivo)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    conn.execute("UPDATE versiones SET archivo = ? WHERE id = ?", (archivo, version))
+    return path
+
+
+def _remove_file(path):
+    """Elimina un archivo y su caché caliente; si otro proceso lo tiene abierto (Windows) se deja para después."""
+    try:
+        remove_persisted_file(path)
+    except OSError:
+        pass
+
+
+def prune_versions(conn, data_dir):
+    """
+    Elimina del disco las versiones más antiguas que las VERSIONS_RETAINED más recientes de
+    cada tipo, y los archivos con nombre fijo que ya reemplazó una versión del catálogo. Las
+    sesiones que aún usan una versión eliminada la tienen cargada en memoria y, si necesitan
+    volver a leerla, pasan a la versión vigente (ver pinned_snapshot).
+    """
+    for tipo, filename in PERSISTED_FILENAMES.items():
+        archivos = [fila[0] for fila in conn.execute(
+            "SELECT archivo FROM versiones WHERE tipo = ? AND archivo IS NOT NULL ORDER BY id DESC", (tipo,)
+        )]
+        for archivo in archivos[VERSIONS_RETAINED:]:
+            _remove_file(os.path.join(data_dir, archivo))
+        if conn.execute("SELECT 1 FROM versiones WHERE tipo = ? LIMIT 1", (tipo,)).fetchone():
+            _remove_file(os.path.join(data_dir, filename))
+
+
+def remove_all_versions(data_dir, rol, autor=None):
+    """
+    Elimina los datos persistentes de todos los tipos (acción destructiva: solo administradores).
+    Queda registrado en el catálogo y, una vez confirmada la transacción, los archivos se borran
+    del disco (si la transacción falla, el catálogo y los archivos quedan como estaban). Retorna
+    los tipos que tenían datos. Lanza PermissionError si el rol no es administrador.
+    """
+    if rol != ROL_ADMINISTRADOR:
+        raise PermissionError("Solo un administrador puede eliminar los datos persistentes compartidos.")
+    eliminados = []
+    with write_transaction(data_dir) as conn:
+        creado = datetime.datetime.now().isoformat(timespec='seconds')
+        for tipo in PERSISTED_FILENAMES:
+            if current_file(conn, data_dir, tipo) is not None:
+                eliminados.append(tipo)
+            conn.execute(
+                "INSERT INTO versiones (tipo, archivo, filas, creado, autor) VALUES (?, NULL, 0, ?, ?)",
+                (tipo, creado, autor),
+            )
+        rutas = [os.path.join(data_dir, archivo) for (archivo,) in
+                 conn.execute("SELECT archivo FROM versiones WHERE archivo IS NOT NULL").fetchall()]
+        rutas.extend(os.path.join(data_dir, filename) for filename in PERSISTED_FILENAMES.values())
+    # Fuera de la transacción: solo se borra lo que el catálogo ya no registra como vigente
+    for ruta in rutas:
+        _remove_file(ruta)
+    return eliminados
@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.synthetic_data import make_datasets
+from dashboard_core.normalization import (
+    combine_legalizaciones,
+    prepare_facturacion,
+    prepare_legalizaciones,
+    prepare_rips,
+    validate_and_normalize,
+)
+from dashboard_core.pipelines import FACTURACION, LEGALIZACIONES, RIPS
+
+
+@pytest.fixture(scope="session")
+def datasets():
+    """Datasets sintéticos pequeños, preparados y normalizados como los deja la ingesta."""
+    crudos = make_datasets(3000)
+    return {
+        LEGALIZACIONES["nombre"]: validate_and_normalize(combine_legalizaciones(
+            prepare_legalizaciones(crudos['ppl'], 'PPL'), prepare_legalizaciones(crudos['convenios'], 'Convenios')
+        ), LEGALIZACIONES),
+        RIPS["nombre"]: validate_and_normalize(prepare_rips(crudos['rips']), RIPS),
+        FACTURACION["nombre"]: validate_and_normalize(prepare_facturacion(crudos['facturacion']), FACTURACION),
+    }
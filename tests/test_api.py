@@ -0,0 +1,100 @@
+import datetime
+import threading
+
+import pandas as pd
+import pytest
+
+from dashboard_core.api import AggregationService
+from dashboard_core.store import save_version, write_transaction
+
+
+def _rips(filas):
+    return pd.DataFrame({
+        'ULTIMA_MODIFICACION': pd.date_range('2024-01-01', periods=filas, freq='D'),
+        'NOMBRE': ['ANA', 'LUIS'] * (filas // 2),
+        'ESTADO': ['ABIERTO'] * filas,
+    })
+
+
+def _guardar(data_dir, df):
+    with write_transaction(data_dir) as conn:
+        save_version(conn, data_dir, 'rips', df)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    _guardar(str(tmp_path), _rips(10))
+    return str(tmp_path)
+
+
+def test_current_recarga_cuando_cambia_la_version(data_dir):
+    servicio = AggregationService(data_dir)
+    version, datasets, _ = servicio.current()
+    assert len(datasets['RIPS']) == 10
+    assert servicio.current()[0] == version
+
+    _guardar(data_dir, _rips(20))
+    nueva, datasets, _ = servicio.current()
+    assert nueva != version
+    assert len(datasets['RIPS']) == 20
+
+
+def test_current_nunca_mezcla_version_y_datos(data_dir):
+    servicio = AggregationService(data_dir)
+    filas_por_version = {}
+    errores = []
+
+    def leer():
+        for _ in range(50):
+            version, datasets, _ = servicio.current()
+            filas = len(datasets['RIPS'])
+            if filas_por_version.setdefault(version, filas) != filas:
+                errores.append((version, filas))
+
+    lectores = [threading.Thread(target=leer) for _ in range(4)]
+    for lector in lectores:
+        lector.start()
+    for filas in (20, 30, 40):
+        _guardar(data_dir, _rips(filas))
+    for lector in lectores:
+        lector.join()
+    assert errores == []
+    assert len(servicio.current()[1]['RIPS']) == 40
+
+
+def test_entradas_valida_los_filtros(data_dir):
+    servicio = AggregationService(data_dir)
+    _, datasets, _ = servicio.current()
+    with pytest.raises(KeyError):
+        servicio.entradas('legalizaciones', datasets)
+    with pytest.raises(ValueError):
+        servicio.entradas('rips', datasets, desde=datetime.date(2024, 2, 1), hasta=datetime.date(2024, 1, 1))
+    with pytest.raises(ValueError):
+        servicio.entradas('rips', datasets, periodo='Siglo')
+
+
+def test_http_errores_y_304_sin_recalcular(data_dir, monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    from dashboard_core.api import create_app
+
+    cliente = TestClient(create_app(data_dir))
+    assert cliente.get("/api/nada/resumen").status_code == 404
+    assert cliente.get("/api/legalizaciones/resumen").status_code == 404
+    assert cliente.get("/api/rips/resumen", params={"tipo": "PPL"}).status_code == 400
+    assert cliente.get("/api/rips/evolucion", params={"periodo": "Siglo"}).status_code == 400
+
+    respuesta = cliente.get("/api/rips/resumen")
+    assert respuesta.status_code == 200
+    assert {fila['NOMBRE'] for fila in respuesta.json()['filas']} == {'ANA', 'LUIS'}
+
+    # Con el ETag vigente no se vuelve a calcular la respuesta (aunque ya no esté en memoria)
+    def sin_calcular(*args, **kwargs):
+        raise AssertionError("no debe calcularse la respuesta")
+
+    monkeypatch.setattr(AggregationService, "response", sin_calcular)
+    no_modificada = cliente.get("/api/rips/resumen", headers={"If-None-Match": respuesta.headers["etag"]})
+    assert no_modificada.status_code == 304
+    assert no_modificada.headers["etag"] == respuesta.headers["etag"]
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_core.dates import parse_dates
+
+FORMATO_ERP = '%d/%m/%Y %H:%M'
+
+
+def _esperado(valores, formato):
+    return pd.to_datetime(pd.Series(valores, dtype=object).str.strip(), format=formato, errors='coerce')
+
+
+@pytest.mark.parametrize("formato, valores", [
+    (FORMATO_ERP, ['05/03/2024 14:30', '31/12/2023 23:59', '01/01/2024 00:00', '29/02/2024 08:05']),
+    ('%d/%m/%Y', ['05/03/2024', '31/01/2023', '29/02/2024']),
+    ('%Y-%m-%d %H:%M:%S', ['2024-03-05 14:30:00', '2023-12-31 23:59:59']),
+    ('%Y-%m-%d', ['2024-03-05', '2023-12-31']),
+])
+def test_igual_a_to_datetime_con_formato(formato, valores):
+    # Más de la mitad de valores distintos (ancho fijo) y muchos repetidos (por valor único)
+    for serie in (valores, valores * 50):
+        obtenido, reporte = parse_dates(pd.Series(serie, dtype=object), formato)
+        pd.testing.assert_series_equal(obtenido, _esperado(serie, formato), check_names=False)
+        assert reporte == {"formato": formato, "vacias": 0, "invalidas": 0}
+
+
+@pytest.mark.parametrize("valor", ['31/04/2024 10:00', '29/02/2023 10:00', '32/01/2024 10:00',
+                                   '15/13/2024 10:00', '15/01/2024 24:00', 'basura'])
+def test_fechas_inexistentes_son_invalidas(valor):
+    assert pd.isna(_esperado([valor], FORMATO_ERP)[0])
+    obtenido, reporte = parse_dates(pd.Series(['05/03/2024 14:30', valor], dtype=object), FORMATO_ERP)
+    assert obtenido[0] == pd.Timestamp('2024-03-05 14:30')
+    assert pd.isna(obtenido[1])
+    assert reporte["invalidas"] == 1
+
+
+def test_formato_detectado_espacios_e_iso():
+    valores = pd.Series([' 05/03/2024 14:30 ', '06/03/2024 09:00', '07/03/2024 10:15', '2024-03-08 11:00:00'],
+                        dtype=object)
+    obtenido, reporte = parse_dates(valores)
+    assert reporte["formato"] == FORMATO_ERP
+    # Los valores en otro formato conocido (ISO) se convierten con el formato de respaldo
+    assert obtenido.tolist() == [pd.Timestamp('2024-03-05 14:30'), pd.Timestamp('2024-03-06 09:00'),
+                                 pd.Timestamp('2024-03-07 10:15'), pd.Timestamp('2024-03-08 11:00')]
+    assert reporte["invalidas"] == 0
+
+
+def test_vacias_e_invalidas_se_cuentan_aparte():
+    valores = pd.Series(['05/03/2024 14:30', None, np.nan, '', '   ', '31/04/2024 10:00', 'x'], dtype=object)
+    obtenido, reporte = parse_dates(valores, FORMATO_ERP)
+    assert obtenido.isna().tolist() == [False, True, True, True, True, True, True]
+    assert reporte == {"formato": FORMATO_ERP, "vacias": 4, "invalidas": 2}
+
+
+def test_columna_de_texto_de_pandas():
+    valores = pd.Series(['05/03/2024 14:30', None, '31/04/2024 10:00'], dtype='str')
+    obtenido, reporte = parse_dates(valores, FORMATO_ERP)
+    assert obtenido[0] == pd.Timestamp('2024-03-05 14:30')
+    assert reporte["vacias"] == 1 and reporte["invalidas"] == 1
+
+
+def test_columna_ya_convertida():
+    valores = pd.Series(pd.to_datetime(['2024-03-05', None]))
+    obtenido, reporte = parse_dates(valores)
+    pd.testing.assert_series_equal(obtenido, valores)
+    assert reporte == {"formato": None, "vacias": 1, "invalidas": 0}
@@ -0,0 +1,54 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_core.indexing import build_facturador_index
+from dashboard_core.pipelines import FACTURACION, LEGALIZACIONES, RIPS, filter_dataset, filter_mask
+
+SPECS = (LEGALIZACIONES, RIPS, FACTURACION)
+
+
+def _selecciones(df, spec):
+    facturadores = sorted(df[spec["facturador"]].unique())
+    categoria = sorted(df[spec["categoria"]].unique())[:1]
+    return [
+        (facturadores[:1], None),
+        (facturadores[:3], categoria),
+        (facturadores[:2] + ['NO EXISTE'], None),  # facturador que no está en el índice
+        (['NO EXISTE'], None),
+        (['Todos'], categoria),  # con 'Todos' no se usa el índice
+        (['Todos', facturadores[0]], None),
+    ]
+
+
+@pytest.mark.parametrize("spec", SPECS, ids=lambda spec: spec["nombre"])
+@pytest.mark.parametrize("rango", [
+    (datetime.date(2022, 1, 1), datetime.date(2024, 12, 31)),
+    (datetime.date(2023, 2, 10), datetime.date(2023, 2, 10)),  # un solo día
+    (datetime.date(2023, 5, 1), datetime.date(2023, 8, 31)),
+])
+def test_mascara_con_indice_igual_a_sin_indice(datasets, spec, rango):
+    df = datasets[spec["nombre"]]
+    indice = build_facturador_index(df, spec)
+    for facturadores, categorias in _selecciones(df, spec):
+        esperado = filter_mask(df, spec, *rango, facturadores, categorias)
+        obtenido = filter_mask(df, spec, *rango, facturadores, categorias, indice=indice)
+        pd.testing.assert_series_equal(obtenido, esperado, check_names=False)
+        # filter_dataset toma las filas en el orden del índice (por facturador): mismas filas, otro orden
+        filas = filter_dataset(df, spec, *rango, facturadores, categorias, indice=indice)
+        posiciones = np.sort(df.index.get_indexer(filas.index))
+        np.testing.assert_array_equal(posiciones, np.flatnonzero(esperado.to_numpy()))
+
+
+def test_indice_de_otro_dataframe_se_ignora(datasets):
+    df = datasets[RIPS["nombre"]]
+    indice = build_facturador_index(df.iloc[:100], RIPS)
+    facturadores = sorted(df[RIPS["facturador"]].unique())[:2]
+    rango = (datetime.date(2022, 1, 1), datetime.date(2024, 12, 31))
+    pd.testing.assert_series_equal(
+        filter_mask(df, RIPS, *rango, facturadores, indice=indice),
+        filter_mask(df, RIPS, *rango, facturadores),
+        check_names=False,
+    )
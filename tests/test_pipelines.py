@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from dashboard_core.pipelines import FACTURACION, LEGALIZACIONES, PERIODO_TIEMPO_OPTIONS, RIPS, compute_section
+
+pytest.importorskip("polars")
+
+SPECS = (LEGALIZACIONES, RIPS, FACTURACION)
+
+
+def _seleccion(df, spec, filtrado):
+    if not filtrado:
+        return None, None
+    facturadores = sorted(df[spec["facturador"]].unique())[:3]
+    categorias = sorted(df[spec["categoria"]].unique())[:1]
+    return facturadores, categorias
+
+
+@pytest.mark.parametrize("periodo_code", list(PERIODO_TIEMPO_OPTIONS.values()))
+@pytest.mark.parametrize("spec", SPECS, ids=lambda spec: spec["nombre"])
+@pytest.mark.parametrize("filtrado", [False, True], ids=["todos", "filtrado"])
+def test_motor_lazy_igual_a_pandas(datasets, spec, periodo_code, filtrado):
+    df = datasets[spec["nombre"]]
+    facturadores, categorias = _seleccion(df, spec, filtrado)
+    inicio, fin = pd.Timestamp('2022-03-15').date(), pd.Timestamp('2024-06-30').date()
+
+    esperado = compute_section(df, spec, inicio, fin, facturadores, categorias, periodo_code, engine="pandas")
+    obtenido = compute_section(df, spec, inicio, fin, facturadores, categorias, periodo_code, engine="lazy")
+    assert not esperado[1].empty
+    pd.testing.assert_frame_equal(esperado[0], obtenido[0])
+    pd.testing.assert_frame_equal(esperado[1], obtenido[1])
+
+
+@pytest.mark.parametrize("spec", SPECS, ids=lambda spec: spec["nombre"])
+def test_motor_lazy_sin_periodo(datasets, spec):
+    df = datasets[spec["nombre"]]
+    inicio, fin = df[spec["fecha"]].min().date(), df[spec["fecha"]].max().date()
+    esperado = compute_section(df, spec, inicio, fin, engine="pandas")
+    obtenido = compute_section(df, spec, inicio, fin, engine="lazy")
+    pd.testing.assert_frame_equal(esperado[0], obtenido[0])
+    assert esperado[1] is None and obtenido[1] is None
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from dashboard_core.quality import null_counts
+
+
+def test_null_counts_por_columna_sin_recorrer_todo_el_frame(monkeypatch):
+    df = pd.DataFrame({
+        'NUMERO': [1.0, np.nan, 3.0, np.nan],
+        'NOMBRE': pd.Series(['ANA', None, 'LUIS', 'ANA'], dtype='str'),
+        'ESTADO': ['ABIERTO'] * 4,
+        'FECHA': pd.to_datetime(['2024-01-01', None, '2024-01-03', None]),
+    })
+    esperado = {col: int(n) for col, n in df.isna().sum().items() if n}
+
+    def sin_isna(self):
+        raise AssertionError("no debe armarse la copia booleana de todo el DataFrame")
+
+    monkeypatch.setattr(pd.DataFrame, "isna", sin_isna)
+    assert null_counts(df) == esperado == {'NUMERO': 2, 'NOMBRE': 1, 'FECHA': 2}
+    assert null_counts(df.head(0)) == {}
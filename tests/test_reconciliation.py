@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_core.pipelines import FACTURACION, LEGALIZACIONES
+from dashboard_core.reconciliation import (
+    CICLO_ETIQUETAS,
+    ID_FACTURACION,
+    ID_LEGALIZACION,
+    TIPOS_CONCILIABLES,
+    cycle_time_distribution,
+    reconcile,
+)
+
+
+def _primera_factura(df_legalizaciones, df_facturacion, max_dias=None):
+    """Conciliación por fuerza bruta: recorre las facturas de cada legalización."""
+    facturas = {}
+    for id_fact, tipo, fecha in zip(df_facturacion[ID_FACTURACION].astype(str).str.strip(),
+                                    df_facturacion[FACTURACION["categoria"]], df_facturacion[FACTURACION["fecha"]]):
+        facturas.setdefault((id_fact, tipo), []).append(fecha)
+
+    esperadas = []
+    for id_leg, tipo, fecha in zip(df_legalizaciones[ID_LEGALIZACION].astype(str).str.strip(),
+                                   df_legalizaciones[LEGALIZACIONES["categoria"]], df_legalizaciones[LEGALIZACIONES["fecha"]]):
+        candidatas = [
+            f for f in facturas.get((id_leg, tipo), [])
+            if tipo in TIPOS_CONCILIABLES and f >= fecha and (max_dias is None or f - fecha <= pd.Timedelta(days=max_dias))
+        ]
+        esperadas.append(min(candidatas) if candidatas else pd.NaT)
+    return pd.Series(esperadas, dtype=df_legalizaciones[LEGALIZACIONES["fecha"]].dtype)
+
+
+@pytest.mark.parametrize("max_dias", [None, 30])
+def test_conciliacion_igual_a_fuerza_bruta(datasets, max_dias):
+    df_leg = datasets[LEGALIZACIONES["nombre"]]
+    df_fact = datasets[FACTURACION["nombre"]]
+    conciliado = reconcile(df_leg, df_fact, max_dias=max_dias)
+
+    esperado = _primera_factura(df_leg, df_fact, max_dias)
+    obtenido = conciliado[FACTURACION["fecha"]].reset_index(drop=True)
+    pd.testing.assert_series_equal(obtenido, esperado, check_names=False)
+    assert conciliado['Facturada'].sum() > 0
+    assert (conciliado['Facturada'] == obtenido.notna().to_numpy()).all()
+    dias = ((obtenido - df_leg[LEGALIZACIONES["fecha"]].reset_index(drop=True)) / pd.Timedelta(days=1)).round(2)
+    np.testing.assert_allclose(conciliado['Dias_Ciclo'].to_numpy(dtype=float), dias.to_numpy(dtype=float))
+
+
+def test_rangos_de_dias_en_el_limite():
+    legalizacion = pd.Timestamp('2024-01-01 00:00')
+    dias_ciclo = [0, 7, 7.5, 7.99, 8, 15.5, 30.5, 31, 90.9, 91]
+    df_leg = pd.DataFrame({
+        LEGALIZACIONES["fecha"]: [legalizacion] * len(dias_ciclo),
+        LEGALIZACIONES["facturador"]: 'ANA',
+        ID_LEGALIZACION: [str(i) for i in range(len(dias_ciclo))],
+        LEGALIZACIONES["categoria"]: 'PPL',
+    })
+    df_fact = pd.DataFrame({
+        FACTURACION["fecha"]: [legalizacion + pd.Timedelta(days=d) for d in dias_ciclo],
+        FACTURACION["facturador"]: 'LUIS',
+        ID_FACTURACION: [str(i) for i in range(len(dias_ciclo))],
+        FACTURACION["categoria"]: 'PPL',
+    })
+    conciliado = reconcile(df_leg, df_fact)
+    assert conciliado['Dias_Ciclo'].tolist() == dias_ciclo
+
+    distribucion = cycle_time_distribution(conciliado).set_index('Rango_Dias')['Legalizaciones']
+    # 0, 7, 7.5 y 7.99 → 0-7; 8 y 15.5 → 8-15; 30.5 → 16-30; 31 → 31-60; 90.9 → 61-90; 91 → más de 90
+    assert distribucion.reindex(CICLO_ETIQUETAS).tolist() == [4, 2, 1, 1, 1, 1]
@@ -0,0 +1,93 @@
+import pandas as pd
+
+from dashboard_core.rips_history import (
+    append_events,
+    backlog_by_estado,
+    diff_snapshots,
+    events_version,
+    load_events,
+)
+
+DETECTADO = pd.Timestamp('2024-06-01 12:00')
+
+
+def _rips(filas):
+    return pd.DataFrame(filas, columns=['CONSECUTIVO', 'NOMBRE', 'ESTADO', 'ULTIMA_MODIFICACION']).assign(
+        ULTIMA_MODIFICACION=lambda df: pd.to_datetime(df['ULTIMA_MODIFICACION'])
+    )
+
+
+def _por_clave(eventos):
+    return {fila.CLAVE: fila for fila in eventos.itertuples(index=False)}
+
+
+def test_diff_detecta_altas_cambios_y_bajas():
+    anterior = _rips([
+        ('1', 'ANA', 'ABIERTO', '2024-01-01'),
+        ('2', 'ANA', 'ABIERTO', '2024-01-02'),
+        ('3', 'LUIS', 'RADICADO', '2024-01-03'),
+    ])
+    nuevo = _rips([
+        (' 2 ', 'LUIS', 'CERRADO', '2024-02-01'),  # cambió de estado (y de facturador); clave con espacios
+        ('1', 'ANA', 'ABIERTO', '2024-02-02'),  # sin cambio de estado: no genera evento
+        ('4', 'ANA', 'ABIERTO', '2024-02-03'),  # nuevo
+        ('4', 'ANA', 'GLOSADO', '2024-02-05'),  # clave repetida: cuenta la versión más reciente
+    ])
+    eventos = _por_clave(diff_snapshots(anterior, nuevo, clave='CONSECUTIVO', detectado=DETECTADO))
+
+    assert set(eventos) == {'2', '3', '4'}
+    assert (eventos['2'].ESTADO_ANTERIOR, eventos['2'].ESTADO) == ('ABIERTO', 'CERRADO')
+    assert (eventos['2'].NOMBRE_ANTERIOR, eventos['2'].NOMBRE) == ('ANA', 'LUIS')
+    assert eventos['2'].FECHA_CAMBIO == pd.Timestamp('2024-02-01')
+    assert pd.isna(eventos['3'].ESTADO) and eventos['3'].ESTADO_ANTERIOR == 'RADICADO'
+    assert eventos['3'].FECHA_CAMBIO == DETECTADO
+    assert pd.isna(eventos['4'].ESTADO_ANTERIOR) and eventos['4'].ESTADO == 'GLOSADO'
+    assert all(evento.FECHA_DETECCION == DETECTADO for evento in eventos.values())
+
+
+def test_diff_sin_archivo_anterior_registra_todo_como_nuevo():
+    nuevo = _rips([('1', 'ANA', 'ABIERTO', '2024-01-01'), ('2', 'LUIS', 'CERRADO', '2024-01-02')])
+    eventos = diff_snapshots(None, nuevo, clave='CONSECUTIVO', detectado=DETECTADO)
+    assert eventos['CLAVE'].tolist() == ['1', '2']
+    assert eventos['ESTADO_ANTERIOR'].isna().all()
+
+
+def test_append_agrega_archivos_sin_reescribir(tmp_path):
+    directorio = str(tmp_path / "eventos")
+    assert events_version(directorio) == "0"
+    assert append_events(diff_snapshots(None, _rips([]), clave='CONSECUTIVO'), directorio) == 0
+    assert load_events(directorio).empty
+
+    primeros = diff_snapshots(None, _rips([('1', 'ANA', 'ABIERTO', '2024-01-05')]), clave='CONSECUTIVO', detectado=DETECTADO)
+    assert append_events(primeros, directorio) == 1
+    version = events_version(directorio)
+
+    segundos = diff_snapshots(
+        _rips([('1', 'ANA', 'ABIERTO', '2024-01-05')]), _rips([('1', 'ANA', 'CERRADO', '2024-01-02')]),
+        clave='CONSECUTIVO', detectado=DETECTADO,
+    )
+    assert append_events(segundos, directorio) == 1
+    assert events_version(directorio) != version
+    assert len(list((tmp_path / "eventos").glob("eventos-*.parquet"))) == 2
+
+    # El registro completo se ordena por fecha de cambio
+    eventos = load_events(directorio)
+    assert eventos['ESTADO'].tolist() == ['CERRADO', 'ABIERTO']
+
+
+def test_backlog_arrastra_periodos_sin_eventos():
+    eventos = diff_snapshots(None, _rips([
+        ('1', 'ANA', 'ABIERTO', '2024-01-05'), ('2', 'ANA', 'ABIERTO', '2024-01-20'),
+    ]), clave='CONSECUTIVO', detectado=DETECTADO)
+    cierre = diff_snapshots(
+        _rips([('1', 'ANA', 'ABIERTO', '2024-01-05')]), _rips([('1', 'ANA', 'CERRADO', '2024-04-10')]),
+        clave='CONSECUTIVO', detectado=DETECTADO,
+    )
+    eventos = pd.concat([eventos, cierre], ignore_index=True)
+
+    backlog = backlog_by_estado(eventos, 'M', '2024-01-01', '2024-06-30')
+    abiertos = backlog[backlog['ESTADO'] == 'ABIERTO'].set_index('Periodo')['Registros']
+    cerrados = backlog[backlog['ESTADO'] == 'CERRADO'].set_index('Periodo')['Registros']
+    # Febrero, marzo, mayo y junio no tienen eventos: conservan el backlog del mes anterior
+    assert abiertos.to_dict() == {'2024-01': 2, '2024-02': 2, '2024-03': 2, '2024-04': 1, '2024-05': 1, '2024-06': 1}
+    assert cerrados.to_dict() == {'2024-01': 0, '2024-02': 0, '2024-03': 0, '2024-04': 1, '2024-05': 1, '2024-06': 1}
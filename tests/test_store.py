@@ -0,0 +1,95 @@
+import contextlib
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from dashboard_core import store
+from dashboard_core.store import (
+    VERSIONS_RETAINED,
+    current_snapshot,
+    pinned_snapshot,
+    prune_versions,
+    save_version,
+    write_transaction,
+)
+
+
+def _rips(filas):
+    return pd.DataFrame({
+        'ULTIMA_MODIFICACION': pd.date_range('2024-01-01', periods=filas, freq='D'),
+        'NOMBRE': 'ANA',
+        'ESTADO': 'ABIERTO',
+    })
+
+
+def _guardar(data_dir, filas):
+    with write_transaction(data_dir) as conn:
+        ruta = save_version(conn, data_dir, 'rips', _rips(filas))
+        prune_versions(conn, data_dir)
+    return ruta
+
+
+def test_sesion_con_version_eliminada_pasa_a_la_vigente(tmp_path):
+    data_dir = str(tmp_path)
+    _guardar(data_dir, 1)
+    foto = current_snapshot(data_dir)
+    assert pinned_snapshot(data_dir, foto) == (foto, [])
+
+    for filas in range(2, VERSIONS_RETAINED + 3):
+        ultima = _guardar(data_dir, filas)
+    # La versión de la foto ya se eliminó del disco
+    assert not os.path.exists(foto[1]['rips'])
+
+    nueva_foto, reemplazados = pinned_snapshot(data_dir, foto)
+    assert reemplazados == ['rips']
+    assert nueva_foto[0] == foto[0]
+    assert nueva_foto[1]['rips'] == ultima
+    # Los tipos sin datos siguen sin datos
+    assert nueva_foto[1]['ppl'] is None
+
+
+def test_solo_un_administrador_elimina_los_datos(tmp_path):
+    data_dir = str(tmp_path)
+    ruta = _guardar(data_dir, 3)
+    with pytest.raises(PermissionError):
+        store.remove_all_versions(data_dir, store.ROL_ANALISTA)
+    assert os.path.exists(ruta)
+    assert current_snapshot(data_dir)[1]['rips'] == ruta
+
+
+def test_archivos_se_borran_despues_de_confirmar(tmp_path, monkeypatch):
+    data_dir = str(tmp_path)
+    ruta = _guardar(data_dir, 3)
+    vistos = []
+
+    def registrar(path):
+        # Al borrar, el catálogo (leído con otra conexión) ya no tiene versión vigente
+        vistos.append((path, current_snapshot(data_dir)[1]['rips']))
+        if os.path.exists(path):
+            os.remove(path)
+
+    monkeypatch.setattr(store, "_remove_file", registrar)
+    assert store.remove_all_versions(data_dir, store.ROL_ADMINISTRADOR) == ['rips']
+    assert (ruta, None) in vistos
+    assert all(vigente is None for _, vigente in vistos)
+    assert not os.path.exists(ruta)
+
+
+def test_si_falla_la_confirmacion_no_se_borra_nada(tmp_path, monkeypatch):
+    data_dir = str(tmp_path)
+    ruta = _guardar(data_dir, 3)
+    transaccion = store.write_transaction
+
+    @contextlib.contextmanager
+    def falla_al_confirmar(directorio):
+        with transaccion(directorio) as conn:
+            yield conn
+            raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "write_transaction", falla_al_confirmar)
+    with pytest.raises(sqlite3.OperationalError):
+        store.remove_all_versions(data_dir, store.ROL_ADMINISTRADOR)
+    assert os.path.exists(ruta)
+    assert current_snapshot(data_dir)[1]['rips'] == ruta
@@ -0,0 +1,253 @@
+import functools
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dashboard_core.exports import EXPORT_FORMATS, export_bytes
+from dashboard_core.paging import cap_page_bytes, cap_page_size, page_positions
+from dashboard_core.plotting import plotting
+from dashboard_core.profiling import PROFILERS, stage
+from dashboard_core.quality import QUALITY_ATTR, quality_summary
+
+PAGE_SIZE_OPTIONS = [50, 100, 500, 1000, 5000]
+
+
+def _export_data(df, formato, nombre, mascara=None):
+    # Se ejecuta solo al hacer clic en el botón, en un hilo aparte del rerun. Las filas filtradas
+    # se toman por bloques del DataFrame compartido, sin copiarlas todas antes de escribir.
+    posiciones = np.flatnonzero(mascara()) if mascara is not None else None
+    return export_bytes(df, formato, nombre, posiciones)
+
+
+def export_buttons(titulo, key_prefix, tablas, filas_filtradas=None, mascara=None):
+    """
+    Botones de descarga de una sección.
+
+    tablas: diccionario nombre de archivo → DataFrame (resúmenes y evoluciones; None se omite).
+    filas_filtradas: DataFrame con las filas crudas de la sección, y mascara: función sin
+    argumentos que retorna la máscara booleana de las filas que cumplen los filtros. La máscara
+    solo se calcula cuando el usuario pide la descarga, y el archivo se genera con escritores
+    por bloques.
+    """
+    with st.expander(f"📥 Exportar {titulo}"):
+        for nombre, tabla in tablas.items():
+            if tabla is None or tabla.empty:
+                continue
+            columnas = st.columns(2)
+            for columna, formato in zip(columnas, ("csv", "xlsx")):
+                columna.download_button(
+                    f"{nombre.replace('_', ' ')} ({formato.upper()})",
+                    data=functools.partial(_export_data, tabla, formato, nombre),
+                    file_name=f"{nombre}.{formato}",
+                    mime=EXPORT_FORMATS[formato],
+                    key=f"{key_prefix}_{nombre}_{formato}",
+                    on_click="ignore",
+                )
+
+        if filas_filtradas is not None:
+            st.caption("Filas filtradas (todas las columnas del archivo original)")
+            columnas = st.columns(3)
+            for columna, formato in zip(columnas, ("csv", "xlsx", "parquet")):
+                columna.download_button(
+                    f"Filas filtradas ({formato.upper()})",
+                    data=functools.partial(_export_data, filas_filtradas, formato, f"{key_prefix}_filas_filtradas", mascara),
+                    file_name=f"{key_prefix}_filas_filtradas.{formato}",
+                    mime=EXPORT_FORMATS[formato],
+                    key=f"{key_prefix}_filas_{formato}",
+                    on_click="ignore",
+                )
+
+
+def paginated_table(df, key, mask=None, default_sort=None):
+    """
+    Tabla paginada del lado del servidor: solo se envía al navegador la página visible.
+
+    El orden y el filtro se resuelven en el servidor (con los índices de ordenamiento del
+    dataset y la máscara de filtros de la sección) y el tamaño de la página se limita para
+    no saturar el navegador ni el websocket.
+    """
+    columnas_orden = list(df.columns)
+    col_orden, col_sentido, col_tamano, col_pagina = st.columns([3, 2, 2, 2])
+    sort_column = col_orden.selectbox(
+        "Ordenar por", columnas_orden,
+        index=columnas_orden.index(default_sort) if default_sort in columnas_orden else 0,
+        key=f"{key}_sort",
+    )
+    ascending = col_sentido.radio("Sentido", ["Ascendente", "Descendente"], horizontal=True,
+                                  key=f"{key}_sentido") == "Ascendente"
+    page_size = cap_page_size(df, col_tamano.selectbox("Filas por página", PAGE_SIZE_OPTIONS, key=f"{key}_tamano"))
+
+    total = int(mask.sum()) if mask is not None else len(df)
+    total_paginas = max(1, math.ceil(total / page_size))
+    # La página vive solo en session_state (el widget no recibe además un valor inicial)
+    if st.session_state.get(f"{key}_pagina", total_paginas + 1) > total_paginas:
+        # Primera vez, o los filtros cambiaron y la página guardada ya no existe
+        st.session_state[f"{key}_pagina"] = 1
+    page = col_pagina.number_input("Página", min_value=1, max_value=total_paginas, step=1,
+                                   key=f"{key}_pagina")
+
+    posiciones, total = page_positions(df, mask, sort_column, ascending, page, page_size)
+    page_df, recortada = cap_page_bytes(df.iloc[posiciones])
+
+    inicio = (page - 1) * page_size
+    st.caption(f"Mostrando filas {inicio + 1 if total else 0}–{inicio + len(page_df)} de {total:,} "
+               f"(página {page} de {total_paginas})")
+    if recortada:
+        st.caption("⚠️ La página se recortó para limitar el tamaño enviado al navegador. Reduce las filas por página.")
+    st.dataframe(page_df, hide_index=True)
+
+
+def render_figure(fig, seccion):
+    """Muestra una figura de matplotlib midiendo el dibujo y la serialización, y la libera."""
+    plt, _ = plotting()
+
+    with stage(seccion, "render"):
+        st.pyplot(fig)
+    plt.close(fig)
+
+
+def preview_notice(titulo):
+    """Aviso de que los resultados de una sección son una estimación (vista previa aproximada)."""
+    st.info(
+        f"⏳ **Vista previa aproximada de {titulo}**: estimada a partir del resumen mensual de los "
+        "datos. Los resultados exactos se están calculando y reemplazarán a estos automáticamente; "
+        "mientras tanto no se pueden exportar."
+    )
+
+
+def kpi_panel(titulo, spec, indicadores, serie, periodo_label, mostrar_grafico):
+    """
+    Indicadores de productividad de una sección (tabla de productivity_kpis) y, si se eligieron
+    facturadores específicos, el gráfico de sus promedios móviles diarios.
+    """
+    plt, sns = plotting()
+
+    st.subheader(f"Indicadores de Productividad de {titulo}")
+    if indicadores.empty:
+        st.info(f"No hay datos de {titulo} para calcular indicadores con los filtros actuales.")
+        return
+    st.caption(
+        "Total del rango, promedio diario de los últimos 7 y 30 días, crecimiento del último periodo "
+        f"({periodo_label}) frente al anterior y posición en el ranking del equipo."
+    )
+    st.dataframe(indicadores, hide_index=True)
+
+    if mostrar_grafico and not serie.empty:
+        facturador_col = spec["facturador"]
+        fig, ax = plt.subplots(figsize=(14, 6))
+        sns.lineplot(x='Dia', y='Media_7_dias', hue=facturador_col, data=serie, ax=ax, palette='tab10')
+        sns.lineplot(x='Dia', y='Media_30_dias', hue=facturador_col, data=serie, ax=ax, palette='tab10',
+                     linestyle='--', legend=False)
+        ax.set_title(f'Promedio móvil diario de {titulo} (7 días: línea continua, 30 días: discontinua)')
+        ax.set_xlabel('Día')
+        ax.set_ylabel(f'Registros de {titulo} por día')
+        ax.grid(True)
+        plt.tight_layout()
+        render_figure(fig, spec["nombre"])
+
+
+def rips_history_panel(resumen, backlog, periodo_label):
+    """Tiempo en cada estado (tabla y promedio de días) y backlog de RIPS por estado al cierre de cada periodo."""
+    plt, sns = plotting()
+
+    st.subheader("Tiempo de RIPS en cada Estado")
+    if resumen.empty:
+        st.info("No hay cambios de estado de RIPS registrados para los filtros actuales.")
+    else:
+        st.caption("Estancias que empezaron en el rango de fechas. Las cerradas terminaron con un cambio de "
+                   "estado registrado; las que siguen en curso se miden hasta hoy.")
+        st.dataframe(resumen, hide_index=True)
+        cerradas = resumen[resumen['Estancias_Cerradas'] > 0]
+        if not cerradas.empty:
+            fig, ax = plt.subplots(figsize=(10, max(4, len(cerradas) * 0.6)))
+            sns.barplot(x='Dias_Promedio', y='ESTADO', data=cerradas, ax=ax, palette='magma', hue='ESTADO', legend=False)
+            ax.set_title('Días promedio en cada estado (estancias cerradas)')
+            ax.set_xlabel('Días')
+            ax.set_ylabel('Estado')
+            for container in ax.containers:
+                ax.bar_label(container, fmt='%.1f', label_type='edge', padding=5)
+            plt.tight_layout()
+            render_figure(fig, "RIPS")
+
+    st.subheader(f"Backlog de RIPS por Estado ({periodo_label})")
+    if backlog.empty:
+        st.info("No hay historial de estados de RIPS para construir el backlog con los filtros actuales.")
+        return
+    fig, ax = plt.subplots(figsize=(14, 6))
+    sns.lineplot(x='Periodo', y='Registros', hue='ESTADO', data=backlog, ax=ax, marker='o', palette='magma')
+    ax.set_title('RIPS en cada estado al cierre del periodo')
+    ax.set_xlabel(f'Periodo ({periodo_label})')
+    ax.set_ylabel('RIPS')
+    ax.grid(True)
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    render_figure(fig, "RIPS")
+
+
+def data_health_panel(reportes):
+    """
+    Panel "Salud de los datos": totales del reporte de calidad de cada archivo cargado (ver
+    dashboard_core/quality.py) y su detalle. reportes: nombre del archivo → df.attrs del dataset.
+    """
+    st.subheader("🩺 Salud de los Datos")
+    if not reportes:
+        st.info("No hay archivos cargados.")
+        return
+    st.caption(
+        "Problemas encontrados al cargar cada archivo. Las filas con fecha vacía o no reconocida se "
+        "descartan del análisis; las demás se conservan. Vacío: el dato no aplica o el archivo se "
+        "guardó antes de que se tomara el reporte."
+    )
+    st.dataframe(quality_summary(reportes), hide_index=True)
+
+    for nombre, attrs in reportes.items():
+        calidad = attrs.get(QUALITY_ATTR, {})
+        nulos = calidad.get("nulos")
+        prefijos = calidad.get("prefijos_desconocidos")
+        duplicados = calidad.get("claves_duplicadas")
+        if not (nulos or calidad.get("lineas_omitidas") or (prefijos and prefijos["filas"])
+                or (duplicados and duplicados["filas"])):
+            continue
+        with st.expander(f"Detalle de {nombre}"):
+            if calidad.get("lineas_omitidas"):
+                st.markdown(f"**Líneas omitidas del CSV:** {calidad['lineas_omitidas']:,} "
+                            f"(primeras: {', '.join(map(str, calidad.get('ejemplos_lineas', [])))})")
+            if duplicados and duplicados["filas"]:
+                st.markdown(f"**Claves duplicadas:** {duplicados['filas']:,} filas repiten "
+                            f"{' + '.join(duplicados['columnas'])}")
+            if prefijos and prefijos["filas"]:
+                st.markdown(f"**PREFIJO desconocido:** {prefijos['filas']:,} facturas clasificadas como 'Otro'")
+                st.dataframe(pd.DataFrame(list(prefijos["valores"].items()), columns=['PREFIJO', 'Facturas']),
+                             hide_index=True)
+            if nulos:
+                st.markdown("**Celdas vacías por columna**")
+                st.dataframe(pd.DataFrame(list(nulos.items()), columns=['Columna', 'Celdas_Vacias']),
+                             hide_index=True)
+
+
+def performance_panel(registros):
+    """Panel opcional "Rendimiento" en la barra lateral con las etapas medidas en este rerun."""
+    st.sidebar.markdown("---")
+    if not st.sidebar.toggle("Mostrar panel de Rendimiento", key="mostrar_rendimiento"):
+        return
+
+    with st.sidebar.expander("⏱️ Rendimiento", expanded=True):
+        if registros:
+            df_registros = pd.DataFrame(registros)
+            st.metric("Tiempo total medido", f"{df_registros['duracion_ms'].sum():,.0f} ms")
+            st.dataframe(df_registros, hide_index=True)
+        else:
+            st.info("No se midieron etapas en esta ejecución.")
+
+        herramienta = st.selectbox("Perfilador", PROFILERS, key="perfilador_herramienta")
+        if st.button("Perfilar la próxima ejecución", key="perfilar_button"):
+            st.session_state.perfilar_siguiente = herramienta
+            st.rerun()
+
+        if st.session_state.get('ultimo_perfil'):
+            st.caption("Último perfil capturado")
+            st.code(st.session_state.ultimo_perfil[:20000], language=None)
+            st.download_button("Descargar perfil", st.session_state.ultimo_perfil,
+                               file_name="perfil_dashboard.txt", key="descargar_perfil")